@@ -0,0 +1,73 @@
+"""
+Encode/decode cost of the json codecs per message type.
+
+usage:
+    python benchmarks/bench_codec.py [--number 2000]
+"""
+import argparse
+import math
+import timeit
+
+from pyrobokit.tcp_transport import CODECS, get_codec
+
+# representative bodies of the messages exchanged with an SRC controller
+MESSAGES = {
+    "1004 pose response": {
+        "ret_code": 0, "x": 12.3456, "y": -4.5678, "angle": 1.5707,
+        "confidence": 0.98, "current_station": "LM15", "last_station": "LM14",
+        "create_on": "2023-04-10T10:00:00.000Z"
+    },
+    "1007 battery response": {
+        "ret_code": 0, "battery_level": 0.87, "battery_temp": 31.0,
+        "charging": False, "voltage": 48.2, "current": -3.1,
+        "max_charge_voltage": 54.6, "max_charge_current": 20.0,
+        "manual_charge": False, "auto_charge": False, "battery_cycle": 120,
+        "create_on": "2023-04-10T10:00:00.000Z"
+    },
+    "1009 laser response": {
+        "ret_code": 0,
+        "lasers": [{
+            "beams": [{
+                "angle": -135.0 + i * 0.25,
+                "dist": 2.0 + math.sin(i / 50.0),
+                "valid": i % 17 != 0
+            } for i in range(1081)],
+            "install_info": {"x": 0.3, "y": 0.0, "z": 0.2, "yaw": 0.0, "upside": False}
+        } for _ in range(2)],
+        "create_on": "2023-04-10T10:00:00.000Z"
+    },
+    "2010 motion request": {"vx": 0.5, "vy": 0.0, "w": 0.1},
+    "3053 route list response": {
+        "ret_code": 0, "path": [f"LM{i}" for i in range(200)]
+    },
+    "3066 multi station request": {
+        "move_task_list": [{
+            "id": f"LM{i + 1}", "source_id": f"LM{i}", "task_id": f"task{i:05d}",
+            "max_speed": 0.8, "method": "forward", "duration": 0
+        } for i in range(50)]
+    },
+}
+
+
+def run(number):
+    codecs = []
+    for name in CODECS:
+        try:
+            codecs.append(get_codec(name))
+        except ImportError:
+            print(f"{name}: not installed, skipped")
+
+    print(f"{'message':<28} {'codec':<8} {'bytes':>8} {'encode us':>10} {'decode us':>10}")
+    for label, msg in MESSAGES.items():
+        for codec in codecs:
+            data = codec.encode(msg)
+            encode = timeit.timeit(lambda: codec.encode(msg), number=number)
+            decode = timeit.timeit(lambda: codec.decode(data), number=number)
+            print(f"{label:<28} {codec.name:<8} {len(data):>8} "
+                  f"{encode / number * 1e6:>10.2f} {decode / number * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000)
+    run(parser.parse_args().number)
@@ -0,0 +1,98 @@
+"""
+Per-call logging overhead of the transport hot path (decoding a response and logging a sent message).
+
+Compares the former print based logging (written to os.devnull) with the logging module in its
+different configurations: quiet hot path, debug disabled and debug enabled.
+
+usage:
+    python benchmarks/bench_logging.py [--number 20000]
+"""
+import argparse
+import contextlib
+import logging
+import os
+import time
+import timeit
+
+from pyrobokit.tcp_transport import SeerData, TcpTransport, set_quiet_hot_path
+
+POSE = {
+    "ret_code": 0, "x": 12.3456, "y": -4.5678, "angle": 1.5707,
+    "confidence": 0.98, "current_station": "LM15", "last_station": "LM14",
+    "create_on": "2023-04-10T10:00:00.000Z"
+}
+
+
+class _OfflineTransport(TcpTransport):
+    """TcpTransport that skips connecting and writes into the void"""
+
+    def connect(self):
+        self.connected = True
+
+    def _write(self, buffers):
+        pass
+
+
+def print_style(transport, seer, payload, devnull):
+    """the logging work done per request before the logging module was used"""
+    with contextlib.redirect_stdout(devnull):
+        message = seer.get_packed_message()
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        print(message.hex())
+        print(f"[{timestamp}] [{transport.name}] :: Sent: {message}")
+        data = transport.codec.decode(payload)
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        print(f"[{timestamp}] [{transport.name}] :: Received: {data}")
+        data['timestamp'] = timestamp
+
+
+def logging_style(transport, seer, payload):
+    transport.send_data(seer)
+    transport.decode(payload)
+
+
+def run(number):
+    transport = _OfflineTransport("127.0.0.1", 0)
+    seer = SeerData()
+    seer.set_data(1004, {"simple": True})
+    payload = transport.codec.encode(POSE)
+    logger = logging.getLogger("pyrobokit")
+    results = {}
+
+    with open(os.devnull, "w") as devnull:
+        results["print (before)"] = timeit.timeit(
+            lambda: print_style(transport, seer, payload, devnull),
+            number=number)
+
+        handler = logging.StreamHandler(devnull)
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+
+        logger.setLevel(logging.DEBUG)
+        set_quiet_hot_path(False)
+        results["logging DEBUG"] = timeit.timeit(
+            lambda: logging_style(transport, seer, payload), number=number)
+
+        logger.setLevel(logging.INFO)
+        results["logging INFO"] = timeit.timeit(
+            lambda: logging_style(transport, seer, payload), number=number)
+
+        logger.setLevel(logging.DEBUG)
+        set_quiet_hot_path(True)
+        results["logging quiet hot path"] = timeit.timeit(
+            lambda: logging_style(transport, seer, payload), number=number)
+
+        logger.removeHandler(handler)
+        set_quiet_hot_path(False)
+
+    base = results["print (before)"]
+    print(f"{'mode':<24} {'us/call':>8} {'speedup':>8}")
+    for mode, total in results.items():
+        print(f"{mode:<24} {total / number * 1e6:>8.2f} {base / total:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    run(parser.parse_args().number)
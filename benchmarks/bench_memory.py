@@ -0,0 +1,87 @@
+"""
+Memory footprint of a status history: status objects keeping their raw response (the former default) compared
+with status objects without json_data and with immutable snapshot records.
+
+The responses are decoded individually, as they would be when received from the AGV.
+
+usage:
+    python benchmarks/bench_memory.py [--samples 36000]
+"""
+import argparse
+import tracemalloc
+
+from pyrobokit.agv_api import StatusBattery, StatusPose
+from pyrobokit.tcp_transport import default_codec
+
+RESPONSES = {
+    StatusPose: {
+        "ret_code": 0, "x": 12.3456, "y": -4.5678, "angle": 1.5707,
+        "confidence": 0.98, "current_station": "LM15", "last_station": "LM14",
+        "create_on": "2023-04-10T10:00:00.000Z"
+    },
+    StatusBattery: {
+        "ret_code": 0, "battery_level": 0.87, "battery_temp": 31.0,
+        "charging": False, "voltage": 48.2, "current": -3.1,
+        "max_charge_voltage": 54.6, "max_charge_current": 20.0,
+        "manual_charge": False, "auto_charge": False, "battery_cycle": 120,
+        "create_on": "2023-04-10T10:00:00.000Z"
+    },
+}
+
+
+def objects_with_json(status_class, payload, codec, samples):
+    history = []
+    for _ in range(samples):
+        status = status_class(keep_json=True)
+        status._parse(codec.decode(payload))
+        history.append(status)
+    return history
+
+
+def objects(status_class, payload, codec, samples):
+    history = []
+    for _ in range(samples):
+        status = status_class()
+        status._parse(codec.decode(payload))
+        history.append(status)
+    return history
+
+
+def records(status_class, payload, codec, samples):
+    history = []
+    status = status_class()
+    for _ in range(samples):
+        status._parse(codec.decode(payload))
+        history.append(status.snapshot())
+    return history
+
+
+def measure(build, *args):
+    tracemalloc.start()
+    history = build(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del history
+    return size
+
+
+def run(samples):
+    codec = default_codec()
+    modes = (("objects + json_data (before)", objects_with_json),
+             ("objects", objects), ("snapshot records", records))
+    print(f"{'status':<14} {'history':<30} {'bytes/sample':>12} {'ratio':>6}")
+    for status_class, response in RESPONSES.items():
+        payload = codec.encode(response)
+        base = None
+        for label, build in modes:
+            per_sample = measure(build, status_class, payload, codec,
+                                 samples) / samples
+            base = base or per_sample
+            print(f"{status_class.__name__:<14} {label:<30} "
+                  f"{per_sample:>12.0f} {per_sample / base:>6.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=36000)
+    run(parser.parse_args().samples)
@@ -0,0 +1,240 @@
+"""
+Benchmark suite of the transport and the API facades against simulated controllers, with regression tracking.
+
+The simulated controllers run in a child process, so the CPU time per request covers the client only. Measured are
+the round trip latency (p50/p99) and the requests/second of one connection for TcpTransport, StatusAPI,
+NavigationAPI and OtherAPI, the delivery rate of Notification, the encode/decode cost per message type and the
+memory per connection. Results are written as JSON; with --baseline every metric is compared against a stored
+result and the exit status is 1 if any metric got worse by more than --tolerance.
+
+usage:
+    python benchmarks/bench_suite.py [--number 2000] [--output results.json]
+    python benchmarks/bench_suite.py --baseline baseline.json [--tolerance 0.25]
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import statistics
+import sys
+import time
+import timeit
+import tracemalloc
+
+from bench_codec import MESSAGES
+from pyrobokit.agv_api import Notification, StatusAPI, StatusPose
+from pyrobokit.agv_api import navigation, other
+from pyrobokit.simulator import SimulatedFleet
+from pyrobokit.tcp_transport import API_PORT_OTHER, API_PORT_PUSH
+from pyrobokit.tcp_transport import API_PORT_STATE, API_PORT_TASK
+from pyrobokit.tcp_transport import TcpTransport, default_codec
+
+# metric name suffix: (unit, direction in which the metric improves)
+UNITS = {
+    "p50": ("ms", "lower"),
+    "p99": ("ms", "lower"),
+    "rps": ("1/s", "higher"),
+    "pipelined_rps": ("1/s", "higher"),
+    "cpu": ("us", "lower"),
+    "encode": ("us", "lower"),
+    "decode": ("us", "lower"),
+    "bytes": ("B", "lower"),
+    "rate": ("1/s", "higher"),
+}
+
+
+def serve(count, conn):
+    """child process: run count simulated controllers until told to stop through conn"""
+    # a short tick, pushes are sent at most once per tick
+    fleet = SimulatedFleet(count, tick=0.002)
+    fleet.start()
+    conn.send([[fleet.address(i, port) for port in
+                (API_PORT_STATE, API_PORT_TASK, API_PORT_OTHER,
+                 API_PORT_PUSH)] for i in range(count)])
+    try:
+        conn.recv()
+    except EOFError:
+        pass
+    fleet.stop()
+
+
+class Results:
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value):
+        unit, better = UNITS[name.rsplit(".", 1)[-1]]
+        self.metrics[name] = {"value": round(value, 3), "unit": unit,
+                              "better": better}
+        print(f"{name:<40} {value:>12.3f} {unit}")
+
+
+def measure_requests(results, name, request, number):
+    """latency, requests/second and CPU per request of request() called number times in a row"""
+    for _ in range(min(100, number)):
+        request()
+    latencies = []
+    cpu = time.process_time()
+    start = time.perf_counter()
+    for _ in range(number):
+        t = time.perf_counter()
+        request()
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    percentiles = statistics.quantiles(latencies, n=100)
+    results.add(f"{name}.p50", percentiles[49] * 1e3)
+    results.add(f"{name}.p99", percentiles[98] * 1e3)
+    results.add(f"{name}.rps", number / elapsed)
+    results.add(f"{name}.cpu", cpu / number * 1e6)
+
+
+def bench_transport(results, address, number, window=32):
+    transport = TcpTransport(*address, metrics=False)
+    measure_requests(results, "tcp_transport.1004",
+                     lambda: transport.send_n_receive(0, 1004), number)
+    # requests/second with up to window requests in flight
+    start = time.perf_counter()
+    for _ in range(0, number, window):
+        transport.wait([transport.submit(1004) for _ in range(window)], 5.0)
+    results.add("tcp_transport.1004.pipelined_rps",
+                (number // window * window or window) /
+                (time.perf_counter() - start))
+    transport.close()
+
+
+def bench_apis(results, addresses, number):
+    status_api = StatusAPI(*addresses[0])
+    pose = StatusPose()
+    measure_requests(results, "status_api.get_status.pose",
+                     lambda: status_api.get_status(pose), number)
+    status_api.close()
+
+    navigation_api = navigation.NavigationAPI(*addresses[1])
+    measure_requests(results, "navigation_api.execute.cancel",
+                     lambda: navigation_api.execute(navigation.TaskCancel()),
+                     number)
+    navigation_api.close()
+
+    other_api = other.OtherAPI(*addresses[2])
+    measure_requests(
+        results, "other_api.execute.set_do",
+        lambda: other_api.execute(other.SetDigitalOutput(1, True)), number)
+    other_api.close()
+
+
+def bench_notification(results, address, duration=2.0, interval=10):
+    """delivery rate and CPU per message of a push stream at interval ms"""
+    notification = Notification(*address)
+    measure_requests(results, "notification.configure",
+                     lambda: notification.configure_monitoring(interval),
+                     20)
+    received = []
+    notification.subscribe(received.append)
+    cpu = time.process_time()
+    time.sleep(duration)
+    cpu = time.process_time() - cpu
+    notification.close()
+    results.add("notification.push.rate", len(received) / duration)
+    results.add("notification.push.cpu", cpu / max(len(received), 1) * 1e6)
+
+
+def bench_codec(results, number):
+    codec = default_codec()
+    for label, msg in MESSAGES.items():
+        name = "codec." + label.split()[0]
+        data = codec.encode(msg)
+        encode = timeit.timeit(lambda: codec.encode(msg), number=number)
+        decode = timeit.timeit(lambda: codec.decode(data), number=number)
+        results.add(f"{name}.encode", encode / number * 1e6)
+        results.add(f"{name}.decode", decode / number * 1e6)
+
+
+def bench_memory(results, addresses):
+    """Python heap per connected TcpTransport (socket buffers of the kernel are not included)"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    transports = [TcpTransport(*address[0]) for address in addresses]
+    for transport in transports:
+        transport.send_n_receive(0, 1004)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    for transport in transports:
+        transport.close()
+    results.add("tcp_transport.connection.bytes", size / len(transports))
+
+
+def compare(metrics, baseline, tolerance):
+    """print the change of every metric against baseline, return the names of the regressions"""
+    regressions = []
+    print(f"\n{'metric':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, metric in metrics.items():
+        base = baseline.get(name)
+        if base is None or not base["value"]:
+            continue
+        change = metric["value"] / base["value"] - 1
+        worse = change > tolerance if metric["better"] == "lower" \
+            else change < -tolerance
+        if worse:
+            regressions.append(name)
+        print(f"{name:<40} {base['value']:>12.3f} {metric['value']:>12.3f} "
+              f"{change:>+8.1%}{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def run(number, connections, output, baseline, tolerance):
+    parent, child = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=serve,
+                                     args=(connections, child),
+                                     daemon=True)
+    server.start()
+    addresses = [[tuple(address) for address in robot]
+                 for robot in parent.recv()]
+    results = Results()
+    try:
+        bench_transport(results, addresses[0][0], number)
+        bench_apis(results, addresses[0], number)
+        bench_notification(results, addresses[0][3])
+        bench_codec(results, number)
+        bench_memory(results, addresses)
+    finally:
+        parent.send("stop")
+        parent.close()
+        server.join(5.0)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "number": number,
+        "metrics": results.metrics,
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(results.metrics,
+                                  json.load(f)["metrics"], tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond "
+                  f"{tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000,
+                        help="requests per measurement")
+    parser.add_argument("--connections", type=int, default=50,
+                        help="connections opened to measure the memory per connection")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative change of a metric reported as regression")
+    args = parser.parse_args()
+    sys.exit(run(args.number, args.connections, args.output, args.baseline,
+                 args.tolerance))
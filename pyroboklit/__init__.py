@@ -1,2 +1,2 @@
-import pyrobokit.tcp_transport
+import pyrobokit.tcp_transport
 import pyrobokit.agv_api
\ No newline at end of file
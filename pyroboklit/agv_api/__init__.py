@@ -1,3 +1,12 @@
-from .status import *
-from .push_notification import *
-from .utils import *
\ No newline at end of file
+from .status import *
+from .push_notification import *
+from .utils import *
+from .async_api import *
+from .fleet import *
+from .telemetry import *
+from .laser import *
+from .cache import *
+from .archive import *
+from .dispatch import *
+from .configuration import *
+from .control import *
\ No newline at end of file
@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           archive.py                               ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-24                               ║
+║ Last Modified:  2023-04-24                               ║
+║ Description:    Memory mapped, time indexed archive of   ║
+║                 pushed telemetry with downsampled tiers. ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+from .telemetry import TELEMETRY_FIELDS, TelemetryWindow
+from ..tcp_transport.log import get_logger
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = get_logger(__name__)
+
+# intervals of the downsampled tiers in seconds
+DEFAULT_TIERS = (1.0, 10.0, 60.0)
+
+# segment file layout:
+#   magic, sample count and schema length, followed by the json schema, padded to _HEADER_SIZE
+#   sparse index: time of every stride-th sample, capacity // stride + 1 float64
+#   column "t": capacity float64 wall clock times
+#   one column of capacity values per field
+_MAGIC = b"PRBKTLM1"
+_PREFIX = struct.Struct("<8sqL")
+_HEADER_SIZE = 4096
+_COUNT_OFFSET = 8
+_SUFFIX = ".seg"
+
+
+class _Segment:
+    """one memory mapped segment file of a fixed schema"""
+
+    def __init__(self,
+                 path,
+                 fields=None,
+                 dtype=None,
+                 capacity=0,
+                 stride=0,
+                 readonly=False):
+        self.path = path
+        mode = "r" if readonly else "r+"
+        if fields is None:
+            with open(path, "rb") as f:
+                magic, _, length = _PREFIX.unpack(f.read(_PREFIX.size))
+                if magic != _MAGIC:
+                    raise ValueError(f"{path} is not a telemetry segment")
+                schema = json.loads(f.read(length))
+            fields, dtype = schema["fields"], schema["dtype"]
+            capacity, stride = schema["capacity"], schema["stride"]
+        else:
+            schema = json.dumps({"fields": list(fields), "dtype": dtype,
+                                 "capacity": capacity,
+                                 "stride": stride}).encode()
+            with open(path, "wb") as f:
+                f.write(_PREFIX.pack(_MAGIC, 0, len(schema)) + schema)
+        self.fields = tuple(fields)
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        self.stride = stride
+        index_size = capacity // stride + 1
+        offset = _HEADER_SIZE + index_size * 8
+        column_size = _aligned(capacity * self.dtype.itemsize)
+        size = offset + capacity * 8 + column_size * len(self.fields)
+        if not readonly and os.path.getsize(path) < size:
+            # sparse on most file systems, the columns only take space once written
+            with open(path, "r+b") as f:
+                f.truncate(size)
+        self._map = np.memmap(path, np.uint8, mode, 0, size)
+        self._count = self._map[_COUNT_OFFSET:_COUNT_OFFSET + 8].view(np.int64)
+        self.index = self._map[_HEADER_SIZE:_HEADER_SIZE +
+                               index_size * 8].view(np.float64)
+        self.t = self._map[offset:offset + capacity * 8].view(np.float64)
+        offset += capacity * 8
+        self.columns = {"t": self.t}
+        for field in self.fields:
+            self.columns[field] = self._map[
+                offset:offset + capacity * self.dtype.itemsize].view(self.dtype)
+            offset += column_size
+        self._field_columns = [self.columns[field] for field in self.fields]
+
+    @property
+    def count(self):
+        return int(self._count[0])
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    @property
+    def t_first(self):
+        return float(self.t[0]) if self.count else None
+
+    @property
+    def t_last(self):
+        count = self.count
+        return float(self.t[count - 1]) if count else None
+
+    def append(self, t, values):
+        i = self.count
+        self.t[i] = t
+        for column, value in zip(self._field_columns, values):
+            column[i] = value
+        if i % self.stride == 0:
+            self.index[i // self.stride] = t
+        # the count is advanced last so readers never see a partially written sample
+        self._count[0] = i + 1
+
+    def search(self, t, side):
+        """position of t in the time column, narrowed down with the sparse index first"""
+        count = self.count
+        blocks = self.index[:(count + self.stride - 1) // self.stride]
+        block = max(int(np.searchsorted(blocks, t, side)) - 1, 0)
+        start = block * self.stride
+        stop = min(start + self.stride + 1, count)
+        return start + int(np.searchsorted(self.t[start:stop], t, side))
+
+    def window(self, t0, t1, fields):
+        start = 0 if t0 is None else self.search(t0, "left")
+        stop = self.count if t1 is None else self.search(t1, "right")
+        columns = {"t": self.t[start:stop]}
+        for field in fields:
+            column = self.columns.get(field)
+            columns[field] = column[start:stop] if column is not None \
+                else np.full(stop - start, np.nan, self.dtype)
+        return TelemetryWindow(columns)
+
+    def flush(self):
+        self._map.flush()
+
+    def close(self):
+        if self._map.mode != "r":
+            self._map.flush()
+        # drop the views, the file is unmapped once no other views of it are left
+        self.columns = self.index = self.t = self._count = None
+        self._field_columns = self._map = None
+
+
+def _aligned(size):
+    return (size + 7) // 8 * 8
+
+
+def _tier_name(interval):
+    return "raw" if not interval else f"{interval:g}s"
+
+
+class _SegmentSeries:
+    """segments of one robot and tier in a directory, named by the time of their first sample"""
+
+    def __init__(self, directory, readonly=False):
+        self.directory = directory
+        self.readonly = readonly
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+        self._segments = {}
+
+    def names(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.endswith(_SUFFIX))
+
+    def segment(self, name):
+        segment = self._segments.get(name)
+        if segment is None:
+            segment = self._segments[name] = _Segment(
+                os.path.join(self.directory, name), readonly=self.readonly)
+        return segment
+
+    def create(self, t, fields, dtype, capacity, stride):
+        start = int(t * 1000)
+        while os.path.exists(
+                os.path.join(self.directory, f"{start:016d}{_SUFFIX}")):
+            start += 1
+        name = f"{start:016d}{_SUFFIX}"
+        segment = self._segments[name] = _Segment(
+            os.path.join(self.directory, name), fields, dtype, capacity,
+            stride)
+        return segment
+
+    def overlapping(self, t0, t1):
+        """segments that may hold samples between t0 and t1"""
+        names = self.names()
+        starts = [int(name[:-len(_SUFFIX)]) / 1000 for name in names]
+        for i, name in enumerate(names):
+            if t1 is not None and starts[i] > t1:
+                break
+            if t0 is not None and i + 1 < len(names) and starts[i + 1] < t0:
+                continue
+            yield self.segment(name)
+
+    def close(self):
+        for segment in self._segments.values():
+            segment.close()
+        self._segments = {}
+
+
+class _Downsampler:
+    """mean of the samples in consecutive buckets of interval seconds"""
+
+    def __init__(self, interval, size):
+        self.interval = interval
+        self.bucket = None
+        self.sums = np.zeros(size)
+        self.counts = np.zeros(size)
+
+    def add(self, t, values):
+        """add a sample, returns (bucket start time, means) when the sample starts a new bucket"""
+        bucket = int(t // self.interval)
+        row = None
+        if bucket != self.bucket:
+            row = self.take()
+            self.bucket = bucket
+        valid = ~np.isnan(values)
+        np.add(self.sums, values, out=self.sums, where=valid)
+        self.counts += valid
+        return row
+
+    def take(self):
+        if self.bucket is None or not self.counts.any():
+            return None
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = self.sums / self.counts
+        self.sums[:] = 0.0
+        self.counts[:] = 0.0
+        return self.bucket * self.interval, means
+
+
+class ArchiveWriter:
+
+    def __init__(self, archive, robot: str) -> None:
+        """
+        Appends the telemetry of one robot to a TelemetryArchive, see TelemetryArchive.writer().
+
+        Args:
+            archive (TelemetryArchive): the archive
+            robot (str): robot name, used as directory name
+        """
+        self.archive = archive
+        self.robot = robot
+        self.fields = archive.fields
+        self._lock = threading.Lock()
+        self._series = {}
+        self._current = {}
+        for interval in (0.0, ) + archive.tiers:
+            series = self._series[interval] = _SegmentSeries(
+                archive.directory(robot, interval))
+            names = series.names()
+            if names:
+                # continue the latest segment if it has the same schema and room left
+                segment = series.segment(names[-1])
+                if segment.fields == self.fields and not segment.full and \
+                        segment.dtype == np.dtype(archive.dtype):
+                    self._current[interval] = segment
+        self._downsamplers = [
+            _Downsampler(interval, len(self.fields))
+            for interval in archive.tiers
+        ]
+
+    def append(self, data, t=None):
+        """add a pushed message, missing and non-numeric fields are archived as NaN
+
+        Args:
+            data (dict): decoded push message
+            t (float, optional): time.time() receive time. Defaults to now.
+        """
+        t = time.time() if t is None else t
+        values = np.array([
+            value if isinstance(value, (int, float)) else np.nan
+            for value in map(data.get, self.fields)
+        ], np.float64)
+        with self._lock:
+            self._write(0.0, t, values)
+            for downsampler in self._downsamplers:
+                row = downsampler.add(t, values)
+                if row is not None:
+                    self._write(downsampler.interval, *row)
+
+    def _write(self, interval, t, values):
+        segment = self._current.get(interval)
+        if segment is not None and (segment.full or
+                                    (segment.count and t < segment.t_last)):
+            # full, or the clock went backwards: start a new segment so each stays sorted by time
+            segment = None
+        if segment is None:
+            archive = self.archive
+            segment = self._current[interval] = self._series[interval].create(
+                t, self.fields, archive.dtype, archive.segment_size,
+                archive.stride)
+        segment.append(t, values)
+
+    def attach(self, notification):
+        """archive every message pushed to a Notification (runs on its reader thread)"""
+        notification.subscribe(self.append)
+
+    def detach(self, notification):
+        notification.unsubscribe(self.append)
+
+    def flush(self):
+        """write the open segments to disk"""
+        with self._lock:
+            for segment in self._current.values():
+                segment.flush()
+
+    def close(self):
+        """write the pending downsampled buckets and close the segments"""
+        with self._lock:
+            for downsampler in self._downsamplers:
+                row = downsampler.take()
+                if row is not None:
+                    self._write(downsampler.interval, *row)
+            for series in self._series.values():
+                series.close()
+            self._current = {}
+
+
+class TelemetryArchive:
+
+    def __init__(self,
+                 root: str,
+                 fields=TELEMETRY_FIELDS,
+                 tiers=DEFAULT_TIERS,
+                 segment_size: int = 1 << 20,
+                 stride: int = 1024,
+                 dtype: str = "float32") -> None:
+        """
+        Archive of the pushed telemetry of many robots for weeks of history, stored as memory mapped columnar
+        segment files: root/<robot>/<tier>/<time of the first sample>.seg
+
+        Every segment holds up to segment_size samples of a fixed set of fields, one column per field and a column
+        "t" of time.time() receive times, plus a sparse index holding the time of every stride-th sample. A query
+        finds the segments by their file names, the position in a segment with the sparse index and a search in one
+        block of stride samples, and returns views of the memory mapped columns, so only the pages in the queried
+        range are read from disk. Besides the raw samples, the mean of every tier interval is archived in its own
+        downsampled tier.
+
+        usage:
+        ```python
+        archive = TelemetryArchive("/var/lib/agv-telemetry")
+        writer = archive.writer("robot1")
+        writer.attach(notification)
+        ...
+        window = archive.query("robot1", ("x", "y"), t0=time.time() - 3600, t1=time.time())
+        print(window.t, window.x, window.distance())
+        hourly = archive.query("robot1", "battery_level", t0, t1, tier=60.0)
+        ```
+
+        Args:
+            root (str): archive directory, created if missing
+            fields (tuple, optional): numeric fields to archive. Defaults to TELEMETRY_FIELDS.
+            tiers (tuple, optional): intervals of the downsampled tiers in seconds. Defaults to (1.0, 10.0, 60.0).
+            segment_size (int, optional): samples per segment file. Defaults to 1048576.
+            stride (int, optional): samples per entry of the sparse time index. Defaults to 1024.
+            dtype (str, optional): NumPy dtype of the field columns. Defaults to "float32".
+        """
+        if np is None:
+            raise ImportError("numpy is not installed (pip install numpy)")
+        self.root = root
+        self.fields = tuple(fields)
+        self.tiers = tuple(sorted(tiers))
+        self.segment_size = segment_size
+        self.stride = stride
+        self.dtype = dtype
+        self._writers = {}
+        self._readers = {}
+        os.makedirs(root, exist_ok=True)
+
+    def directory(self, robot, tier=None):
+        return os.path.join(self.root, robot, _tier_name(tier))
+
+    def robots(self):
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, name)))
+
+    def writer(self, robot):
+        """return the ArchiveWriter of a robot, one per robot and archive"""
+        writer = self._writers.get(robot)
+        if writer is None:
+            writer = self._writers[robot] = ArchiveWriter(self, robot)
+        return writer
+
+    def query(self, robot, fields, t0=None, t1=None, tier=None):
+        """samples of a robot between the times t0 and t1 (inclusive)
+
+        Args:
+            robot (str): robot name
+            fields (str | tuple): field or fields to return
+            t0 (float, optional): time.time() of the first sample. Defaults to the first archived sample.
+            t1 (float, optional): time.time() of the last sample. Defaults to the last archived sample.
+            tier (float, optional): interval of a downsampled tier, None for the raw samples. Defaults to None.
+
+        Returns:
+            TelemetryWindow: columns "t" and the fields, views of the segment if the range lies in one segment
+                             (valid until the archive is closed), otherwise copies
+        """
+        fields = (fields, ) if isinstance(fields, str) else tuple(fields)
+        key = (robot, tier or 0.0)
+        series = self._readers.get(key)
+        if series is None:
+            series = self._readers[key] = _SegmentSeries(
+                self.directory(robot, tier), readonly=True)
+        windows = [
+            segment.window(t0, t1, fields)
+            for segment in series.overlapping(t0, t1)
+        ]
+        windows = [window for window in windows if len(window)]
+        if len(windows) == 1:
+            return windows[0]
+        names = ("t", ) + fields
+        if not windows:
+            return TelemetryWindow(
+                {name: np.empty(0, np.float64) for name in names})
+        return TelemetryWindow({
+            name: np.concatenate([window[name] for window in windows])
+            for name in names
+        })
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+        for series in self._readers.values():
+            series.close()
+        self._writers = {}
+        self._readers = {}
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           async_api.py                             ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-05                               ║
+║ Last Modified:  2023-04-05                               ║
+║ Description:    asyncio versions of the robotkit api     ║
+║                 port classes.                            ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import asyncio
+from ..tcp_transport import AsyncTcpTransport
+from ..tcp_transport import API_PORT_STATE, API_PORT_TASK, API_PORT_OTHER, API_PORT_PUSH
+
+
+class _AsyncAPI:
+
+    def __init__(self, ip: str, port: int) -> None:
+        self.ip = ip
+        self.port = port
+        self.transport = AsyncTcpTransport(ip, port)
+
+    @property
+    def connected(self):
+        return self.transport.connected
+
+    async def connect(self, timeout=None):
+        """connect to the AGV port, returns True if connected"""
+        return await self.transport.connect(timeout)
+
+    def close(self):
+        self.transport.disconnect()
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+class AsyncStatusAPI(_AsyncAPI):
+
+    def __init__(self, ip: str, port: int = API_PORT_STATE) -> None:
+        """
+        asyncio version of StatusAPI, it accepts the same status classes (StatusBattery, StatusPose etc.).
+
+        Usage:
+        ```python
+        async with AsyncStatusAPI("127.0.0.1") as status:
+            pose = StatusPose()
+            await status.get_status(pose)
+            print(pose.x, pose.y)
+        ```
+
+        Args:
+            ip (str): AGV ip address
+            port (int, optional): port at which AGV STATE API is implemented. Defaults to API_PORT_STATE.
+        """
+        super().__init__(ip, port)
+
+    async def get_status(self, status, timeout=None):
+        """exchange status with AGV for the status class like BatteryStatus, NavigationStatus etc.
+        """
+        data = await self.transport.send_n_receive(status.requestId,
+                                                   status.messageType,
+                                                   status.msg, timeout)
+        return status._parse(data)
+
+    async def get_status_many(self, statuses, timeout=None):
+        """exchange several statuses concurrently on the same connection, returns the success of each query"""
+        return list(await asyncio.gather(
+            *[self.get_status(status, timeout) for status in statuses]))
+
+
+class AsyncNavigationAPI(_AsyncAPI):
+
+    def __init__(self, ip: str, port: int = API_PORT_TASK) -> None:
+        """
+        asyncio version of NavigationAPI, it accepts the same task classes (TaskOneStation, TaskCancel etc.).
+
+        Args:
+            ip (str): AGV ip address
+            port (int, optional): navigation port. Defaults to API_PORT_TASK.
+        """
+        super().__init__(ip, port)
+
+    async def execute(self, task, timeout=None):
+        """Excetute a task on the AGV, see NavigationAPI.execute"""
+        response = await self.transport.send_n_receive(task.requestId,
+                                                       task.messageType,
+                                                       task._prepare(),
+                                                       timeout)
+        return task._parse(response)
+
+
+class AsyncOtherAPI(_AsyncAPI):
+
+    def __init__(self, ip: str, port: int = API_PORT_OTHER) -> None:
+        """
+        asyncio version of OtherAPI, it accepts the same request classes (SetDigitalOutput, ForkliftHeight etc.).
+
+        Args:
+            ip (str): IP address of the AGV's SEER controller
+            port (int, optional): API port of Other functions. Defaults to API_PORT_OTHER.
+        """
+        super().__init__(ip, port)
+
+    async def execute(self, request, timeout=None):
+        """execute a request and return the success of the request, see OtherAPI.execute"""
+        response = await self.transport.send_n_receive(request.requestId,
+                                                       request.messageType,
+                                                       request._prepare(),
+                                                       timeout)
+        return request._parse(response)
+
+
+class AsyncNotification(_AsyncAPI):
+
+    def __init__(self, ip: str, port: int = API_PORT_PUSH) -> None:
+        """
+        asyncio version of Notification.
+
+        Usage:
+        ```python
+        notification = AsyncNotification("127.0.0.1")
+        await notification.connect()
+        await notification.configure_monitoring(interval=1000)
+        while True:
+            data = await notification.receive()
+        ```
+        """
+        super().__init__(ip, port)
+
+    async def configure_monitoring(self,
+                                   interval=1000,
+                                   parameters=["x", "y", "w"],
+                                   defaults=True):
+        """see Notification.configure_monitoring"""
+        if defaults:
+            parameters = [
+                "x", "y", "angle", "confidence", "vx", "vy", "w",
+                "current_station", "is_stop", "fork", "target_point",
+                "target_label", "target_id", "target_dist", "task_status",
+                "running_status", "task_type", "emergency", "charging",
+                "battery_level", "map", "battery_temp", "voltage", "current"
+            ]
+
+        msg = {"interval": interval, "included_fields": parameters}
+        return await self.transport.send_n_receive(1, 9300, msg)
+
+    async def receive(self, timeout=None):
+        """wait for the next pushed message, returns None on timeout or when the connection is closed"""
+        return await self.transport.listen(timeout)
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           cache.py                                 ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-21                               ║
+║ Last Modified:  2023-04-21                               ║
+║ Description:    TTL cache of status responses with       ║
+║                 request coalescing.                      ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import time
+import threading
+from concurrent.futures import Future
+from ..tcp_transport.log import get_logger
+from .status import StatusPose, StatusSpeed, StatusBattery, StatusBlocked
+from .status import StatusLaserData, StatusEmergencyStop, StatusNavigation
+from .status import StatusForklift
+
+logger = get_logger(__name__)
+
+# seconds a response stays fresh, per status class
+DEFAULT_TTLS = {
+    StatusPose: 0.05,
+    StatusSpeed: 0.05,
+    StatusLaserData: 0.0,
+    StatusBlocked: 0.2,
+    StatusEmergencyStop: 0.2,
+    StatusNavigation: 0.2,
+    StatusForklift: 0.2,
+    StatusBattery: 5.0,
+}
+
+
+class CacheCounters:
+    """hit and miss counters of one status class"""
+
+    __slots__ = ("hits", "stale_hits", "misses", "coalesced")
+
+    def __init__(self):
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def hit_ratio(self):
+        total = self.hits + self.stale_hits + self.misses + self.coalesced
+        return (self.hits + self.stale_hits) / total if total else 0.0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class StatusCache:
+
+    def __init__(self,
+                 ttls: dict = None,
+                 default_ttl: float = 0.0,
+                 stale_ttl: float = 0.0) -> None:
+        """
+        Cache of status responses for StatusAPI. Responses are cached per AGV (ip and port of the transport), so one
+        cache can be shared by the StatusAPIs of a fleet.
+
+        A response younger than the TTL of its status class is served from the cache. A response that is older but
+        still within stale_ttl beyond its TTL is served as well while a background request refreshes it
+        (stale-while-revalidate). Concurrent queries of a status that is not cached share one request to the AGV.
+
+        usage:
+        ```python
+        cache = StatusCache({StatusPose: 0.05, StatusBattery: 5.0}, stale_ttl=0.5)
+        status = StatusAPI("127.0.0.1", cache=cache)
+        status.get_status(pose)  # from the AGV
+        status.get_status(pose)  # from the cache if within 50 ms
+        print(cache.stats())
+        ```
+
+        Args:
+            ttls (dict, optional): seconds a response stays fresh per status class, merged over DEFAULT_TTLS.
+                                   Defaults to None.
+            default_ttl (float, optional): TTL of status classes not in ttls. Defaults to 0.0.
+            stale_ttl (float, optional): seconds after the TTL during which stale responses are served while they are
+                                         refreshed, 0 disables stale-while-revalidate. Defaults to 0.0.
+        """
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        # (response, time.monotonic() when it was received) by (ip, port, messageType, msg)
+        self._entries = {}
+        # futures of the requests in flight by (ip, port, messageType, msg)
+        self._inflight = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def ttl(self, status):
+        return self.ttls.get(type(status), self.default_ttl)
+
+    def counters(self, status_class):
+        counters = self._counters.get(status_class)
+        if counters is None:
+            counters = self._counters.setdefault(status_class,
+                                                 CacheCounters())
+        return counters
+
+    def stats(self):
+        """return {status class name: {"hits", "stale_hits", "misses", "coalesced"}}"""
+        return {
+            status_class.__name__: counters.as_dict()
+            for status_class, counters in list(self._counters.items())
+        }
+
+    def get(self, transport, status):
+        """return the response of a status query, from the cache or from the AGV
+
+        Args:
+            transport (TcpTransport): transport to query the AGV through
+            status (class): status object like StatusPose, StatusBattery etc.
+
+        Returns:
+            dict: response, None if the request failed
+        """
+        data = self.cached(transport, status)
+        if data is not None:
+            return data
+        key = _key(transport, status)
+        counters = self.counters(type(status))
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+                counters.misses += 1
+            else:
+                counters.coalesced += 1
+        if owner:
+            self._fetch(transport, status.messageType, status.msg, key, future)
+        return future.result()
+
+    def cached(self, transport, status):
+        """return the cached response of a status query, or None if it has to be requested. A stale response is
+        returned and refreshed in the background. Statuses with a TTL of 0 are never served stale."""
+        key = _key(transport, status)
+        counters = self.counters(type(status))
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[1]
+            ttl = self.ttl(status)
+            if age < ttl:
+                counters.hits += 1
+                return entry[0]
+            if ttl > 0 and age < ttl + self.stale_ttl:
+                counters.stale_hits += 1
+                self._revalidate(transport, status, key)
+                return entry[0]
+        return None
+
+    def store(self, transport, status, data):
+        """cache the response of a status query requested through transport outside of get() (counted as a miss),
+        failed responses are not cached"""
+        self.counters(type(status)).misses += 1
+        if data and data.get("ret_code", 0) == 0:
+            self._entries[_key(transport, status)] = (data, time.monotonic())
+
+    def _revalidate(self, transport, status, key):
+        with self._lock:
+            if key in self._inflight:
+                return
+            future = self._inflight[key] = Future()
+        threading.Thread(target=self._fetch,
+                         args=(transport, status.messageType, status.msg,
+                               key, future),
+                         name="status-cache-refresh",
+                         daemon=True).start()
+
+    def _fetch(self, transport, messageType, msg, key, future):
+        try:
+            data = transport.send_n_receive(0, messageType, msg)
+        except Exception as e:
+            logger.error("[Status Cache] :: Error: %s", e)
+            data = None
+        with self._lock:
+            if data and data.get("ret_code", 0) == 0:
+                self._entries[key] = (data, time.monotonic())
+            del self._inflight[key]
+        future.set_result(data)
+
+    def invalidate(self, status_class=None):
+        """drop the cached responses of a status class of all AGVs, or everything if None"""
+        with self._lock:
+            if status_class is None:
+                self._entries.clear()
+                return
+            message_type = status_class.messageType
+            for key in [key for key in self._entries
+                        if key[2] == message_type]:
+                del self._entries[key]
+
+
+def _key(transport, status):
+    return (transport.ip, transport.port, status.messageType,
+            repr(status.msg) if status.msg else "")
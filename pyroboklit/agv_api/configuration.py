@@ -0,0 +1,534 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           configuration.py                         ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-26                               ║
+║ Last Modified:  2023-04-26                               ║
+║ Description:    Map download and a local cache of maps   ║
+║                 with station and route indexes.          ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import heapq
+import json
+import math
+import os
+import threading
+from ..tcp_transport import TcpTransport, TransportPool
+from ..tcp_transport import API_PORT_CONFIG, API_PORT_STATE
+from ..tcp_transport.log import get_logger
+from .status import StatusAPI, StatusMap, StatusStation
+from .utils import check_success
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+logger = get_logger(__name__)
+
+
+class MapDownload:
+
+    def __init__(self, map_name: str) -> None:
+        """
+        Download a map file (.smap) from the AGV, the decoded map is stored in `map`.
+
+        Args:
+            map_name (str): name of the map without extension
+        """
+        self.requestId = 0
+        self.messageType = 4011
+        self.msg = {}
+        self.map_name = map_name
+        self.map = None
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        self.msg = {"map_name": self.map_name}
+        return self.msg
+
+    def _parse(self, response):
+        if not check_success(response):
+            return False
+        # the response body is the map file, without the fields added by the controller and the transport
+        self.map = {
+            key: value
+            for key, value in response.items()
+            if key not in ("ret_code", "err_msg", "create_on", "timestamp",
+                           "received_at")
+        }
+        return True
+
+
+class ConfigAPI:
+
+    def __init__(self,
+                 ip: str,
+                 port: int = API_PORT_CONFIG,
+                 lazy: bool = False,
+                 pool: TransportPool = None):
+        """Configuration API class. This class is used to execute requests on the configuration port.
+
+        usage:
+        ```python
+        config = ConfigAPI("127.0.0.1")
+        download = MapDownload("warehouse")
+        if config.execute(download):
+            print(download.map["header"])
+        ```
+
+        Args:
+            ip (str): IP address of the AGV's SEER controller
+            port (int, optional): API port of the configuration functions. Defaults to API_PORT_CONFIG.
+            lazy (bool, optional): connect in the background instead of in the constructor. Defaults to False.
+            pool (TransportPool, optional): share the transport of (ip, port) from this pool instead of opening a
+                                            connection of its own. Defaults to None.
+        """
+        self.ip = ip
+        self.port = port
+        self.pool = pool
+        if pool is None:
+            self.transport = TcpTransport(ip, port, lazy=lazy)
+        else:
+            self.transport = pool.acquire(ip, port, lazy)
+
+    @property
+    def connected(self):
+        return self.transport.connected
+
+    def close(self):
+        if self.pool is None:
+            self.transport.close()
+        else:
+            self.pool.release(self.transport)
+
+    def execute(self, request):
+        """execute a request and return the response
+
+        Args:
+            request (class): configuration request class (e.g. MapDownload)
+
+        Returns:
+            bool: returns the success of the request, True if successful, False if not.
+        """
+        return request._execute(self.transport)
+
+
+class StationIndex:
+
+    def __init__(self, ids, xy, leaf_size: int = 16) -> None:
+        """
+        KD-tree over station positions for nearest station queries. Uses scipy.spatial.cKDTree if scipy is
+        installed, otherwise a KD-tree whose leaves of up to leaf_size stations are searched with NumPy.
+
+        Args:
+            ids (list): station ids
+            xy (array): (N, 2) station positions
+            leaf_size (int, optional): stations per leaf. Defaults to 16.
+        """
+        if np is None:
+            raise ImportError("numpy is not installed (pip install numpy)")
+        self.ids = list(ids)
+        self.xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        self.leaf_size = leaf_size
+        self._tree = cKDTree(self.xy) if cKDTree is not None and len(
+            self.ids) else None
+        # nodes as (split dimension, split value, left, right) or (-1, start, stop) for leaves over _order
+        self._nodes = []
+        self._order = np.arange(len(self.ids))
+        if self._tree is None and len(self.ids):
+            self._build(0, len(self.ids), 0)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _build(self, start, stop, depth):
+        node = len(self._nodes)
+        if stop - start <= self.leaf_size:
+            self._nodes.append((-1, start, stop, None))
+            return node
+        self._nodes.append(None)
+        points = self.xy[self._order[start:stop]]
+        # split along the wider extent at the median
+        dim = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+        middle = (stop - start) // 2
+        order = np.argpartition(points[:, dim], middle)
+        self._order[start:stop] = self._order[start:stop][order]
+        split = float(self.xy[self._order[start + middle], dim])
+        left = self._build(start, start + middle, depth + 1)
+        right = self._build(start + middle, stop, depth + 1)
+        self._nodes[node] = (dim, split, left, right)
+        return node
+
+    def nearest(self, x, y, k=1):
+        """the k stations closest to (x, y)
+
+        Returns:
+            list: (station id, distance) pairs, closest first
+        """
+        k = min(k, len(self.ids))
+        if not k:
+            return []
+        if self._tree is not None:
+            distances, indices = self._tree.query((x, y), k)
+            distances, indices = np.atleast_1d(distances), np.atleast_1d(
+                indices)
+            return [(self.ids[i], float(d))
+                    for i, d in zip(indices.tolist(), distances.tolist())]
+        # max heap of the k best as (-distance, index)
+        best = []
+        self._search(0, x, y, k, best)
+        return [(self.ids[i], -d) for d, i in sorted(best, reverse=True)]
+
+    def _search(self, node, x, y, k, best):
+        dim, split, left, right = self._nodes[node]
+        if dim < 0:
+            indices = self._order[split:left]
+            points = self.xy[indices]
+            distances = np.hypot(points[:, 0] - x, points[:, 1] - y)
+            for d, i in zip(distances.tolist(), indices.tolist()):
+                if len(best) < k:
+                    heapq.heappush(best, (-d, i))
+                elif d < -best[0][0]:
+                    heapq.heapreplace(best, (-d, i))
+            return
+        offset = (x, y)[dim] - split
+        near, far = (left, right) if offset < 0 else (right, left)
+        self._search(near, x, y, k, best)
+        if len(best) < k or abs(offset) < -best[0][0]:
+            self._search(far, x, y, k, best)
+
+    def within(self, x, y, radius):
+        """ids of the stations within radius of (x, y)"""
+        if self._tree is not None:
+            return [self.ids[i] for i in self._tree.query_ball_point(
+                (x, y), radius)]
+        inside = np.hypot(self.xy[:, 0] - x, self.xy[:, 1] - y) <= radius
+        return [self.ids[i] for i in np.flatnonzero(inside).tolist()]
+
+
+def _curve_length(curve):
+    """length of a route of the advancedCurveList of a map, Bezier curves are approximated by 16 segments"""
+    start, end = curve["startPos"]["pos"], curve["endPos"]["pos"]
+    points = [(start.get("x", 0.0), start.get("y", 0.0))]
+    if "controlPos1" in curve and "controlPos2" in curve:
+        c1, c2 = curve["controlPos1"], curve["controlPos2"]
+        p0, p1 = points[0], (c1.get("x", 0.0), c1.get("y", 0.0))
+        p2, p3 = (c2.get("x", 0.0), c2.get("y", 0.0)), (end.get("x", 0.0),
+                                                        end.get("y", 0.0))
+        for i in range(1, 16):
+            t = i / 16
+            a, b, c, d = (1 - t)**3, 3 * (1 - t)**2 * t, 3 * (1 - t) * t**2, t**3
+            points.append((a * p0[0] + b * p1[0] + c * p2[0] + d * p3[0],
+                           a * p0[1] + b * p1[1] + c * p2[1] + d * p3[1]))
+    points.append((end.get("x", 0.0), end.get("y", 0.0)))
+    return sum(
+        math.hypot(x1 - x0, y1 - y0)
+        for (x0, y0), (x1, y1) in zip(points, points[1:]))
+
+
+class RouteGraph:
+
+    def __init__(self, curves=()) -> None:
+        """
+        Directed graph of the routes of a map, built from the advancedCurveList of the map file. Routes that can be
+        driven both ways are two curves in the map.
+
+        Args:
+            curves (list, optional): advancedCurveList entries. Defaults to ().
+        """
+        # {station: {next station: route length in m}}
+        self.adjacency = {}
+        self._distances = {}
+        for curve in curves:
+            try:
+                start = curve["startPos"]["instanceName"]
+                end = curve["endPos"]["instanceName"]
+                length = _curve_length(curve)
+            except KeyError:
+                continue
+            edges = self.adjacency.setdefault(start, {})
+            edges[end] = min(length, edges.get(end, math.inf))
+            self.adjacency.setdefault(end, {})
+
+    def neighbors(self, station):
+        return self.adjacency.get(station, {})
+
+    def distances_from(self, source):
+        """route distances from source to every reachable station (Dijkstra), cached per source"""
+        distances = self._distances.get(source)
+        if distances is not None:
+            return distances
+        distances = {source: 0.0}
+        queue = [(0.0, source)]
+        while queue:
+            distance, station = heapq.heappop(queue)
+            if distance > distances[station]:
+                continue
+            for neighbor, length in self.neighbors(station).items():
+                candidate = distance + length
+                if candidate < distances.get(neighbor, math.inf):
+                    distances[neighbor] = candidate
+                    heapq.heappush(queue, (candidate, neighbor))
+        self._distances[source] = distances
+        return distances
+
+    def shortest_path(self, source, target):
+        """shortest route from source to target
+
+        Returns:
+            tuple: (length in m, list of station ids from source to target), (inf, []) if target is unreachable
+        """
+        previous = {source: None}
+        distances = {source: 0.0}
+        queue = [(0.0, source)]
+        while queue:
+            distance, station = heapq.heappop(queue)
+            if station == target:
+                path = []
+                while station is not None:
+                    path.append(station)
+                    station = previous[station]
+                return distance, path[::-1]
+            if distance > distances[station]:
+                continue
+            for neighbor, length in self.neighbors(station).items():
+                candidate = distance + length
+                if candidate < distances.get(neighbor, math.inf):
+                    distances[neighbor] = candidate
+                    previous[neighbor] = station
+                    heapq.heappush(queue, (candidate, neighbor))
+        return math.inf, []
+
+
+class RobotMap:
+
+    def __init__(self, name: str, md5: str, smap: dict,
+                 stations: list = None) -> None:
+        """
+        A map of the AGV with its indexes: station id -> pose, a KD-tree of the station positions and the route
+        graph.
+
+        usage:
+        ```python
+        robot_map = MapCache().load("192.168.0.10")
+        print(robot_map.stations["LM15"])
+        station, distance = robot_map.nearest(pose.x, pose.y)[0]
+        length, path = robot_map.routes.shortest_path("LM1", "LM15")
+        dispatcher = FleetDispatcher(navigators, robot_map.positions(), distance=robot_map.route_distance)
+        ```
+
+        Args:
+            name (str): map name
+            md5 (str): MD5 checksum of the map file reported by the AGV
+            smap (dict): decoded map file
+            stations (list, optional): stations of a 1301 query, taken from the map file if None. Defaults to None.
+        """
+        if np is None:
+            raise ImportError("numpy is not installed (pip install numpy)")
+        self.name = name
+        self.md5 = md5
+        self.smap = smap
+        if stations is None:
+            stations = [{
+                "id": point.get("instanceName"),
+                "type": point.get("className", ""),
+                "x": point.get("pos", {}).get("x", 0.0),
+                "y": point.get("pos", {}).get("y", 0.0),
+                "r": point.get("dir", 0.0),
+                "desc": point.get("desc", "")
+            } for point in smap.get("advancedPointList", [])]
+        self.station_list = stations
+        # {station id: {"x", "y", "angle", "type", "desc"}}
+        self.stations = {
+            station["id"]: {
+                "x": station.get("x", 0.0),
+                "y": station.get("y", 0.0),
+                "angle": station.get("r", 0.0),
+                "type": station.get("type", ""),
+                "desc": station.get("desc", "")
+            }
+            for station in stations if station.get("id")
+        }
+        ids = list(self.stations)
+        self.index = StationIndex(
+            ids, [(self.stations[i]["x"], self.stations[i]["y"]) for i in ids])
+        self.routes = RouteGraph(smap.get("advancedCurveList", []))
+
+    def positions(self):
+        """station positions as {id: (x, y)}"""
+        return {
+            station: (pose["x"], pose["y"])
+            for station, pose in self.stations.items()
+        }
+
+    def pose(self, station):
+        """(x, y, angle) of a station"""
+        pose = self.stations[station]
+        return pose["x"], pose["y"], pose["angle"]
+
+    def nearest(self, x, y, k=1):
+        """the k stations closest to (x, y) as (station id, distance) pairs"""
+        return self.index.nearest(x, y, k)
+
+    def route_distance(self, robot_xy, station_xy):
+        """(robots, stations) matrix of travel distances along the routes: from each robot straight to its nearest
+        station, then along the route graph. Unreachable stations are inf. Can be used as distance of
+        FleetDispatcher.
+
+        Args:
+            robot_xy (ndarray): (R, 2) robot positions
+            station_xy (ndarray): (S, 2) positions of stations of this map
+        """
+        targets = [self.index.nearest(x, y)[0][0]
+                   for x, y in np.asarray(station_xy).tolist()]
+        distances = np.full((len(robot_xy), len(targets)), np.inf)
+        for i, (x, y) in enumerate(np.asarray(robot_xy).tolist()):
+            if math.isnan(x) or math.isnan(y):
+                continue
+            start, offset = self.index.nearest(x, y)[0]
+            reachable = self.routes.distances_from(start)
+            distances[i] = [
+                offset + reachable.get(target, math.inf)
+                for target in targets
+            ]
+        return distances
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "md5": self.md5,
+            "stations": self.station_list,
+            "smap": self.smap
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"], data["md5"], data["smap"], data["stations"])
+
+
+def _valid_checksum(md5):
+    """a checksum reported by the AGV is used as cache key and file name only if it is not empty and alphanumeric"""
+    return bool(md5) and md5.isalnum()
+
+
+class MapCache:
+
+    def __init__(self, directory: str = None) -> None:
+        """
+        Maps of the AGVs, downloaded once per map MD5 and kept on disk and in memory. load() only asks the AGV for
+        the name and MD5 of its current map (1300); the map file (4011) and the stations (1301) are downloaded when
+        the checksum is not cached yet, so restarts and robots sharing a map reuse the cached map. Maps reported
+        without a usable checksum are downloaded on every load() and not cached.
+
+        usage:
+        ```python
+        maps = MapCache()
+        robot_map = maps.load("192.168.0.10")
+        print(robot_map.name, len(robot_map.stations))
+        ```
+
+        Args:
+            directory (str, optional): cache directory. Defaults to ~/.cache/pyrobokit/maps.
+        """
+        self.directory = directory or os.path.join(
+            os.path.expanduser("~"), ".cache", "pyrobokit", "maps")
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def _path(self, md5):
+        return os.path.join(self.directory, f"{md5}.json")
+
+    def cached(self, md5):
+        """the RobotMap of a checksum from memory or disk, None if it is not cached"""
+        if not _valid_checksum(md5):
+            return None
+        robot_map = self._maps.get(md5)
+        if robot_map is not None:
+            return robot_map
+        try:
+            with open(self._path(md5)) as f:
+                robot_map = RobotMap.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning("[Map Cache] :: Ignoring cached map %s: %s",
+                               md5, e)
+            return None
+        self._maps[md5] = robot_map
+        return robot_map
+
+    def store(self, robot_map):
+        """add a map to the cache, written to disk under its checksum. Maps without a checksum are not cached."""
+        if not _valid_checksum(robot_map.md5):
+            logger.warning("[Map Cache] :: Not caching map %s without checksum",
+                           robot_map.name)
+            return
+        self._maps[robot_map.md5] = robot_map
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(robot_map.md5)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(robot_map.to_dict(), f)
+        os.replace(temporary, path)
+
+    def load(self,
+             ip: str,
+             state_port: int = API_PORT_STATE,
+             config_port: int = API_PORT_CONFIG,
+             pool: TransportPool = None):
+        """return the current map of an AGV, downloaded only if its checksum is not cached
+
+        Args:
+            ip (str): AGV ip address
+            state_port (int, optional): state API port. Defaults to API_PORT_STATE.
+            config_port (int, optional): configuration API port. Defaults to API_PORT_CONFIG.
+            pool (TransportPool, optional): share the transports from this pool. Defaults to None.
+
+        Returns:
+            RobotMap: the current map, raises ConnectionError if it cannot be queried
+        """
+        status = StatusAPI(ip, state_port, pool=pool)
+        try:
+            info = StatusMap()
+            if not status.get_status(info):
+                raise ConnectionError(
+                    f"map query of {ip} failed: {info.err_msg}")
+            robot_map = self.cached(info.current_map_md5)
+            if robot_map is not None:
+                return robot_map
+            with self._lock:
+                # another thread may have downloaded it in the meantime
+                robot_map = self.cached(info.current_map_md5)
+                if robot_map is not None:
+                    return robot_map
+                stations = StatusStation()
+                if not status.get_status(stations):
+                    raise ConnectionError(
+                        f"station query of {ip} failed: {stations.err_msg}")
+                config = ConfigAPI(ip, config_port, pool=pool)
+                try:
+                    download = MapDownload(info.current_map)
+                    if not config.execute(download):
+                        raise ConnectionError(
+                            f"download of map {info.current_map} from {ip} failed")
+                finally:
+                    config.close()
+                logger.info("[Map Cache] :: Downloaded map %s (%s) from %s",
+                            info.current_map, info.current_map_md5, ip)
+                robot_map = RobotMap(info.current_map, info.current_map_md5,
+                                     download.map, stations.stations)
+                self.store(robot_map)
+                return robot_map
+        finally:
+            status.close()
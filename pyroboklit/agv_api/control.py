@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           control.py                               ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-27                               ║
+║ Last Modified:  2023-04-27                               ║
+║ Description:    Fixed rate open loop velocity control    ║
+║                 of the control port.                     ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import threading
+import time
+from collections import deque
+from ..tcp_transport import TcpTransport
+from ..tcp_transport import API_PORT_CTRL, API_PORT_STATE
+from ..tcp_transport.log import get_logger
+
+logger = get_logger(__name__)
+
+# open loop motion request of the control port and speed query of the state port
+MOTION_REQUEST = 2010
+SPEED_REQUEST = 1005
+
+
+class VelocityController:
+
+    def __init__(self,
+                 ip: str,
+                 rate: float = 20.0,
+                 port: int = API_PORT_CTRL,
+                 feedback_port: int = API_PORT_STATE,
+                 control=None,
+                 max_missed: int = 3,
+                 tolerance: float = 0.5,
+                 watchdog: float = None,
+                 on_stop=None,
+                 spin: float = 0.0005,
+                 window: int = 1000) -> None:
+        """
+        Sends open loop motion commands (2010) at a fixed rate. Each tick has a deadline on a monotonic clock that is
+        advanced by exactly one period, so the rate does not drift with the time spent in a tick. The command of a
+        tick and the speed query (1005) are sent together without waiting for each other and their responses are
+        received until the next deadline, so one period covers a full command/feedback exchange.
+
+        A tick that starts more than tolerance * period late, or whose responses have not arrived (or failed) by the
+        next deadline, is a missed deadline. After max_missed consecutive misses the controller stops the robot,
+        ends the loop and calls on_stop(reason), an exception raised by control or the transport does the same.
+        Every command also carries a duration of watchdog seconds after which the robot stops on its own if no
+        further command arrives.
+
+        usage:
+        ```python
+        with VelocityController("192.168.0.10", rate=50.0) as controller:
+            controller.set_velocity(0.3, w=0.1)
+            time.sleep(2.0)
+            print(controller.feedback["vx"], controller.stats())
+        # or compute the command from the latest feedback every tick
+        controller = VelocityController(ip, rate=20.0, control=lambda feedback: (0.5 * feedback["vx"], 0.0, 0.0))
+        controller.start()
+        ```
+
+        Args:
+            ip (str): AGV ip address
+            rate (float, optional): commands per second. Defaults to 20.0.
+            port (int, optional): control API port. Defaults to API_PORT_CTRL.
+            feedback_port (int, optional): state API port of the speed feedback, None sends no speed query.
+                                           Defaults to API_PORT_STATE.
+            control (callable, optional): control(feedback) returning the (vx, vy, w) of the tick, feedback is the
+                                          latest 1005 response or None. Defaults to None (use set_velocity()).
+            max_missed (int, optional): consecutive missed deadlines that stop the robot. Defaults to 3.
+            tolerance (float, optional): lateness of a tick start in periods that counts as a miss. Defaults to 0.5.
+            watchdog (float, optional): seconds after which the robot stops without a new command. Defaults to
+                                        (max_missed + 1) periods.
+            on_stop (callable, optional): on_stop(reason) called when the loop ends after a safe stop. Defaults to
+                                          None.
+            spin (float, optional): seconds before a deadline that are busy-waited instead of slept, to start the
+                                    tick on time. Defaults to 0.0005.
+            window (int, optional): ticks kept for the jitter statistics. Defaults to 1000.
+        """
+        self.ip = ip
+        self.period = 1.0 / rate
+        self.control = control
+        self.max_missed = max_missed
+        self.tolerance = tolerance
+        self.watchdog = (max_missed +
+                         1) * self.period if watchdog is None else watchdog
+        self.on_stop = on_stop
+        self.spin = spin
+        # small requests must not wait for Nagle's algorithm
+        self.transport = TcpTransport(ip, port, nodelay=True)
+        self.feedback_transport = None
+        if feedback_port is not None:
+            self.feedback_transport = TcpTransport(ip,
+                                                   feedback_port,
+                                                   nodelay=True)
+
+        # (vx, vy, w) sent every tick when there is no control callable
+        self.command = (0.0, 0.0, 0.0)
+        # latest 1005 response
+        self.feedback = None
+        self.stop_reason = ""
+
+        self.ticks = 0
+        self.missed_deadlines = 0
+        self.late_responses = 0
+        self._consecutive = 0
+        # lateness of the tick starts and round trip times of the commands in seconds
+        self._jitter = deque(maxlen=window)
+        self._rtt = deque(maxlen=window)
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def set_velocity(self, vx: float, vy: float = 0.0, w: float = 0.0):
+        """velocity sent from the next tick on
+
+        Args:
+            vx (float): speed along x in m/s
+            vy (float, optional): speed along y in m/s. Defaults to 0.0.
+            w (float, optional): angular speed in rad/s. Defaults to 0.0.
+        """
+        self.command = (vx, vy, w)
+
+    def start(self):
+        """start the control loop on a background thread"""
+        if self.running:
+            return
+        self.stop_reason = ""
+        self._consecutive = 0
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name=f"velocity-{self.ip}",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """end the control loop and stop the robot"""
+        self._stop_event.set()
+        if (self._thread is not None
+                and self._thread is not threading.current_thread()):
+            self._thread.join()
+        self._thread = None
+        self._send_stop()
+
+    def close(self):
+        self.stop()
+        self.transport.close()
+        if self.feedback_transport is not None:
+            self.feedback_transport.close()
+
+    def _send_stop(self):
+        self.command = (0.0, 0.0, 0.0)
+        if self.transport.connected:
+            # bounded wait, the watchdog stops the robot if the stop command is lost
+            future = self.transport.submit(MOTION_REQUEST,
+                                           self._body(0.0, 0.0, 0.0))
+            self.transport.wait([future], self.watchdog)
+
+    def _body(self, vx, vy, w):
+        return {
+            "vx": vx,
+            "vy": vy,
+            "w": w,
+            "duration": int(self.watchdog * 1000)
+        }
+
+    def _sleep_until(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining > self.spin:
+            self._stop_event.wait(remaining - self.spin)
+        while time.monotonic() < deadline:
+            pass
+
+    def _run(self):
+        try:
+            self._loop()
+        except Exception as e:
+            # an error of the control callable or the transport must not leave the robot driving
+            logger.exception("[Velocity Controller] :: %s: control error",
+                             self.ip)
+            self._safe_stop(f"control error: {e}")
+
+    def _loop(self):
+        period = self.period
+        deadline = time.monotonic()
+        command_future = feedback_future = None
+        while not self._stop_event.is_set():
+            self._sleep_until(deadline)
+            lateness = time.monotonic() - deadline
+            missed = False
+            if lateness >= period:
+                # ticks whose whole period has passed are skipped instead of sent late in a burst
+                skipped = int(lateness // period)
+                deadline += skipped * period
+                lateness -= skipped * period
+                self.missed_deadlines += skipped
+                self._consecutive += skipped
+                missed = True
+            elif lateness > self.tolerance * period:
+                self.missed_deadlines += 1
+                missed = True
+            self._jitter.append(lateness)
+
+            # the responses of the previous tick are due by its end
+            if command_future is not None:
+                late = [
+                    future for future in (command_future, feedback_future)
+                    if future is not None and (not future.done()
+                                               or future.exception() is not None
+                                               or future.result() is None)
+                ]
+                if late:
+                    self.late_responses += 1
+                    missed = True
+                elif feedback_future is not None:
+                    self.feedback = feedback_future.result()
+            self._consecutive = self._consecutive + 1 if missed else 0
+            if self._consecutive >= self.max_missed:
+                self._safe_stop(
+                    f"{self._consecutive} consecutive missed deadlines")
+                return
+
+            if self.control is None:
+                vx, vy, w = self.command
+            else:
+                vx, vy, w = self.control(self.feedback)
+            sent_at = time.monotonic()
+            command_future = self.transport.submit(MOTION_REQUEST,
+                                                   self._body(vx, vy, w))
+            feedback_future = None
+            if self.feedback_transport is not None:
+                feedback_future = self.feedback_transport.submit(
+                    SPEED_REQUEST)
+            self.ticks += 1
+            deadline += period
+
+            # receive both responses until the next deadline
+            if self.transport.wait([command_future],
+                                   deadline - time.monotonic()):
+                self._rtt.append(time.monotonic() - sent_at)
+            if feedback_future is not None:
+                self.feedback_transport.wait([feedback_future],
+                                             deadline - time.monotonic())
+
+    def _safe_stop(self, reason):
+        self.stop_reason = reason
+        logger.warning("[Velocity Controller] :: %s: %s, stopping the robot",
+                       self.ip, reason)
+        try:
+            self._send_stop()
+        except Exception as e:
+            logger.error("[Velocity Controller] :: %s: stop failed: %s",
+                         self.ip, e)
+        if self.on_stop is not None:
+            try:
+                self.on_stop(reason)
+            except Exception:
+                logger.exception(
+                    "[Velocity Controller] :: Error in stop callback")
+
+    def stats(self):
+        """loop statistics: ticks, missed deadlines, late responses and the lateness of the tick starts (jitter)
+        and the command round trip times over the last window ticks, in seconds"""
+        jitter = sorted(self._jitter)
+        rtt = sorted(self._rtt)
+        return {
+            "ticks": self.ticks,
+            "missed_deadlines": self.missed_deadlines,
+            "late_responses": self.late_responses,
+            "jitter_mean": sum(jitter) / len(jitter) if jitter else 0.0,
+            "jitter_p50": _quantile(jitter, 0.5),
+            "jitter_p99": _quantile(jitter, 0.99),
+            "jitter_max": jitter[-1] if jitter else 0.0,
+            "rtt_p50": _quantile(rtt, 0.5),
+            "rtt_p99": _quantile(rtt, 0.99),
+        }
+
+    def reset_stats(self):
+        self.ticks = 0
+        self.missed_deadlines = 0
+        self.late_responses = 0
+        self._jitter.clear()
+        self._rtt.clear()
+
+
+def _quantile(values, q):
+    """quantile (0..1) of sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
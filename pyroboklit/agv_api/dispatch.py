@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           dispatch.py                              ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-25                               ║
+║ Last Modified:  2023-04-25                               ║
+║ Description:    Optimal assignment of fleet robots to    ║
+║                 target stations.                         ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from .navigation import TaskOneStation
+from ..tcp_transport.log import get_logger
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from scipy.optimize import linear_sum_assignment as _scipy_assignment
+except ImportError:
+    _scipy_assignment = None
+
+logger = get_logger(__name__)
+
+# cost of the pairs that must not be assigned, e.g. robots with a low battery
+FORBIDDEN = 1e12
+
+Assignment = namedtuple("Assignment", ("robot", "station", "cost"))
+
+
+def linear_assignment(cost):
+    """minimum cost assignment of the rows of a cost matrix to its columns (each row and column used at most once,
+    min(rows, columns) pairs). Uses scipy.optimize.linear_sum_assignment if scipy is installed, otherwise a
+    shortest augmenting path solver (Jonker-Volgenant) vectorized with NumPy.
+
+    Args:
+        cost (ndarray): (rows, columns) cost matrix, without NaN or inf
+
+    Returns:
+        tuple: row indices and column indices of the assigned pairs, sorted by row
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if _scipy_assignment is not None:
+        return _scipy_assignment(cost)
+    if cost.shape[0] > cost.shape[1]:
+        cols, rows = _augmenting_paths(cost.T)
+        order = np.argsort(rows)
+        return rows[order], cols[order]
+    return _augmenting_paths(cost)
+
+
+def _augmenting_paths(cost):
+    """shortest augmenting path assignment of a cost matrix with rows <= columns"""
+    n_rows, n_cols = cost.shape
+    u = np.zeros(n_rows)
+    v = np.zeros(n_cols)
+    col4row = np.full(n_rows, -1, dtype=np.intp)
+    row4col = np.full(n_cols, -1, dtype=np.intp)
+    for current in range(n_rows):
+        # Dijkstra over the columns from the current row with reduced costs
+        shortest = np.full(n_cols, np.inf)
+        path = np.full(n_cols, -1, dtype=np.intp)
+        scanned = np.zeros(n_cols, dtype=bool)
+        visited_rows = [current]
+        row = current
+        min_value = 0.0
+        while True:
+            reduced = min_value + cost[row] - u[row] - v
+            better = (reduced < shortest) & ~scanned
+            shortest[better] = reduced[better]
+            path[better] = row
+            candidates = np.where(scanned, np.inf, shortest)
+            col = int(np.argmin(candidates))
+            min_value = candidates[col]
+            # among equally short columns prefer a free one, it ends the path
+            ties = np.flatnonzero(candidates == min_value)
+            if len(ties) > 1:
+                free = ties[row4col[ties] < 0]
+                if len(free):
+                    col = int(free[0])
+            scanned[col] = True
+            if row4col[col] < 0:
+                break
+            row = int(row4col[col])
+            visited_rows.append(row)
+        # update the dual variables
+        u[current] += min_value
+        others = np.array(visited_rows[1:], dtype=np.intp)
+        if len(others):
+            u[others] += min_value - shortest[col4row[others]]
+        v[scanned] -= min_value - shortest[scanned]
+        # augment along the path
+        while True:
+            row = path[col]
+            row4col[col] = row
+            col4row[row], col = col, col4row[row]
+            if row == current:
+                break
+    return np.arange(n_rows), col4row
+
+
+def positions(poses):
+    """(N, 2) array of x, y from StatusPose objects, pose records, push messages or (x, y, ...) tuples"""
+    xy = np.empty((len(poses), 2))
+    for i, pose in enumerate(poses):
+        if isinstance(pose, dict):
+            xy[i] = pose.get("x", np.nan), pose.get("y", np.nan)
+        elif isinstance(pose, (tuple, list)) and not hasattr(pose, "x"):
+            xy[i] = pose[0], pose[1]
+        else:
+            xy[i] = pose.x, pose.y
+    return xy
+
+
+def battery_levels(batteries):
+    """array of battery levels (0..1) from StatusBattery objects, battery records, push messages or numbers"""
+    levels = np.empty(len(batteries))
+    for i, battery in enumerate(batteries):
+        if isinstance(battery, dict):
+            levels[i] = battery.get("battery_level", np.nan)
+        elif isinstance(battery, (int, float)):
+            levels[i] = battery
+        elif hasattr(battery, "level"):
+            # StatusBattery and BatteryRecord
+            levels[i] = battery.level
+        else:
+            levels[i] = battery.battery_level
+    return levels
+
+
+def euclidean(robot_xy, station_xy):
+    """(robots, stations) matrix of straight line distances"""
+    return np.hypot(robot_xy[:, 0, None] - station_xy[None, :, 0],
+                    robot_xy[:, 1, None] - station_xy[None, :, 1])
+
+
+class FleetDispatcher:
+
+    def __init__(self,
+                 navigators: dict,
+                 stations: dict,
+                 distance=euclidean,
+                 battery_weight: float = 0.0,
+                 min_battery: float = 0.0,
+                 max_workers: int = 32) -> None:
+        """
+        Assigns a batch of target stations to the robots of a fleet so the total cost is minimal, and sends the
+        tasks to the robots concurrently.
+
+        The cost of a robot and a station is the distance between them plus battery_weight * (1 - battery_level),
+        so robots with a fuller battery are preferred. Robots below min_battery get no task. With more jobs than
+        robots every robot gets one job and the remaining jobs are left for the next dispatch, with more robots than
+        jobs the robots with the lowest costs are chosen.
+
+        usage:
+        ```python
+        navigators = {name: NavigationAPI(ip) for name, ip in robots.items()}
+        dispatcher = FleetDispatcher(navigators, stations={"LM1": (0.0, 0.0), "LM2": (5.0, 2.0), ...},
+                                     battery_weight=10.0, min_battery=0.2)
+        poses = {name: notification.latest for name, notification in notifications.items()}
+        for assignment, future in dispatcher.dispatch(poses, ["LM12", "LM40", "AP3"], batteries=poses):
+            print(assignment.robot, assignment.station, assignment.cost)
+        ```
+
+        Args:
+            navigators (dict): NavigationAPI by robot name
+            stations (dict): station positions as {id: (x, y)}
+            distance (callable, optional): distance(robot_xy, station_xy) returning the (robots, stations) matrix of
+                                           travel distances, e.g. along the route graph. Defaults to euclidean.
+            battery_weight (float, optional): cost of an empty battery in the units of distance. Defaults to 0.0.
+            min_battery (float, optional): battery level below which a robot gets no task. Defaults to 0.0.
+            max_workers (int, optional): tasks sent at the same time. Defaults to 32.
+        """
+        if np is None:
+            raise ImportError("numpy is not installed (pip install numpy)")
+        self.navigators = navigators
+        self.station_ids = list(stations)
+        self.station_xy = np.array([stations[station]
+                                    for station in self.station_ids],
+                                   dtype=np.float64).reshape(-1, 2)
+        self._station_index = {
+            station: i
+            for i, station in enumerate(self.station_ids)
+        }
+        self.distance = distance
+        self.battery_weight = battery_weight
+        self.min_battery = min_battery
+        self.max_workers = max_workers
+        self._executor = None
+
+    def cost_matrix(self, robots, poses, jobs, batteries=None):
+        """(robots, jobs) cost matrix
+
+        Args:
+            robots (list): robot names
+            poses (dict): pose by robot name, see positions()
+            jobs (list): target station ids
+            batteries (dict, optional): battery status by robot name, see battery_levels(). Defaults to None.
+        """
+        robot_xy = positions([poses[robot] for robot in robots])
+        try:
+            columns = [self._station_index[station] for station in jobs]
+        except KeyError as e:
+            raise ValueError(f"unknown station {e}") from None
+        cost = np.asarray(self.distance(robot_xy, self.station_xy[columns]),
+                          dtype=np.float64)
+        if batteries is not None:
+            levels = battery_levels([batteries[robot] for robot in robots])
+            if self.battery_weight:
+                cost += self.battery_weight * (1.0 - levels)[:, None]
+            cost[levels < self.min_battery] = FORBIDDEN
+        # unknown poses (NaN) and unreachable stations (inf) are never assigned
+        cost[~np.isfinite(cost)] = FORBIDDEN
+        return cost
+
+    def plan(self, poses, jobs, batteries=None):
+        """assign jobs to robots without sending the tasks
+
+        Args:
+            poses (dict): pose by robot name of the robots available for a job
+            jobs (list): target station ids
+            batteries (dict, optional): battery status by robot name. Defaults to None.
+
+        Returns:
+            list: Assignment(robot, station, cost) of every assigned job
+        """
+        robots = [robot for robot in poses if poses[robot] is not None]
+        if not robots or not jobs:
+            return []
+        cost = self.cost_matrix(robots, poses, jobs, batteries)
+        # robots that cannot take any of the jobs are left out of the assignment
+        available = np.flatnonzero((cost < FORBIDDEN).any(axis=1))
+        if len(available) < len(robots):
+            robots = [robots[i] for i in available.tolist()]
+            cost = cost[available]
+            if not robots:
+                return []
+        rows, cols = linear_assignment(cost)
+        return [
+            Assignment(robots[row], jobs[col], float(cost[row, col]))
+            for row, col in zip(rows.tolist(), cols.tolist())
+            if cost[row, col] < FORBIDDEN
+        ]
+
+    def dispatch(self, poses, jobs, batteries=None, **task_kwargs):
+        """assign jobs to robots and send them as TaskOneStation to the robots concurrently
+
+        Args:
+            poses (dict): pose by robot name of the robots available for a job
+            jobs (list): target station ids
+            batteries (dict, optional): battery status by robot name. Defaults to None.
+            **task_kwargs: further arguments of TaskOneStation, e.g. max_speed
+
+        Returns:
+            list: (Assignment, Future) pairs, the futures of NavigationAPI.submit() resolve when the tasks end
+        """
+        assignments = self.plan(poses, jobs, batteries)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers,
+                                                thread_name_prefix="dispatch")
+        submitted = [
+            self._executor.submit(
+                self.navigators[assignment.robot].submit,
+                TaskOneStation(dest_id=assignment.station, **task_kwargs))
+            for assignment in assignments
+        ]
+        results = []
+        for assignment, future in zip(assignments, submitted):
+            try:
+                results.append((assignment, future.result()))
+            except Exception as e:
+                logger.error("[Dispatcher] :: Sending %s to %s failed: %s",
+                             assignment.station, assignment.robot, e)
+        return results
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
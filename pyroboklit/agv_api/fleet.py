@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           fleet.py                                 ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-07                               ║
+║ Last Modified:  2023-04-07                               ║
+║ Description:    Status polling of many AGVs from a       ║
+║                 single thread.                           ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import errno
+import selectors
+import socket
+import time
+from ..tcp_transport import API_PORT_STATE
+from ..tcp_transport import FrameDecoder, SeerData, TcpTransport, RESPONSE_OFFSET
+from ..tcp_transport import default_codec
+from ..tcp_transport.log import get_logger
+from .status import StatusPose, StatusBattery
+
+logger = get_logger(__name__)
+
+
+class _Robot:
+
+    def __init__(self, ip, port):
+        self.ip = ip
+        self.port = port
+        self.socket = None
+        self.connected = False
+        self.connecting = False
+        self.decoder = FrameDecoder()
+        self.outgoing = bytearray()
+        # status objects waiting for a response, keyed by (request_id, response msg_type)
+        self.pending = {}
+
+
+class FleetStatusPoller:
+
+    def __init__(self,
+                 ips,
+                 statuses=(StatusPose, StatusBattery),
+                 port: int = API_PORT_STATE,
+                 timeout: float = 1.0,
+                 codec=None) -> None:
+        """
+        Poll the STATE port of many AGVs from one thread. The sockets are non-blocking and multiplexed with selectors
+        (epoll on linux), every sweep sends all configured status queries to all AGVs at once and parses the
+        responses as they become readable, so a sweep takes about as long as the slowest AGV.
+
+        Usage:
+        ```python
+        poller = FleetStatusPoller(["192.168.0.10", "192.168.0.11"], statuses=[StatusPose, StatusBattery])
+        snapshot = poller.poll()
+        pose = snapshot["192.168.0.10"][StatusPose]
+        if pose.success:
+            print(pose.x, pose.y)
+        poller.close()
+        ```
+
+        Args:
+            ips (list): AGV ip addresses, or (ip, port) tuples for AGVs that do not use the default port
+            statuses (list, optional): status classes queried on every sweep. Defaults to (StatusPose, StatusBattery).
+            port (int, optional): port at which AGV STATE API is implemented. Defaults to API_PORT_STATE.
+            timeout (float, optional): default sweep timeout in seconds. Defaults to 1.0.
+            codec (optional): json codec of the message bodies. Defaults to the default codec.
+        """
+        self.name = "Fleet Status Poller"
+        self.statuses = list(statuses)
+        self.timeout = timeout
+        self.codec = codec or default_codec()
+        self.selector = selectors.DefaultSelector()
+        self.robots = {}
+        for entry in ips:
+            ip, robot_port = entry if isinstance(entry, tuple) else (entry,
+                                                                     port)
+            self.robots[entry] = _Robot(ip, robot_port)
+        self.connect()
+
+    # decoding of the response body is shared with the blocking transport
+    decode = TcpTransport.decode
+
+    @property
+    def connected(self):
+        """ip addresses of the AGVs with an open connection"""
+        return [ip for ip, robot in self.robots.items() if robot.connected]
+
+    def connect(self, timeout=None):
+        """start a non-blocking connect to every AGV that is not connected and wait for them to complete.
+
+        Args:
+            timeout (float, optional): maximum time to wait in seconds. Defaults to the sweep timeout.
+
+        Returns:
+            list: ip addresses of the connected AGVs
+        """
+        for robot in self.robots.values():
+            if not robot.connected and not robot.connecting:
+                self._start_connect(robot)
+        self._run(self._deadline(timeout),
+                  lambda: any(r.connecting for r in self.robots.values()))
+        for robot in self.robots.values():
+            if robot.connecting:
+                self._close_robot(robot)
+        return self.connected
+
+    def _deadline(self, timeout):
+        return time.monotonic() + (self.timeout
+                                   if timeout is None else timeout)
+
+    def _start_connect(self, robot):
+        robot.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        robot.socket.setblocking(False)
+        robot.decoder.reset()
+        robot.outgoing.clear()
+        robot.pending.clear()
+        err = robot.socket.connect_ex((robot.ip, robot.port))
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK,
+                       errno.EALREADY):
+            logger.warning("[%s] :: Connection error %s: %s", self.name,
+                           robot.ip, errno.errorcode.get(err, err))
+            robot.socket.close()
+            robot.socket = None
+            return
+        robot.connecting = True
+        self.selector.register(robot.socket, selectors.EVENT_WRITE, robot)
+
+    def _close_robot(self, robot):
+        if robot.socket is not None:
+            self.selector.unregister(robot.socket)
+            robot.socket.close()
+        robot.socket = None
+        robot.connected = False
+        robot.connecting = False
+        robot.outgoing.clear()
+
+    def _update_events(self, robot):
+        if robot.connecting:
+            events = selectors.EVENT_WRITE
+        elif robot.outgoing:
+            events = selectors.EVENT_READ | selectors.EVENT_WRITE
+        else:
+            events = selectors.EVENT_READ
+        self.selector.modify(robot.socket, events, robot)
+
+    def _on_writable(self, robot):
+        if robot.connecting:
+            err = robot.socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                logger.warning("[%s] :: Connection error %s: %s", self.name,
+                               robot.ip, errno.errorcode.get(err, err))
+                self._close_robot(robot)
+                return
+            robot.connecting = False
+            robot.connected = True
+        if robot.outgoing:
+            sent = robot.socket.send(robot.outgoing)
+            del robot.outgoing[:sent]
+        self._update_events(robot)
+
+    def _on_readable(self, robot):
+        if robot.decoder.recv_into(robot.socket) == 0:
+            self._close_robot(robot)
+            return
+        for request_id, msg_type, payload in robot.decoder:
+            status = robot.pending.pop((request_id, msg_type), None)
+            if status is None:
+                continue
+            try:
+                status._parse(self.decode(payload))
+            except Exception as e:
+                # an incomplete response of one AGV must not abort the sweep of the fleet
+                logger.error("[%s] :: Error parsing %s of %s: %s", self.name,
+                             type(status).__name__, robot.ip, e)
+                status.success = False
+                status.err_msg = f"invalid response: {e!r}"
+
+    def _run(self, deadline, busy):
+        """dispatch socket events until busy() returns False or the deadline passes"""
+        while busy():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, events in self.selector.select(remaining):
+                robot = key.data
+                try:
+                    if events & selectors.EVENT_WRITE:
+                        self._on_writable(robot)
+                    if events & selectors.EVENT_READ and robot.connected:
+                        self._on_readable(robot)
+                except (OSError, ValueError) as e:
+                    logger.error("[%s] :: Error %s: %s", self.name, robot.ip,
+                                 e)
+                    self._close_robot(robot)
+
+    def poll(self, timeout=None):
+        """run one sweep over the fleet.
+
+        Args:
+            timeout (float, optional): maximum duration of the sweep in seconds. Defaults to the sweep timeout.
+
+        Returns:
+            dict: {ip: {status class: status object}} keyed like ips, status objects of AGVs that did not answer have success False
+        """
+        deadline = self._deadline(timeout)
+        snapshot = {}
+        for ip, robot in self.robots.items():
+            if not robot.connected and not robot.connecting:
+                self._start_connect(robot)
+            robot.pending.clear()
+            snapshot[ip] = {}
+            for status_class in self.statuses:
+                status = status_class()
+                snapshot[ip][status_class] = status
+                if robot.socket is None:
+                    continue
+                s = SeerData()
+                s.set_data(status.messageType, status.msg, codec=self.codec)
+                robot.pending[(s.request_id,
+                               status.messageType + RESPONSE_OFFSET)] = status
+                robot.outgoing += s.header
+                robot.outgoing += s.data
+            if robot.connected:
+                self._update_events(robot)
+
+        self._run(deadline,
+                  lambda: any(r.pending for r in self.robots.values()
+                              if r.socket is not None))
+        return snapshot
+
+    def close(self):
+        for robot in self.robots.values():
+            self._close_robot(robot)
+        self.selector.close()
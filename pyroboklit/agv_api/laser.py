@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           laser.py                                 ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-20                               ║
+║ Last Modified:  2023-04-20                               ║
+║ Description:    Vectorized decoding of laser scans and   ║
+║                 transformation into the map frame.       ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+from operator import itemgetter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_angle = itemgetter("angle")
+_dist = itemgetter("dist")
+_valid = itemgetter("valid")
+
+
+class LaserScan:
+
+    def __init__(self, angles, ranges, valid, x=0.0, y=0.0, yaw=0.0):
+        """
+        One scan of a laser as contiguous NumPy arrays.
+
+        Args:
+            angles (ndarray): beam angles in the laser frame in radians
+            ranges (ndarray): measured distances in m
+            valid (ndarray): bool mask of the valid beams
+            x (float, optional): laser position on the robot in m. Defaults to 0.0.
+            y (float, optional): laser position on the robot in m. Defaults to 0.0.
+            yaw (float, optional): laser orientation on the robot in radians. Defaults to 0.0.
+        """
+        self.angles = angles
+        self.ranges = ranges
+        self.valid = valid
+        self.x = x
+        self.y = y
+        self.yaw = yaw
+
+    @classmethod
+    def from_json(cls, laser):
+        """decode one entry of the "lasers" list of a 1009 response (beam angles and install yaw in degrees)"""
+        if np is None:
+            raise ImportError("numpy is not installed (pip install numpy)")
+        beams = laser.get("beams", [])
+        n = len(beams)
+        angles = np.radians(np.fromiter(map(_angle, beams), np.float64, n))
+        ranges = np.fromiter(map(_dist, beams), np.float64, n)
+        valid = np.fromiter(map(_valid, beams), np.bool_, n)
+        info = laser.get("install_info", {})
+        if info.get("upside", False):
+            # mounted upside down, the beams sweep the other way round
+            angles = -angles
+        return cls(angles, ranges, valid, info.get("x", 0.0),
+                   info.get("y", 0.0), np.radians(info.get("yaw", 0.0)))
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def _transform(self, x, y, angle, valid_only):
+        """points of the scan in a frame in which the laser is at (x, y) looking along angle, as (N, 2) array"""
+        angles, ranges = self.angles, self.ranges
+        if valid_only:
+            angles, ranges = angles[self.valid], ranges[self.valid]
+        phi = angles + angle
+        points = np.empty((len(ranges), 2))
+        np.multiply(ranges, np.cos(phi), out=points[:, 0])
+        np.multiply(ranges, np.sin(phi), out=points[:, 1])
+        points[:, 0] += x
+        points[:, 1] += y
+        return points
+
+    def points(self, valid_only=True):
+        """points in the robot frame as (N, 2) array of x, y in m"""
+        return self._transform(self.x, self.y, self.yaw, valid_only)
+
+    def to_map(self, pose, valid_only=True):
+        """points in the map frame as (N, 2) array of x, y in m
+
+        Args:
+            pose (StatusPose | PoseRecord | tuple): robot pose with x, y in m and angle in radians, or a tuple
+                                                  (x, y, angle)
+            valid_only (bool, optional): drop invalid beams. Defaults to True.
+        """
+        px, py, pa = _pose(pose)
+        cos, sin = np.cos(pa), np.sin(pa)
+        return self._transform(px + cos * self.x - sin * self.y,
+                               py + sin * self.x + cos * self.y,
+                               pa + self.yaw, valid_only)
+
+
+def _pose(pose):
+    # PoseRecord and other named tuples are read by name, plain tuples are (x, y, angle)
+    if isinstance(pose, tuple) and not hasattr(pose, "x"):
+        return pose
+    return pose.x, pose.y, pose.angle
+
+
+def decode_lasers(lasers):
+    """decode the "lasers" list of a 1009 response into LaserScan objects"""
+    return [LaserScan.from_json(laser) for laser in lasers]
+
+
+def scans_to_map(scans, pose, valid_only=True):
+    """points of all scans in the map frame as one (N, 2) array"""
+    if not scans:
+        return np.empty((0, 2))
+    return np.concatenate(
+        [scan.to_map(pose, valid_only) for scan in scans])
@@ -1,476 +1,852 @@
-# -*- coding: utf-8 -*-
-"""
-╔══════════════════════════════════════════════════════════╗
-║ File:           navigation.py                            ║
-║ Author:         Nexus1203                                ║
-║ Created:        2023-03-28                               ║
-║ Last Modified:  2023-03-30                               ║
-║ Description:    Navigation port features of robotkit api ║  
-╚══════════════════════════════════════════════════════════╝
-"""
-from typing import List
-from ..tcp_transport import TcpTransport
-from ..tcp_transport import API_PORT_TASK
-from .utils import check_success, to_json
-# import time
-
-
-class TaskOneStation:
-
-    def __init__(self,
-                 dest_id: str,
-                 source_id: str = None,
-                 task_id: str = None,
-                 angle: float = None,
-                 method: str = None,
-                 max_speed: float = None,
-                 max_wspeed: float = None,
-                 max_acc: float = None,
-                 max_wacc: float = None,
-                 duration: float = None,
-                 orientation: float = None,
-                 spin: bool = None) -> None:
-        """
-        Single Station Task. The AGV will move to the target site and stop there.
-        One may repeat send a single station tasks to the AGV in order to set its maximum speed, acceleration, and angular speed.
-        
-        usage:
-        ```python
-        from time import sleep
-        # create a task object
-        task = TaskOneStation(dest_id="LM15", source_id = "LM1", max_speed=0.5)
-        # use the NavigationAPI class to send the task to the AGV
-        Nav = NavigationAPI(ip = "127.0.0.1")
-        Nav.execute(task)
-        # wait for 5 seconds
-        sleep(5)
-        # change the speed to 0.2 m/s
-        task.max_speed = 0.2
-        success = Nav.execute(task)
-        print(success)
-        ```        
-        
-        Args:
-            dest_id (str): destination id must be set as string (e.g. "LM15", "AP14")
-            source_id (str): source id is optional but should be set as string (e.g. "LM15", "AP14")
-            task_id (str): task number is optional as string (e.g. "82444872")
-            angle (float): The angle value in "radians" at the target site. The angle is optional and is given in "radians". 
-                        The angle is measured from the x-axis of the map. The angle is measured clockwise. 
-            method (str): the movement method can only be "forward" or "backward". It defines how the AGV ill approach the target.
-            max_speed (float): maximum speed in m/s
-            max_wspeed (float): maximum angular speed in rad/s
-            max_acc (float): maximum acceleration in m/s^2
-            max_wacc (float): maximum angular acceleration in rad/s^2
-            duration (float): duration in milliseconds for delaying the end of navigation state
-            orientation (float): not used
-            spin (bool): Follow up	(repeat the task after completion of the task)
-        """
-        self.requestId = 0
-        self.messageType = 3051  # single point task
-        self.msg = {}
-
-        self.id = dest_id  # destination id must be set
-        self.source_id = source_id  # source id is optional but should be set
-        self.task_id = task_id  # task id is optional
-        self.angle = angle  # angle is optional
-        self.method = method  # method is optional
-        self.max_speed = max_speed  # max speed is optional
-        self.max_wspeed = max_wspeed
-        self.max_acc = max_acc
-        self.max_wacc = max_wacc
-        self.duration = duration
-        self.orientation = orientation
-        self.spin = spin
-
-    def _execute(self, transport):
-        """_summary_
-
-        Args:
-            transport (TcpTransport): transport object
-        """
-        self.msg = to_json(self)
-        if "id" not in self.msg:
-            raise ValueError(
-                "destination id is required, please set the dest_id as string (e.g. 'LM15', 'AP14')"
-            )
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class TaskMultiStation:
-
-    def __init__(self, tasks: List[TaskOneStation]) -> None:
-        """
-        Move to multiple stations. This is a multi-point task. The AGV will move to the first station, 
-        then to the second station, and so on. The AGV will stop at the last station.
-        If the duration is not set for the stations in between, the AGV will not stop at these stations and will move directly to the next station.
-        In order to stop for a period of time at the stations in between, the duration should be set for these station's tasks in TaskOneStation.
-        
-        Usage:
-        ```python
-        # create three station tasks
-        task1 = TaskOneStation(dest_id="LM15", source_id = "LM1", duration=100)
-        task2 = TaskOneStation(dest_id="LM16", source_id = "LM15", duration=0)
-        task3 = TaskOneStation(dest_id="LM17", source_id = "LM16", duration=100)
-        # combine the tasks into a multi-point task
-        m_task = TaskMultiStation([task1, task2, task3])
-        # use the NavigationAPI class to send the task to the AGV
-        Nav = NavigationAPI(ip = "127.0.0.1")
-        success = Nav.execute(m_task)
-        print(success)
-        ```
-        In above code, the AGV will move from LM1 to LM15, then stop for 100ms, and move to LM16, then move to LM17 without any delay in between, then stop for 100ms.
-
-        Args:
-            tasks (List[TaskOneStation]): list of TaskOneStation objects
-        """
-        self.requestId = 0
-        self.messageType = 3066  # multi point task
-        self.msg = {}
-
-        self.tasks = tasks
-
-    def _as_json(self) -> str:
-        as_json = {"move_task_list": [to_json(task) for task in self.tasks]}
-        return as_json
-
-    def _execute(self, transport):
-        """_summary_
-
-        Args:
-            transport (TcpTransport): transport object
-        """
-        self.msg = self._as_json()
-        if "move_task_list" not in self.msg:
-            raise ValueError("task list is required")
-        if len(self.msg["move_task_list"]) == 0:
-            raise ValueError("task list is empty")
-
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class TaskCoordinate:
-
-    def __init__(self,
-                 x: float,
-                 y: float,
-                 angle: float,
-                 max_speed: float = None,
-                 max_wspeed: float = None,
-                 max_acc: float = None,
-                 max_wacc: float = None) -> None:
-        """
-        Move the AGV to a specific coordinate on the map. The AGV will move to the target coordinate and stop.
-        if the angle is not set, the AGV will not rotate. If the angle is set, the AGV will rotate to the target angle.
-        One should always provide atleast three parameters (x, y, angle) to ensure that the AGV will move to the target coordinate.
-        This function should be used with caution as it can lead to collisions if the AGV is not moving in the right direction.
-
-        Args:
-            x (float): x coordinate of the target site
-            y (float): y coordinate of the target site
-            angle (float): The angle value at the target site. The angle is optional and is given in degrees. 
-                        The angle is measured from the x-axis of the map. The angle is measured clockwise. 
-            max_speed (float): maximum speed in m/s
-            max_wspeed (float): maximum angular speed in rad/s
-            max_acc (float): maximum acceleration in m/s^2
-            max_wacc (float): maximum angular acceleration in rad/s^2
-        """
-        self.requestId = 0
-        self.messageType = 3050  # go to x, y, a coordinate task
-        self.msg = {}
-
-        self.x = x
-        self.y = y
-        self.angle = angle
-        self.max_speed = max_speed
-        self.max_wspeed = max_wspeed
-        self.max_acc = max_acc
-        self.max_wacc = max_wacc
-
-    def _execute(self, transport):
-        """ excute the task to be used by Navigation class
-
-        Args:
-            transport (TcpTransport): transport object
-        """
-        self.msg = to_json(self)
-        if "angle" not in self.msg:
-            raise ValueError("angle is required")
-        if "x" not in self.msg:
-            raise ValueError("x is required")
-        if "y" not in self.msg:
-            raise ValueError("y is required")
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class TaskSuspend:
-
-    def __init__(self) -> None:
-        """
-        Suspend the current task. (can be resumed later using TaskResume)
-        """
-        self.requestId = 0
-        self.messageType = 3001  # suspend task
-        self.msg = {}
-
-    def _execute(self, transport):
-        """_summary_
-
-        Args:
-            transport (TcpTransport): transport object
-        """
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class TaskResume:
-
-    def __init__(self) -> None:
-        """
-        Resume the current task. (only for suspended tasks)
-        """
-        self.requestId = 0
-        self.messageType = 3002  # resume task
-        self.msg = {}
-
-    def _execute(self, transport):
-        """ excute the task
-
-        Args:
-            transport (TcpTransport): transport object
-        """
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class TaskCancel:
-
-    def __init__(self) -> None:
-        """
-        Cancel the current task.
-        """
-        self.requestId = 0
-        self.messageType = 3003  # cancel task
-        self.msg = {}
-
-    def _execute(self, transport):
-        """_summary_
-
-        Args:
-            transport (TcpTransport): transport object
-        """
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class TaskRouteListQuery:
-
-    def __init__(self, ) -> None:
-        """Query the route list (stations list or path) of the AGV.
-        """
-        self.requestId = 0
-        self.messageType = 3053  #robot_task_target_path_req
-        self.msg = {}
-        self.route_list = []
-
-    def _execute(self, transport):
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        if check_success(response):
-            self.route_list = response["path"]
-            return True
-        else:
-            return False
-
-
-class TaskClearMultiStations:
-
-    def __init__(self, ) -> None:
-        """
-        Clear the multi-stations list of the AGV (only for stations list tasks issued by TaskMultiStation)
-        """
-        self.requestId = 0
-        self.messageType = 3067
-        self.msg = {}
-
-    def _execute(self, transport):
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class TaskClearSpecificTask:
-
-    def __init__(self, task_id: int) -> None:
-        """
-        Clear the specific task from the multi-stations list of the AGV (only for stations list tasks issued by TaskMultiStation)
-        """
-        self.requestId = 0
-        self.messageType = 3068
-        self.msg = {}
-        self.station_id = task_id
-
-    def _execute(self, transport):
-        self.msg = to_json(self)
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class TaskChainQuery:
-
-    def __init__(self,
-                 task_list_name: str,
-                 with_robot_status: bool = True) -> None:
-        """_summary_
-
-        Args:
-            task_list_name (str): The name of the task chain that needs to be queried. 
-                                This task chain is the last executed (executing) task chain. 
-                                If the task chain can be queried, the details will be returned, if not, taskListStatus will return 404.
-            with_robot_status (bool, optional): If it is true, return the status data of the robot. 
-                                                In the current status data, there is only power information. Defaults to True.
-
-        """
-        self.requestId = 0
-        self.messageType = 3101  # robot_tasklist_status_req
-        self.msg = {}
-
-        self.task_list_name = task_list_name
-        self.with_robot_status = with_robot_status
-        self.tasklist_status = None
-        self.robot_status = None
-
-    @staticmethod
-    def check_status(TaskListStaus: int):
-        """A static method to check the status of the task chain query.
-            Use the value of TaskListStaus key in tasklist_status to check the status of the task.
-
-        Args:
-            TaskListStaus (int): TaskListStaus attribute of TaskChainQuery's response for tasklist_status
-        Returns:
-            (str): descripton of the status
-        """
-        if TaskListStaus == 0:
-            return "None"
-        elif TaskListStaus == 1:
-            return "Waiting"
-        elif TaskListStaus == 2:
-            return "Running"
-        elif TaskListStaus == 3:
-            return "Suspended"
-        elif TaskListStaus == 4:
-            return "Completed"
-        elif TaskListStaus == 5:
-            return "Failed"
-        elif TaskListStaus == 6:
-            return "Canceled"
-        elif TaskListStaus == 7:
-            return "OverTime"
-        else:
-            return "Unknown"
-
-    def _execute(self, transport):
-        self.msg = to_json(self)
-        self.msg.pop("tasklist_status"
-                     )  # remove the key to avoid the error of the server
-        self.msg.pop(
-            "robot_status")  # remove the key to avoid the error of the server
-
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        if check_success(response):
-            self.task_list_status = response["tasklist_status"]
-            if self.with_robot_status:
-                self.robot_status = response["robot_status"]
-            return True
-        else:
-            return False
-
-
-class TaskChainlistQuery:
-
-    def __init__(self, ) -> None:
-        """
-        Query the list of tasks chains of the AGV.
-        """
-        self.requestId = 0
-        self.messageType = 3115
-        self.msg = {}
-        self.tasklists = None
-
-    def _execute(self, transport):
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        if check_success(response):
-            self.tasklists = response["tasklists"]
-            return True
-        else:
-            return False
-
-
-class TaskExecuteTaskChain:
-
-    def __init__(self, name: str) -> None:
-        """
-        Execute a pre-existing task chain on the AGV.
-        
-        Args:
-            name (str): name of the task chain to be executed
-        """
-        self.requestId = 0
-        self.messageType = 3106
-        self.msg = {}
-        self.name = name
-
-    def _execute(self, transport):
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class NavigationAPI:
-
-    def __init__(self, ip: str, port: int = API_PORT_TASK) -> None:
-        """NavigationAPI class.
-        An instance of this class is used to manage navigation commands to the robot.
-
-        Args:
-            ip (str): _description_
-            port (int, optional): _description_. Defaults to API_PORT_TASK.
-        """
-
-        self.ip = ip
-        self.port = port
-        self.transport = TcpTransport(self.ip, self.port)
-
-    def execute(self, task):
-        """Excetute a task on the AGV.
-        Note that the task is executed in a non-blocking way, so the function will return immediately after the task is sent to the AGV.
-        in order to check if the task is finished, refer the Status class of the API.
-        usage:
-        To move AGV to a specific station on the map:
-        ```
-        Nav = NavigationAPI(ip='127.0.0.1')
-        s_task = TaskOneStation(dest_id='LM15', max_speed=0.5, max_acc=0.5)
-        success = Nav.execute(s_task)
-        print(success)
-        ```
-        To cancel the task:
-        ```
-        Nav = NavigationAPI(ip='127.0.0.1')
-        success = Nav.execute(TaskCancel())
-        print(success)
-        ```
-        Args:
-            task (Task): Task object to be executed
-        """
-        return task._execute(self.transport)
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           navigation.py                            ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-03-28                               ║
+║ Last Modified:  2023-03-30                               ║
+║ Description:    Navigation port features of robotkit api ║  
+╚══════════════════════════════════════════════════════════╝
+"""
+import time
+from collections import namedtuple
+from concurrent.futures import Future, InvalidStateError
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from threading import Event, Lock, Thread
+from typing import List
+from ..tcp_transport import TcpTransport, TransportPool
+from ..tcp_transport import API_PORT_TASK, API_PORT_STATE, API_PORT_PUSH
+from ..tcp_transport.log import get_logger
+from .push_notification import Notification
+from .utils import check_success, to_json
+
+logger = get_logger(__name__)
+
+# task_status of the navigation status, see StatusNavigation.translate_task_status
+TASK_WAITING = 1
+TASK_RUNNING = 2
+TASK_SUSPENDED = 3
+TASK_COMPLETED = 4
+TASK_FAILED = 5
+TASK_CANCELED = 6
+_TASK_ACTIVE = (TASK_WAITING, TASK_RUNNING, TASK_SUSPENDED)
+_TASK_DONE = (TASK_COMPLETED, TASK_FAILED, TASK_CANCELED)
+
+
+class TaskOneStation:
+
+    def __init__(self,
+                 dest_id: str,
+                 source_id: str = None,
+                 task_id: str = None,
+                 angle: float = None,
+                 method: str = None,
+                 max_speed: float = None,
+                 max_wspeed: float = None,
+                 max_acc: float = None,
+                 max_wacc: float = None,
+                 duration: float = None,
+                 orientation: float = None,
+                 spin: bool = None) -> None:
+        """
+        Single Station Task. The AGV will move to the target site and stop there.
+        One may repeat send a single station tasks to the AGV in order to set its maximum speed, acceleration, and angular speed.
+        
+        usage:
+        ```python
+        from time import sleep
+        # create a task object
+        task = TaskOneStation(dest_id="LM15", source_id = "LM1", max_speed=0.5)
+        # use the NavigationAPI class to send the task to the AGV
+        Nav = NavigationAPI(ip = "127.0.0.1")
+        Nav.execute(task)
+        # wait for 5 seconds
+        sleep(5)
+        # change the speed to 0.2 m/s
+        task.max_speed = 0.2
+        success = Nav.execute(task)
+        print(success)
+        ```        
+        
+        Args:
+            dest_id (str): destination id must be set as string (e.g. "LM15", "AP14")
+            source_id (str): source id is optional but should be set as string (e.g. "LM15", "AP14")
+            task_id (str): task number is optional as string (e.g. "82444872")
+            angle (float): The angle value in "radians" at the target site. The angle is optional and is given in "radians". 
+                        The angle is measured from the x-axis of the map. The angle is measured clockwise. 
+            method (str): the movement method can only be "forward" or "backward". It defines how the AGV ill approach the target.
+            max_speed (float): maximum speed in m/s
+            max_wspeed (float): maximum angular speed in rad/s
+            max_acc (float): maximum acceleration in m/s^2
+            max_wacc (float): maximum angular acceleration in rad/s^2
+            duration (float): duration in milliseconds for delaying the end of navigation state
+            orientation (float): not used
+            spin (bool): Follow up	(repeat the task after completion of the task)
+        """
+        self.requestId = 0
+        self.messageType = 3051  # single point task
+        self.msg = {}
+
+        self.id = dest_id  # destination id must be set
+        self.source_id = source_id  # source id is optional but should be set
+        self.task_id = task_id  # task id is optional
+        self.angle = angle  # angle is optional
+        self.method = method  # method is optional
+        self.max_speed = max_speed  # max speed is optional
+        self.max_wspeed = max_wspeed
+        self.max_acc = max_acc
+        self.max_wacc = max_wacc
+        self.duration = duration
+        self.orientation = orientation
+        self.spin = spin
+
+    def _execute(self, transport):
+        """_summary_
+
+        Args:
+            transport (TcpTransport): transport object
+        """
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        self.msg = to_json(self)
+        if "id" not in self.msg:
+            raise ValueError(
+                "destination id is required, please set the dest_id as string (e.g. 'LM15', 'AP14')"
+            )
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class TaskMultiStation:
+
+    def __init__(self, tasks: List[TaskOneStation]) -> None:
+        """
+        Move to multiple stations. This is a multi-point task. The AGV will move to the first station, 
+        then to the second station, and so on. The AGV will stop at the last station.
+        If the duration is not set for the stations in between, the AGV will not stop at these stations and will move directly to the next station.
+        In order to stop for a period of time at the stations in between, the duration should be set for these station's tasks in TaskOneStation.
+        
+        Usage:
+        ```python
+        # create three station tasks
+        task1 = TaskOneStation(dest_id="LM15", source_id = "LM1", duration=100)
+        task2 = TaskOneStation(dest_id="LM16", source_id = "LM15", duration=0)
+        task3 = TaskOneStation(dest_id="LM17", source_id = "LM16", duration=100)
+        # combine the tasks into a multi-point task
+        m_task = TaskMultiStation([task1, task2, task3])
+        # use the NavigationAPI class to send the task to the AGV
+        Nav = NavigationAPI(ip = "127.0.0.1")
+        success = Nav.execute(m_task)
+        print(success)
+        ```
+        In above code, the AGV will move from LM1 to LM15, then stop for 100ms, and move to LM16, then move to LM17 without any delay in between, then stop for 100ms.
+
+        Args:
+            tasks (List[TaskOneStation]): list of TaskOneStation objects
+        """
+        self.requestId = 0
+        self.messageType = 3066  # multi point task
+        self.msg = {}
+
+        self.tasks = tasks
+
+    def _as_json(self) -> str:
+        as_json = {"move_task_list": [to_json(task) for task in self.tasks]}
+        return as_json
+
+    def _execute(self, transport):
+        """_summary_
+
+        Args:
+            transport (TcpTransport): transport object
+        """
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        self.msg = self._as_json()
+        if "move_task_list" not in self.msg:
+            raise ValueError("task list is required")
+        if len(self.msg["move_task_list"]) == 0:
+            raise ValueError("task list is empty")
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class TaskCoordinate:
+
+    def __init__(self,
+                 x: float,
+                 y: float,
+                 angle: float,
+                 max_speed: float = None,
+                 max_wspeed: float = None,
+                 max_acc: float = None,
+                 max_wacc: float = None) -> None:
+        """
+        Move the AGV to a specific coordinate on the map. The AGV will move to the target coordinate and stop.
+        if the angle is not set, the AGV will not rotate. If the angle is set, the AGV will rotate to the target angle.
+        One should always provide atleast three parameters (x, y, angle) to ensure that the AGV will move to the target coordinate.
+        This function should be used with caution as it can lead to collisions if the AGV is not moving in the right direction.
+
+        Args:
+            x (float): x coordinate of the target site
+            y (float): y coordinate of the target site
+            angle (float): The angle value at the target site. The angle is optional and is given in degrees. 
+                        The angle is measured from the x-axis of the map. The angle is measured clockwise. 
+            max_speed (float): maximum speed in m/s
+            max_wspeed (float): maximum angular speed in rad/s
+            max_acc (float): maximum acceleration in m/s^2
+            max_wacc (float): maximum angular acceleration in rad/s^2
+        """
+        self.requestId = 0
+        self.messageType = 3050  # go to x, y, a coordinate task
+        self.msg = {}
+
+        self.x = x
+        self.y = y
+        self.angle = angle
+        self.max_speed = max_speed
+        self.max_wspeed = max_wspeed
+        self.max_acc = max_acc
+        self.max_wacc = max_wacc
+
+    def _execute(self, transport):
+        """ excute the task to be used by Navigation class
+
+        Args:
+            transport (TcpTransport): transport object
+        """
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        self.msg = to_json(self)
+        if "angle" not in self.msg:
+            raise ValueError("angle is required")
+        if "x" not in self.msg:
+            raise ValueError("x is required")
+        if "y" not in self.msg:
+            raise ValueError("y is required")
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class TaskSuspend:
+
+    def __init__(self) -> None:
+        """
+        Suspend the current task. (can be resumed later using TaskResume)
+        """
+        self.requestId = 0
+        self.messageType = 3001  # suspend task
+        self.msg = {}
+
+    def _execute(self, transport):
+        """_summary_
+
+        Args:
+            transport (TcpTransport): transport object
+        """
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class TaskResume:
+
+    def __init__(self) -> None:
+        """
+        Resume the current task. (only for suspended tasks)
+        """
+        self.requestId = 0
+        self.messageType = 3002  # resume task
+        self.msg = {}
+
+    def _execute(self, transport):
+        """ excute the task
+
+        Args:
+            transport (TcpTransport): transport object
+        """
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class TaskCancel:
+
+    def __init__(self) -> None:
+        """
+        Cancel the current task.
+        """
+        self.requestId = 0
+        self.messageType = 3003  # cancel task
+        self.msg = {}
+
+    def _execute(self, transport):
+        """_summary_
+
+        Args:
+            transport (TcpTransport): transport object
+        """
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class TaskRouteListQuery:
+
+    def __init__(self, ) -> None:
+        """Query the route list (stations list or path) of the AGV.
+        """
+        self.requestId = 0
+        self.messageType = 3053  #robot_task_target_path_req
+        self.msg = {}
+        self.route_list = []
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        return self.msg
+
+    def _parse(self, response):
+        if check_success(response):
+            self.route_list = response["path"]
+            return True
+        else:
+            return False
+
+
+class TaskClearMultiStations:
+
+    def __init__(self, ) -> None:
+        """
+        Clear the multi-stations list of the AGV (only for stations list tasks issued by TaskMultiStation)
+        """
+        self.requestId = 0
+        self.messageType = 3067
+        self.msg = {}
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class TaskClearSpecificTask:
+
+    def __init__(self, task_id: int) -> None:
+        """
+        Clear the specific task from the multi-stations list of the AGV (only for stations list tasks issued by TaskMultiStation)
+        """
+        self.requestId = 0
+        self.messageType = 3068
+        self.msg = {}
+        self.station_id = task_id
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        self.msg = to_json(self)
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class TaskChainQuery:
+
+    def __init__(self,
+                 task_list_name: str,
+                 with_robot_status: bool = True) -> None:
+        """_summary_
+
+        Args:
+            task_list_name (str): The name of the task chain that needs to be queried. 
+                                This task chain is the last executed (executing) task chain. 
+                                If the task chain can be queried, the details will be returned, if not, taskListStatus will return 404.
+            with_robot_status (bool, optional): If it is true, return the status data of the robot. 
+                                                In the current status data, there is only power information. Defaults to True.
+
+        """
+        self.requestId = 0
+        self.messageType = 3101  # robot_tasklist_status_req
+        self.msg = {}
+
+        self.task_list_name = task_list_name
+        self.with_robot_status = with_robot_status
+        self.tasklist_status = None
+        self.robot_status = None
+
+    @staticmethod
+    def check_status(TaskListStaus: int):
+        """A static method to check the status of the task chain query.
+            Use the value of TaskListStaus key in tasklist_status to check the status of the task.
+
+        Args:
+            TaskListStaus (int): TaskListStaus attribute of TaskChainQuery's response for tasklist_status
+        Returns:
+            (str): descripton of the status
+        """
+        if TaskListStaus == 0:
+            return "None"
+        elif TaskListStaus == 1:
+            return "Waiting"
+        elif TaskListStaus == 2:
+            return "Running"
+        elif TaskListStaus == 3:
+            return "Suspended"
+        elif TaskListStaus == 4:
+            return "Completed"
+        elif TaskListStaus == 5:
+            return "Failed"
+        elif TaskListStaus == 6:
+            return "Canceled"
+        elif TaskListStaus == 7:
+            return "OverTime"
+        else:
+            return "Unknown"
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        self.msg = to_json(self)
+        self.msg.pop("tasklist_status"
+                     )  # remove the key to avoid the error of the server
+        self.msg.pop(
+            "robot_status")  # remove the key to avoid the error of the server
+        return self.msg
+
+    def _parse(self, response):
+        if check_success(response):
+            self.task_list_status = response["tasklist_status"]
+            if self.with_robot_status:
+                self.robot_status = response["robot_status"]
+            return True
+        else:
+            return False
+
+
+class TaskChainlistQuery:
+
+    def __init__(self, ) -> None:
+        """
+        Query the list of tasks chains of the AGV.
+        """
+        self.requestId = 0
+        self.messageType = 3115
+        self.msg = {}
+        self.tasklists = None
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        return self.msg
+
+    def _parse(self, response):
+        if check_success(response):
+            self.tasklists = response["tasklists"]
+            return True
+        else:
+            return False
+
+
+class TaskExecuteTaskChain:
+
+    def __init__(self, name: str) -> None:
+        """
+        Execute a pre-existing task chain on the AGV.
+        
+        Args:
+            name (str): name of the task chain to be executed
+        """
+        self.requestId = 0
+        self.messageType = 3106
+        self.msg = {}
+        self.name = name
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class TaskOutcome(
+        namedtuple("TaskOutcome", ("task_status", "target_id", "elapsed"))):
+    """final state of a navigation task: task_status (TASK_COMPLETED, TASK_FAILED or TASK_CANCELED), the last
+    target_id reported by the AGV and the seconds from sending the task to its end"""
+
+    __slots__ = ()
+
+    @property
+    def succeeded(self):
+        return self.task_status == TASK_COMPLETED
+
+
+class _TaskWait:
+
+    __slots__ = ("future", "sent_at", "accepted_at", "started")
+
+    def __init__(self):
+        self.future = Future()
+        self.sent_at = time.monotonic()
+        # time.monotonic() when the AGV accepted the task, statuses before are ignored
+        self.accepted_at = None
+        # an active task status was seen after the task was accepted
+        self.started = False
+
+
+class TaskMonitor:
+
+    def __init__(self,
+                 ip: str,
+                 push_port: int = API_PORT_PUSH,
+                 state_port: int = API_PORT_STATE,
+                 pool: TransportPool = None,
+                 poll_interval: float = 0.5,
+                 stale_after: float = 2.0,
+                 settle: float = 0.05) -> None:
+        """
+        Tracks the navigation task of one robot from the task_status of its push messages and resolves the futures
+        returned by NavigationAPI.submit() when the task completes, fails or is canceled. All waits on a robot share
+        one push connection; task_monitor() returns the shared monitor of a robot.
+
+        While no push message carrying task_status arrives for stale_after seconds (push connection down, or
+        monitoring configured without task_status) and a task is waited for, the navigation status (1020) is
+        polled on the state port instead.
+
+        A task is tracked from the moment the AGV accepts it. A final status ends the task if an active status
+        (waiting, running, suspended) was seen before, or if it was generated after the task was accepted: push
+        messages received within settle seconds of the acceptance may predate it. Submitting a new task ends the
+        waits of the previous ones as canceled, since the AGV replaces the current task.
+
+        Args:
+            ip (str): AGV ip address
+            push_port (int, optional): push API port. Defaults to API_PORT_PUSH.
+            state_port (int, optional): state API port of the polling fallback. Defaults to API_PORT_STATE.
+            pool (TransportPool, optional): share the transports from this pool. Defaults to None.
+            poll_interval (float, optional): seconds between polls of the fallback. Defaults to 0.5.
+            stale_after (float, optional): seconds without task_status pushes before polling. Defaults to 2.0.
+            settle (float, optional): age in seconds of push messages that may still predate a just accepted
+                                      task. Defaults to 0.05.
+        """
+        self.ip = ip
+        self.state_port = state_port
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.settle = settle
+        # last task_status and target_id reported, and time.monotonic() of the last push message carrying them
+        self.task_status = None
+        self.target_id = ""
+        self.last_push = 0.0
+        self.polls = 0
+        self._waits = []
+        self._lock = Lock()
+        self._transport = None
+        self._poller = None
+        self._closed = Event()
+        self.notification = Notification(ip, push_port, lazy=True, pool=pool)
+        self.notification.subscribe(self._on_push)
+
+    @property
+    def waiting(self):
+        return len(self._waits)
+
+    def watch(self):
+        """start waiting for the next task, call before the task is sent so no status is missed"""
+        wait = _TaskWait()
+        wait.future.add_done_callback(self._discard)
+        with self._lock:
+            superseded, self._waits = self._waits, [wait]
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = Thread(target=self._poll,
+                                      name=f"task-monitor-{self.ip}",
+                                      daemon=True)
+                self._poller.start()
+        for previous in superseded:
+            self._resolve(previous, TASK_CANCELED)
+        return wait
+
+    def accept(self, wait):
+        """the AGV accepted the task of wait"""
+        wait.accepted_at = time.monotonic()
+
+    def reject(self, wait, error):
+        """the task of wait was not accepted, fail its future with error"""
+        with self._lock:
+            if wait in self._waits:
+                self._waits.remove(wait)
+        if not wait.future.done():
+            wait.future.set_exception(error)
+
+    def _discard(self, future):
+        """stop tracking the task of a future canceled by the caller"""
+        if future.cancelled():
+            with self._lock:
+                self._waits = [
+                    wait for wait in self._waits if wait.future is not future
+                ]
+
+    def _on_push(self, data):
+        if "task_status" not in data:
+            return
+        now = time.monotonic()
+        self.last_push = now
+        self._update(data, now - self.settle)
+
+    def _update(self, data, generated_after):
+        """apply a navigation status generated after the monotonic time generated_after"""
+        status = data.get("task_status")
+        self.task_status = status
+        self.target_id = data.get("target_id", "")
+        done = []
+        with self._lock:
+            for wait in self._waits:
+                if wait.accepted_at is None:
+                    continue
+                if status in _TASK_ACTIVE:
+                    wait.started = True
+                elif status in _TASK_DONE and (
+                        wait.started or generated_after >= wait.accepted_at):
+                    done.append(wait)
+            for wait in done:
+                self._waits.remove(wait)
+        for wait in done:
+            self._resolve(wait, status)
+
+    def _resolve(self, wait, status):
+        try:
+            wait.future.set_result(
+                TaskOutcome(status, self.target_id,
+                            time.monotonic() - wait.sent_at))
+        except InvalidStateError:
+            # canceled by the caller
+            pass
+
+    def _poll(self):
+        """polling fallback, runs while tasks are waited for"""
+        while not self._closed.wait(self.poll_interval):
+            if not self._waits:
+                with self._lock:
+                    if not self._waits:
+                        self._poller = None
+                        return
+            if time.monotonic() - self.last_push < self.stale_after:
+                continue
+            if self._transport is None:
+                if self.pool is None:
+                    self._transport = TcpTransport(self.ip, self.state_port,
+                                                   lazy=True)
+                else:
+                    self._transport = self.pool.acquire(
+                        self.ip, self.state_port, True)
+            if not self._transport.connected:
+                continue
+            sent_at = time.monotonic()
+            data = self._transport.send_n_receive(0, 1020)
+            self.polls += 1
+            if data and data.get("ret_code", 0) == 0:
+                self._update(data, sent_at)
+
+    def close(self):
+        """stop monitoring, pending waits are failed"""
+        self._closed.set()
+        with self._lock:
+            waits, self._waits = self._waits, []
+        for wait in waits:
+            if not wait.future.done():
+                wait.future.set_exception(
+                    ConnectionError("task monitor closed"))
+        self.notification.unsubscribe(self._on_push)
+        self.notification.close()
+        if self._transport is not None:
+            if self.pool is None:
+                self._transport.close()
+            else:
+                self.pool.release(self._transport)
+            self._transport = None
+
+
+_monitors = {}
+_monitors_lock = Lock()
+
+
+def task_monitor(ip, push_port=API_PORT_PUSH, pool=None):
+    """return the TaskMonitor of a robot, shared by all NavigationAPI instances of the process"""
+    with _monitors_lock:
+        monitor = _monitors.get((ip, push_port, pool))
+        if monitor is None:
+            monitor = _monitors[(ip, push_port, pool)] = TaskMonitor(
+                ip, push_port, pool=pool)
+        return monitor
+
+
+class NavigationAPI:
+
+    def __init__(self,
+                 ip: str,
+                 port: int = API_PORT_TASK,
+                 lazy: bool = False,
+                 pool: TransportPool = None,
+                 monitor: TaskMonitor = None) -> None:
+        """NavigationAPI class.
+        An instance of this class is used to manage navigation commands to the robot.
+
+        Args:
+            ip (str): _description_
+            port (int, optional): _description_. Defaults to API_PORT_TASK.
+            lazy (bool, optional): connect in the background instead of in the constructor. Defaults to False.
+            pool (TransportPool, optional): share the transport of (ip, port) from this pool instead of opening a
+                                            connection of its own. Defaults to None.
+            monitor (TaskMonitor, optional): task monitor of submit() and execute_and_wait(). Defaults to the
+                                             shared monitor of the robot, see task_monitor().
+        """
+
+        self.ip = ip
+        self.port = port
+        self.pool = pool
+        self.monitor = monitor
+        if pool is None:
+            self.transport = TcpTransport(self.ip, self.port, lazy=lazy)
+        else:
+            self.transport = pool.acquire(self.ip, self.port, lazy)
+
+    @property
+    def connected(self):
+        return self.transport.connected
+
+    def close(self):
+        if self.pool is None:
+            self.transport.close()
+        else:
+            self.pool.release(self.transport)
+
+    def execute(self, task):
+        """Excetute a task on the AGV.
+        Note that the task is executed in a non-blocking way, so the function will return immediately after the task is sent to the AGV.
+        in order to check if the task is finished, refer the Status class of the API.
+        usage:
+        To move AGV to a specific station on the map:
+        ```
+        Nav = NavigationAPI(ip='127.0.0.1')
+        s_task = TaskOneStation(dest_id='LM15', max_speed=0.5, max_acc=0.5)
+        success = Nav.execute(s_task)
+        print(success)
+        ```
+        To cancel the task:
+        ```
+        Nav = NavigationAPI(ip='127.0.0.1')
+        success = Nav.execute(TaskCancel())
+        print(success)
+        ```
+        Args:
+            task (Task): Task object to be executed
+        """
+        return task._execute(self.transport)
+
+    def submit(self, task):
+        """Execute a navigation task and return a future that resolves once the task has ended.
+        The end of the task is taken from the push messages of the AGV (see TaskMonitor), so any number of tasks
+        can be waited for without polling.
+        usage:
+        ```python
+        Nav = NavigationAPI(ip='127.0.0.1')
+        future = Nav.submit(TaskOneStation(dest_id='LM15'))
+        ...
+        outcome = future.result(timeout=120)
+        print(outcome.succeeded, outcome.task_status, outcome.elapsed)
+        ```
+        Args:
+            task (Task): navigation task such as TaskOneStation, TaskMultiStation or TaskCoordinate
+
+        Returns:
+            Future: resolved with a TaskOutcome, fails if the AGV does not accept the task. Canceling it stops the
+                    tracking of the task.
+        """
+        if self.monitor is None:
+            self.monitor = task_monitor(self.ip, pool=self.pool)
+        wait = self.monitor.watch()
+        try:
+            accepted = self.execute(task)
+        except Exception as e:
+            self.monitor.reject(wait, e)
+            return wait.future
+        if accepted:
+            self.monitor.accept(wait)
+        else:
+            self.monitor.reject(wait,
+                                RuntimeError("the AGV rejected the task"))
+        return wait.future
+
+    def execute_and_wait(self, task, timeout=None):
+        """Execute a navigation task and block until it has ended, see submit().
+
+        Args:
+            task (Task): navigation task
+            timeout (float, optional): maximum time to wait in seconds. Defaults to None (wait forever).
+
+        Returns:
+            TaskOutcome: final task status, raises TimeoutError if the task did not end within timeout
+        """
+        future = self.submit(task)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            # the monitor stops tracking (and polling for) the abandoned task
+            future.cancel()
+            raise
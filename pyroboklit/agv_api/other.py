@@ -1,277 +1,587 @@
-# -*- coding: utf-8 -*-
-"""
-╔══════════════════════════════════════════════════════════╗
-║ File:           other.py                                 ║
-║ Author:         Nexus1203                                ║
-║ Created:        2023-03-29                               ║
-║ Last Modified:  2023-03-29                               ║
-║ Description:    Other functions port of robotkit api     ║  
-╚══════════════════════════════════════════════════════════╝
-"""
-
-from ..tcp_transport import TcpTransport
-from ..tcp_transport import API_PORT_OTHER
-from .utils import check_success, to_json
-
-
-class SoftEMC:
-
-    def __init__(self, stop: bool = True):
-        """
-        A class to control the software emergency stop of the robotkit API
-
-        Args:
-            stop (bool, optional): set the software emergency to True or false. Defaults to True.
-        """
-        self.requestId = 0
-        self.messageType = 6004  # softEMC
-        self.msg = {}
-
-        self.status = stop
-
-    def _execute(self, transport):
-        self.msg = to_json(self)
-
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class SetDigitalInput:
-
-    def __init__(self, id: int, value: bool = False):
-        """
-        A class to set the value of a digital input virtually
-
-        Args:
-            id (int): id of the digital input
-            value (bool): value to set, True or False. Defaults to False.
-        """
-        self.requestId = 0
-        self.messageType = 6020
-        self.msg = {}
-        self.id = id
-        self.status = value
-
-    def _execute(self, transport):
-        self.msg = to_json(self)
-
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class SetDigitalOutput:
-
-    def __init__(self, id: int, value: bool = False):
-        """
-        A class to set the value of a digital output virtually
-
-        Args:
-            id (int): id of the digital output
-            value (bool): value to set, True or False. Defaults to False.
-        """
-        self.requestId = 0
-        self.messageType = 6001
-        self.msg = {}
-        self.id = id
-        self.status = value
-
-    def _execute(self, transport):
-        self.msg = to_json(self)
-
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class SetBatchDigitalOutput:
-
-    def __init__(self, ListDigitalOutput: list = None):
-        """
-        A class to set the value of a digital output virtually
-
-        Args:
-            ListDigitalOutput (list): list of digital output class ([SetDigitalOutput(0, True), SetDigitalOutput(1, False)])
-        """
-        self.requestId = 0
-        self.messageType = 6002
-        self.msg = {}
-        self.IO_list = ListDigitalOutput
-
-    def _execute(self, transport):
-        as_json = [to_json(io_class) for io_class in self.IO_list]
-
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            as_json)
-        return check_success(response)
-
-
-class ForkliftStop:
-
-    def __init__(self):
-        """
-        A class to stop the forklift
-        """
-        self.requestId = 0
-        self.messageType = 6041
-        self.msg = {}
-
-    def _execute(self, transport):
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class ForkliftHeight:
-
-    def __init__(self, height: float = 0.0):
-        """
-        A class to set the forklift height
-
-        Args:
-            height (float): height to set
-        """
-        self.requestId = 0
-        self.messageType = 6040
-        self.msg = {}
-        self.height = height
-
-    def _execute(self, transport):
-        self.msg = to_json(self)
-
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class AudioList:
-
-    def __init__(self) -> None:
-        """Get a list of available audio files"""
-        self.requestId = 0
-        self.messageType = 6033
-        self.msg = {}
-        self.audio_list = []
-
-    def _execute(self, transport):
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        if check_success(response):
-            self.audio_list = response["audios"]
-            return True
-        else:
-            return False
-
-
-class AudioPlay:
-
-    def __init__(self, name: str, loop: bool = False) -> None:
-        """
-        A class to play audio
-
-        Args:
-            name (str): filename of the audio file
-            loop (bool, optional): loop the audio. Defaults to False.
-        """
-        self.requestId = 0
-        self.messageType = 6000
-        self.msg = {}
-        if name is None:
-            raise ValueError(
-                "Audio name cannot be None, please provide a valid name\n." +
-                "You can get a list of available audio files with the AudioList class"
-            )
-        self.name = name
-        self.loop = loop
-
-    def _execute(self, transport):
-        self.msg = to_json(self)
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class AudioPause:
-
-    def __init__(self) -> None:
-        """Pause playing audio"""
-        self.requestId = 0
-        self.messageType = 6010
-        self.msg = {}
-
-    def _execute(self, transport):
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class AudioContine:
-
-    def __init__(self) -> None:
-        """Continue playing audio"""
-        self.requestId = 0
-        self.messageType = 6011
-        self.msg = {}
-
-    def _execute(self, transport):
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class AudioStop:
-
-    def __init__(self) -> None:
-        """
-        A class to stop the audio
-        """
-        self.requestId = 0
-        self.messageType = 6012
-        self.msg = {}
-
-    def _execute(self, transport):
-        response = transport.send_n_receive(self.requestId, self.messageType,
-                                            self.msg)
-        return check_success(response)
-
-
-class OtherAPI:
-
-    def __init__(self, ip: str, port: int = API_PORT_OTHER):
-        """Other API class. This class is used to execute other API requests.
-        
-        usage:
-        ```python
-        oapi = OtherAPI("127.0.0.1")
-        # set digital output 0 to True
-        success = oapi.execute(SetDigitalOutput(0, True))
-        # set forklift height to 0.05 m
-        success = oapi.execute(ForkliftHeight(0.05))
-        # soft stop the forklift
-        success = oapi.execute(SoftEMC(stop=True))
-        
-        # get the list of available audio files
-        audio_list = AudioList()
-        success = oapi.execute(audio_list)
-        print(audio_list.audio_list)
-        ```
-        
-        Args:
-            ip (str): IP address of the AGV's SEER controller
-            port (int, optional): API port of Other functions. Defaults to API_PORT_OTHER.
-        """
-        self.ip = ip
-        self.port = port
-        self.transport = TcpTransport(ip, port)
-
-    def execute(self, request):
-        """execute a request and return the response
-
-        Args:
-            request (class): Other API request class (e.g. SetDigitalOutput, ForkliftHeight, etc.)
-
-        Returns:
-            bool: returns the success of the request, True if successful, False if not.
-        """
-        return request._execute(self.transport)
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           other.py                                 ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-03-29                               ║
+║ Last Modified:  2023-03-29                               ║
+║ Description:    Other functions port of robotkit api     ║  
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from ..tcp_transport import TcpTransport, TransportPool
+from ..tcp_transport import API_PORT_OTHER, RESPONSE_TIMEOUT
+from ..tcp_transport.log import get_logger
+from .utils import check_success, to_json
+
+logger = get_logger(__name__)
+
+
+class SoftEMC:
+
+    def __init__(self, stop: bool = True):
+        """
+        A class to control the software emergency stop of the robotkit API
+
+        Args:
+            stop (bool, optional): set the software emergency to True or false. Defaults to True.
+        """
+        self.requestId = 0
+        self.messageType = 6004  # softEMC
+        self.msg = {}
+
+        self.status = stop
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        self.msg = to_json(self)
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class SetDigitalInput:
+
+    def __init__(self, id: int, value: bool = False):
+        """
+        A class to set the value of a digital input virtually
+
+        Args:
+            id (int): id of the digital input
+            value (bool): value to set, True or False. Defaults to False.
+        """
+        self.requestId = 0
+        self.messageType = 6020
+        self.msg = {}
+        self.id = id
+        self.status = value
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        self.msg = to_json(self)
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class SetDigitalOutput:
+
+    def __init__(self, id: int, value: bool = False):
+        """
+        A class to set the value of a digital output virtually
+
+        Args:
+            id (int): id of the digital output
+            value (bool): value to set, True or False. Defaults to False.
+        """
+        self.requestId = 0
+        self.messageType = 6001
+        self.msg = {}
+        self.id = id
+        self.status = value
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        self.msg = to_json(self)
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class SetBatchDigitalOutput:
+
+    def __init__(self, ListDigitalOutput: list = None):
+        """
+        A class to set the value of a digital output virtually
+
+        Args:
+            ListDigitalOutput (list): list of digital output class ([SetDigitalOutput(0, True), SetDigitalOutput(1, False)])
+        """
+        self.requestId = 0
+        self.messageType = 6002
+        self.msg = {}
+        self.IO_list = ListDigitalOutput
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        as_json = [to_json(io_class) for io_class in self.IO_list]
+        return as_json
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class ForkliftStop:
+
+    def __init__(self):
+        """
+        A class to stop the forklift
+        """
+        self.requestId = 0
+        self.messageType = 6041
+        self.msg = {}
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class ForkliftHeight:
+
+    def __init__(self, height: float = 0.0):
+        """
+        A class to set the forklift height
+
+        Args:
+            height (float): height to set
+        """
+        self.requestId = 0
+        self.messageType = 6040
+        self.msg = {}
+        self.height = height
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        self.msg = to_json(self)
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class AudioList:
+
+    def __init__(self) -> None:
+        """Get a list of available audio files"""
+        self.requestId = 0
+        self.messageType = 6033
+        self.msg = {}
+        self.audio_list = []
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        return self.msg
+
+    def _parse(self, response):
+        if check_success(response):
+            self.audio_list = response["audios"]
+            return True
+        else:
+            return False
+
+
+class AudioPlay:
+
+    def __init__(self, name: str, loop: bool = False) -> None:
+        """
+        A class to play audio
+
+        Args:
+            name (str): filename of the audio file
+            loop (bool, optional): loop the audio. Defaults to False.
+        """
+        self.requestId = 0
+        self.messageType = 6000
+        self.msg = {}
+        if name is None:
+            raise ValueError(
+                "Audio name cannot be None, please provide a valid name\n." +
+                "You can get a list of available audio files with the AudioList class"
+            )
+        self.name = name
+        self.loop = loop
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        self.msg = to_json(self)
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class AudioPause:
+
+    def __init__(self) -> None:
+        """Pause playing audio"""
+        self.requestId = 0
+        self.messageType = 6010
+        self.msg = {}
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class AudioContine:
+
+    def __init__(self) -> None:
+        """Continue playing audio"""
+        self.requestId = 0
+        self.messageType = 6011
+        self.msg = {}
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class AudioStop:
+
+    def __init__(self) -> None:
+        """
+        A class to stop the audio
+        """
+        self.requestId = 0
+        self.messageType = 6012
+        self.msg = {}
+
+    def _execute(self, transport):
+        response = transport.send_n_receive(self.requestId, self.messageType,
+                                            self._prepare())
+        return self._parse(response)
+
+    def _prepare(self):
+        return self.msg
+
+    def _parse(self, response):
+        return check_success(response)
+
+
+class OtherAPI:
+
+    def __init__(self,
+                 ip: str,
+                 port: int = API_PORT_OTHER,
+                 lazy: bool = False,
+                 pool: TransportPool = None):
+        """Other API class. This class is used to execute other API requests.
+        
+        usage:
+        ```python
+        oapi = OtherAPI("127.0.0.1")
+        # set digital output 0 to True
+        success = oapi.execute(SetDigitalOutput(0, True))
+        # set forklift height to 0.05 m
+        success = oapi.execute(ForkliftHeight(0.05))
+        # soft stop the forklift
+        success = oapi.execute(SoftEMC(stop=True))
+        
+        # get the list of available audio files
+        audio_list = AudioList()
+        success = oapi.execute(audio_list)
+        print(audio_list.audio_list)
+        ```
+        
+        Args:
+            ip (str): IP address of the AGV's SEER controller
+            port (int, optional): API port of Other functions. Defaults to API_PORT_OTHER.
+            lazy (bool, optional): connect in the background instead of in the constructor. Defaults to False.
+            pool (TransportPool, optional): share the transport of (ip, port) from this pool instead of opening a
+                                            connection of its own. Defaults to None.
+        """
+        self.ip = ip
+        self.port = port
+        self.pool = pool
+        if pool is None:
+            self.transport = TcpTransport(ip, port, lazy=lazy)
+        else:
+            self.transport = pool.acquire(ip, port, lazy)
+
+    @property
+    def connected(self):
+        return self.transport.connected
+
+    def close(self):
+        if self.pool is None:
+            self.transport.close()
+        else:
+            self.pool.release(self.transport)
+
+    def execute(self, request):
+        """execute a request and return the response
+
+        Args:
+            request (class): Other API request class (e.g. SetDigitalOutput, ForkliftHeight, etc.)
+
+        Returns:
+            bool: returns the success of the request, True if successful, False if not.
+        """
+        return request._execute(self.transport)
+
+
+class DigitalIOWriter:
+
+    def __init__(self,
+                 api: OtherAPI,
+                 window: float = 0.005,
+                 timeout: float = RESPONSE_TIMEOUT) -> None:
+        """
+        Coalesces digital output and (virtual) digital input writes. Writes within window seconds of the first
+        pending write are collected, repeated writes to the same id collapse to the last value and writes that
+        match the last known state are skipped. The remaining outputs are sent as one SetBatchDigitalOutput (6002)
+        and the inputs, which have no batch request, as SetDigitalInput (6020) requests sent back to back with a
+        single wait for all responses.
+
+        The known state is the last successfully written value of each id, observe() adds the states reported by
+        the AGV (e.g. push messages).
+
+        usage:
+        ```python
+        oapi = OtherAPI("127.0.0.1")
+        writer = DigitalIOWriter(oapi, window=0.005)
+        for io_id, value in plc_changes:
+            writer.set_output(io_id, value)
+        # wait for a write if needed
+        success = writer.set_output(3, True).result()
+        writer.close()
+        ```
+
+        Args:
+            api (OtherAPI): API whose transport the requests are sent on
+            window (float, optional): seconds writes are collected before they are sent. Defaults to 0.005.
+            timeout (float, optional): seconds to wait for the responses of a batch, writes without a response
+                                       fail. Defaults to RESPONSE_TIMEOUT.
+        """
+        self.api = api
+        self.window = window
+        self.timeout = timeout
+        # known states as {("DO" | "DI", id): bool}
+        self.known = {}
+        # pending writes as {("DO" | "DI", id): (value, [futures])}, in order of their first write
+        self._pending = {}
+        # number of taken batches not confirmed yet that write an id, as {("DO" | "DI", id): count}
+        self._inflight = {}
+        self._deadline = None
+        self._condition = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._closed = False
+        self._thread = None
+
+        self.writes = 0
+        self.skipped = 0
+        self.collapsed = 0
+        self.requests = 0
+
+    def set_output(self, id: int, value: bool) -> Future:
+        """write a digital output
+
+        Returns:
+            Future: resolved with the success of the write once it is sent (or skipped)
+        """
+        return self._write("DO", id, value)
+
+    def set_input(self, id: int, value: bool) -> Future:
+        """write a virtual digital input
+
+        Returns:
+            Future: resolved with the success of the write once it is sent (or skipped)
+        """
+        return self._write("DI", id, value)
+
+    def observe(self, data):
+        """update the known states from a message with "DO" and "DI" lists of {"id", "status"}"""
+        with self._condition:
+            for kind in ("DO", "DI"):
+                for io in data.get(kind) or ():
+                    self.known[(kind, io["id"])] = bool(io["status"])
+
+    def _write(self, kind, id, value):
+        future = Future()
+        key = (kind, id)
+        value = bool(value)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("IO writer is closed")
+            self.writes += 1
+            pending = self._pending.get(key)
+            if pending is None:
+                # while a write of the id is in flight its known state is outdated, nothing is skipped
+                if key not in self._inflight and self.known.get(key) == value:
+                    self.skipped += 1
+                    future.set_result(True)
+                    return future
+                self._pending[key] = (value, [future])
+            else:
+                self.collapsed += 1
+                pending[1].append(future)
+                self._pending[key] = (value, pending[1])
+            if self._deadline is None:
+                self._deadline = time.monotonic() + self.window
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run,
+                                                    name="io-writer",
+                                                    daemon=True)
+                    self._thread.start()
+                self._condition.notify()
+        return future
+
+    def _take(self):
+        batch, self._pending = self._pending, {}
+        self._deadline = None
+        for key in batch:
+            self._inflight[key] = self._inflight.get(key, 0) + 1
+        return batch
+
+    def _confirm(self, batch, results):
+        """update the known states with the results {key: success} of a sent batch, release its in-flight ids and
+        resolve the futures of its writes. Writes without a result (the batch raised) failed."""
+        with self._condition:
+            for key, (value, _) in batch.items():
+                if results.get(key, False):
+                    self.known[key] = value
+                else:
+                    self.known.pop(key, None)
+                count = self._inflight[key] - 1
+                if count:
+                    self._inflight[key] = count
+                else:
+                    del self._inflight[key]
+        for key, (_, futures) in batch.items():
+            ok = results.get(key, False)
+            for future in futures:
+                if not future.done():
+                    future.set_result(ok)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and (self._deadline is None or
+                                            time.monotonic() < self._deadline):
+                    self._condition.wait(None if self._deadline is None else
+                                         self._deadline - time.monotonic())
+                if self._closed and not self._pending:
+                    return
+                batch = self._take()
+            try:
+                self._send(batch)
+            except Exception:
+                # the futures of the batch have failed, the writer keeps serving later writes
+                logger.exception("[IO Writer] :: Error sending writes")
+
+    def flush(self):
+        """send the pending writes now
+
+        Returns:
+            bool: True if all writes succeeded
+        """
+        with self._condition:
+            batch = self._take()
+        return self._send(batch)
+
+    def _send(self, batch):
+        # batches are sent one at a time, so the known states are up to date when a batch is sent
+        with self._send_lock:
+            results = {}
+            try:
+                return self._send_batch(batch, results)
+            finally:
+                self._confirm(batch, results)
+
+    def _send_batch(self, batch, results):
+        """send the writes of a batch that differ from the known states and record their success in results"""
+        outputs, inputs = [], []
+        for (kind, id), (value, futures) in batch.items():
+            if self.known.get((kind, id)) == value:
+                # collapsed back to the known state
+                self.skipped += 1
+                results[(kind, id)] = True
+                continue
+            writes = outputs if kind == "DO" else inputs
+            writes.append((id, value, futures))
+        if not outputs and not inputs:
+            return True
+
+        requests = []
+        if outputs:
+            requests.append((SetBatchDigitalOutput([
+                SetDigitalOutput(id, value) for id, value, _ in outputs
+            ]), "DO", outputs))
+        requests.extend(
+            (SetDigitalInput(id, value), "DI", [(id, value, futures)])
+            for id, value, futures in inputs)
+        transport = self.api.transport
+        sent = [
+            transport.submit(request.messageType, request._prepare())
+            for request, _, _ in requests
+        ]
+        transport.wait(sent, self.timeout)
+        self.requests += len(sent)
+
+        success = True
+        for response, (_, kind, writes) in zip(sent, requests):
+            ok = (response.done() and response.exception() is None
+                  and response.result() is not None
+                  and check_success(response.result()))
+            success = success and ok
+            if not ok:
+                logger.warning("[IO Writer] :: Writing %s %s failed", kind,
+                               [id for id, _, _ in writes])
+            for id, _, _ in writes:
+                results[(kind, id)] = ok
+        return success
+
+    def close(self):
+        """send the pending writes and stop the writer thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
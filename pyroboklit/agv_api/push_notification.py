@@ -1,71 +1,314 @@
-# -*- coding: utf-8 -*-
-"""
-╔══════════════════════════════════════════════════════════╗
-║ File:           push_notification.py                     ║
-║ Author:         Nexus1203                                ║
-║ Created:        2023-03-23                               ║
-║ Last Modified:  2023-03-23                               ║
-║ Description:    Notification port functions of API       ║  
-╚══════════════════════════════════════════════════════════╝
-"""
-
-from ..tcp_transport import TcpTransport
-from ..tcp_transport import API_PORT_PUSH
-from threading import Thread
-
-
-class Notification:
-
-    def __init__(self, ip, port=API_PORT_PUSH):
-        self.ip = ip
-        self.port = port
-        self.transport = TcpTransport(ip, port)
-        self.transport.connect()
-
-    def send(self, msg):
-        """_summary_
-
-        Args:
-            msg (_type_): message should contain a json object or dictionary
-            
-            of objects that has to bbe added to the monitoring list
-        """
-        self.transport.send(msg)
-
-    def configure_monitoring(self,
-                             interval=1000,
-                             parameters=["x", "y", "w"],
-                             defaults=True):
-        """
-        Args:
-            interval (int): interval in milliseconds
-            parameters (list): list of parameters to be monitored
-            defaults (bool): if True, the default parameters will be added to the list
-        """
-        if defaults:
-            parameters = [
-                "x", "y", "angle", "confidence", "vx", "vy", "w",
-                "current_station", "is_stop", "fork", "target_point",
-                "target_label", "target_id", "target_dist", "task_staus",
-                "running_status", "task_type", "emergency", "charging",
-                "battery_level", "map", "battery_temp", "voltage", "current"
-            ]
-
-        msg = {"interval": interval, "included_fields": parameters}
-        self.transport.send_command(1, 9300, msg)
-        data = self.transport.listen()
-        print(data)
-
-    def receive(self):
-        return self.transport.listen()
-
-    def close(self):
-        self.transport.close()
-
-
-if __name__ == "__main__":
-    notification = Notification("127.0.0.1")
-    notification.configure_monitoring()
-    while True:
-        data = notification.receive()
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           push_notification.py                     ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-03-23                               ║
+║ Last Modified:  2023-03-23                               ║
+║ Description:    Notification port functions of API       ║  
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import select
+import time
+from collections import deque
+from threading import Thread, Event, Condition, Lock
+from ..tcp_transport import TcpTransport
+from ..tcp_transport import API_PORT_PUSH, CLOSED
+from ..tcp_transport.log import get_logger
+
+logger = get_logger(__name__)
+
+
+class PushStream:
+
+    def __init__(self, transport, poll_interval: float = 0.5) -> None:
+        """
+        Reader thread of a push port connection. Frames are decoded as soon as they arrive, so the socket buffer
+        never fills up with stale data, and handed to the listeners. The most recent frame is kept in `latest`.
+
+        A push connection has a single stream, all Notification instances sharing a transport (see TransportPool)
+        share it, use push_stream() to get it.
+
+        Args:
+            transport (TcpTransport): transport of the push port
+            poll_interval (float, optional): how often the thread checks whether it should stop, in seconds.
+                                             Defaults to 0.5.
+        """
+        self.transport = transport
+        self.poll_interval = poll_interval
+        # most recent pushed message and its time.monotonic() receive time
+        self.latest = None
+        self.latest_at = 0.0
+        self.frames = 0
+        self.monitoring = None
+        self._listeners = []
+        self._socket = None
+        # socket the monitoring configuration was last sent on
+        self._configured_socket = None
+        self._stop_event = Event()
+        self._thread = None
+
+    def add_listener(self, listener):
+        """call listener(data) from the reader thread for every pushed message"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """remove a listener, returns the number of listeners left"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+        return len(self._listeners)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = Thread(
+            target=self._run,
+            name=f"push-{self.transport.ip}:{self.transport.port}",
+            daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(self.poll_interval * 2)
+
+    def configure(self, msg, timeout=None):
+        """send a monitoring configuration (9300) and wait for its response. The configuration is sent on every new
+        connection, so if the transport is not connected yet it is sent once it is and None is returned."""
+        self.monitoring = msg
+        if not self.transport.connected:
+            return None
+        self._configured_socket = self.transport.socket
+        future = self.transport.submit(9300, msg)
+        try:
+            return future.result(timeout)
+        except Exception as e:
+            logger.error("[Notification] :: Configuration failed: %s", e)
+            return None
+
+    def _run(self):
+        transport = self.transport
+        while not self._stop_event.is_set():
+            if not transport.connected:
+                if transport.state == CLOSED:
+                    return
+                transport.wait_connected(self.poll_interval)
+                continue
+            sock = transport.socket
+            if sock is not self._socket:
+                self._socket = sock
+                if (self.monitoring is not None
+                        and self._configured_socket is not sock):
+                    # a new connection starts with the default configuration of the controller
+                    self._configured_socket = sock
+                    transport.submit(9300, self.monitoring)
+            try:
+                # wait for data without a socket timeout, the socket is shared with the senders of the transport
+                if not len(transport.decoder) and not select.select(
+                    [sock], [], [], self.poll_interval)[0]:
+                    continue
+                with transport._recv_lock:
+                    frame = transport.read_frame()
+            except ValueError:
+                # the socket was closed by another thread
+                continue
+            except OSError as e:
+                if not self._stop_event.is_set():
+                    transport._connection_lost(e)
+                continue
+            if frame is None:
+                continue
+            if (frame[0], frame[1]) in transport.pending:
+                # response to a configuration request
+                transport._dispatch(frame)
+                continue
+            try:
+                data = transport.decode(frame[2])
+            except Exception as e:
+                logger.error("[Notification] :: Error: %s", e)
+                continue
+            if not data:
+                continue
+            self.latest = data
+            self.latest_at = time.monotonic()
+            self.frames += 1
+            for listener in list(self._listeners):
+                try:
+                    listener(data)
+                except Exception:
+                    logger.exception("[Notification] :: Error in listener")
+
+
+_streams = {}
+_streams_lock = Lock()
+
+
+def push_stream(transport):
+    """return the running PushStream of a transport, starting it if necessary"""
+    with _streams_lock:
+        stream = _streams.get(transport)
+        if stream is None:
+            stream = _streams[transport] = PushStream(transport)
+        stream.start()
+        return stream
+
+
+def _release_stream(transport, listener):
+    """remove a listener from the stream of transport and stop the stream when it has no listeners left"""
+    with _streams_lock:
+        stream = _streams.get(transport)
+        if stream is None or stream.remove_listener(listener):
+            return
+        del _streams[transport]
+    stream.stop()
+
+
+class Notification:
+
+    def __init__(self,
+                 ip,
+                 port=API_PORT_PUSH,
+                 lazy=False,
+                 pool=None,
+                 background=True,
+                 queue_size=1):
+        """
+        Client of the AGV push port.
+
+        By default a background thread reads the pushed messages as they arrive. `latest` always holds the most
+        recent message, receive() returns the messages from a bounded queue that drops the oldest entries when the
+        consumer falls behind, and subscribe() registers callbacks. With the default queue_size of 1 a slow consumer
+        only ever gets the newest message, never a backlog of stale ones.
+
+        usage:
+        ```python
+        notification = Notification("127.0.0.1")
+        notification.configure_monitoring(interval=500)
+        notification.subscribe(lambda data: print(data["x"], data["y"]))
+        while True:
+            data = notification.receive()  # newest message not returned before
+            time.sleep(1)
+        ```
+
+        Args:
+            ip (str): AGV ip address
+            port (int, optional): push API port. Defaults to API_PORT_PUSH.
+            lazy (bool, optional): connect in the background instead of in the constructor. Defaults to False.
+            pool (TransportPool, optional): share the transport of (ip, port) from this pool. Defaults to None.
+            background (bool, optional): read in a background thread. If False, receive() reads from the socket
+                                         directly. Defaults to True.
+            queue_size (int, optional): number of messages buffered for receive(). Defaults to 1.
+        """
+        self.ip = ip
+        self.port = port
+        self.pool = pool
+        if pool is None:
+            self.transport = TcpTransport(ip, port, lazy=lazy)
+        else:
+            self.transport = pool.acquire(ip, port, lazy)
+        self.queue = deque(maxlen=queue_size)
+        self.dropped = 0
+        self._available = Condition()
+        self._callbacks = []
+        self.stream = None
+        if background:
+            self.stream = push_stream(self.transport)
+            self.stream.add_listener(self._on_push)
+
+    def _on_push(self, data):
+        with self._available:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(data)
+            self._available.notify()
+        for callback in list(self._callbacks):
+            try:
+                callback(data)
+            except Exception:
+                logger.exception("[Notification] :: Error in callback")
+
+    @property
+    def latest(self):
+        """most recent pushed message, None if nothing was received yet or the notification is not in background
+        mode"""
+        return self.stream.latest if self.stream is not None else None
+
+    def subscribe(self, callback):
+        """call callback(data) for every pushed message. Callbacks run on the reader thread and should return
+        quickly."""
+        self._callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        self._callbacks.remove(callback)
+
+    def send(self, msg):
+        """_summary_
+
+        Args:
+            msg (_type_): message should contain a json object or dictionary
+            
+            of objects that has to bbe added to the monitoring list
+        """
+        self.transport.send(msg)
+
+    def configure_monitoring(self,
+                             interval=1000,
+                             parameters=["x", "y", "w"],
+                             defaults=True):
+        """
+        Args:
+            interval (int): interval in milliseconds
+            parameters (list): list of parameters to be monitored
+            defaults (bool): if True, the default parameters will be added to the list
+        """
+        if defaults:
+            parameters = [
+                "x", "y", "angle", "confidence", "vx", "vy", "w",
+                "current_station", "is_stop", "fork", "target_point",
+                "target_label", "target_id", "target_dist", "task_status",
+                "running_status", "task_type", "emergency", "charging",
+                "battery_level", "map", "battery_temp", "voltage", "current"
+            ]
+
+        msg = {"interval": interval, "included_fields": parameters}
+        if self.stream is not None:
+            data = self.stream.configure(msg, self.transport.connect_timeout)
+        else:
+            self.transport.send_command(1, 9300, msg)
+            data = self.transport.listen()
+        logger.info("[Notification] :: Monitoring configured: %s", data)
+
+    def receive(self, timeout=None):
+        """return the next pushed message. In background mode this is the oldest message in the queue.
+
+        Args:
+            timeout (float, optional): maximum time to wait in seconds (background mode only). Defaults to None.
+
+        Returns:
+            dict: pushed message, None on timeout or error
+        """
+        if self.stream is None:
+            return self.transport.listen()
+        with self._available:
+            if not self._available.wait_for(lambda: self.queue, timeout):
+                return None
+            return self.queue.popleft()
+
+    def close(self):
+        if self.stream is not None:
+            _release_stream(self.transport, self._on_push)
+            self.stream = None
+        if self.pool is None:
+            self.transport.close()
+        else:
+            self.pool.release(self.transport)
+
+
+if __name__ == "__main__":
+    notification = Notification("127.0.0.1")
+    notification.configure_monitoring()
+    while True:
+        data = notification.receive()
         print(data)
\ No newline at end of file
@@ -1,488 +1,923 @@
-# -*- coding: utf-8 -*-
-"""
-╔══════════════════════════════════════════════════════════╗
-║ File:           status.py                                ║
-║ Author:         Nexus1203                                ║
-║ Created:        2023-03-23                               ║
-║ Last Modified:  2023-03-23                               ║
-║ Description:    Status port features of robotkit api     ║  
-╚══════════════════════════════════════════════════════════╝
-"""
-
-from ..tcp_transport import TcpTransport
-from ..tcp_transport import API_PORT_STATE
-from .utils import check_success, to_json
-import time
-
-
-class StatusBattery:
-
-    def __init__(self, ):
-        """
-        Battery status class
-        """
-        # API request data
-        self.requestId = 0
-        self.messageType = 1007  # battery status query
-        self.msg = {}
-
-        # battery status
-        self.level = 0
-        self.temp = 0
-        self.charging = False
-        self.voltage = 0
-        self.current = 0
-        self.power = 0  # voltage * current
-        self.max_charge_voltage = 0
-        self.max_charge_current = 0
-        self.manual_charge = False
-        self.auto_charge = False
-        self.battery_cycle = 0
-
-        self.err_msg = ""
-        self.success = False
-        self.create_on = ""
-
-        self.json_data = {}
-
-    def _get_status(self, transport):
-        # self.msg = {"simple": "no"}  # get all battery status
-        # send command and receive data
-        data = transport.send_n_receive(self.requestId, self.messageType,
-                                        self.msg)
-        # parse data
-        self.json_data = data
-        self.success = check_success(data)
-
-        if self.success:
-            self.level = data["battery_level"]
-            self.temp = data["battery_temp"]
-            self.voltage = data["voltage"]
-            self.current = data["current"]
-            self.max_charge_voltage = data["max_charge_voltage"]
-            self.max_charge_current = data["max_charge_current"]
-            self.manual_charge = data["manual_charge"]
-            self.auto_charge = data["auto_charge"]
-            self.battery_cycle = data["battery_cycle"]
-            self.power = self.voltage * self.current
-            self.create_on = data["create_on"]
-        else:
-            self.create_on = data["create_on"]
-            self.err_msg = data["err_msg"]
-        return self.success
-
-
-class StatusPose:
-
-    def __init__(self, ):
-        # API request data
-        self.requestId = 0
-        self.messageType = 1004  # robot position query
-        self.msg = {}  # empty message
-
-        # AGV position attributes
-        self.x = 0
-        self.y = 0
-        self.angle = 0
-        self.confidence = 0
-        self.current_station = ""
-        self.last_station = ""
-
-        self.success = False
-        self.err_msg = 0
-        self.create_on = ""
-
-        self.json_data = {}
-
-    def _get_status(self, transport):
-
-        # send command and receive data
-        data = transport.send_n_receive(self.requestId, self.messageType,
-                                        self.msg)
-        # parse data
-        self.json_data = data
-        self.success = check_success(data)
-        if self.success:
-            self.x = data["x"]
-            self.y = data["y"]
-            self.angle = data["angle"]
-            self.confidence = data["confidence"]
-            self.current_station = data["current_station"]
-            self.last_station = data["last_station"]
-            self.create_on = data["create_on"]
-        else:
-            self.err_msg = data["err_msg"]
-            self.create_on = data["create_on"]
-
-        return self.success
-
-
-class StatusSpeed:
-
-    def __init__(self) -> None:
-        self.requestId = 0
-        self.messageType = 1005  # robot speed query
-        self.msg = {}  # empty message
-
-        # AGV speed attributes
-        self.vx = 0
-        self.vy = 0
-        self.w = 0
-        self.steer = 0
-        self.spin = 0
-        self.r_vx = 0
-        self.r_vy = 0
-        self.r_w = 0
-        self.r_steer = 0
-        self.r_spin = 0
-        self.steer_angle = 0
-        self.is_stop = False
-
-        self.success = False
-        self.err_msg = ""
-        self.create_on = ""
-
-        self.json_data = {}
-
-    def _get_status(self, transport):
-        # send command and receive data
-        data = transport.send_n_receive(self.requestId, self.messageType,
-                                        self.msg)
-        # parse data
-        self.json_data = data
-        self.success = check_success(data)
-        if self.success:
-            self.vx = data["vx"]
-            self.vy = data["vy"]
-            self.w = data["w"]
-            self.steer = data["steer"]
-            self.spin = data["spin"]
-            self.r_vx = data["r_vx"]
-            self.r_vy = data["r_vy"]
-            self.r_w = data["r_w"]
-            self.r_steer = data["r_steer"]
-            self.r_spin = data["r_spin"]
-            self.steer_angle = data["steer_angles"]
-            self.is_stop = data["is_stop"]
-            self.create_on = data["create_on"]
-        else:
-            self.err_msg = data["err_msg"]
-            self.create_on = data["create_on"]
-        return self.success
-
-
-class StatusForklift:
-
-    def __init__(self) -> None:
-        """Get the fork status of the AGV and the current fork height including the fork height in place and the fork auto flag.
-        To inspect all the values, you can use "json_data" attribute.
-        """
-        self.requestId = 0
-        self.messageType = 1028  # forklift status query
-        self.msg = {}  # empty message
-
-        # forklift status attributes
-        self.fork_height = 0
-        self.fork_height_in_place = False
-        self.fork_auto_flag = False
-        self.forward_val = 0
-        self.forward_in_place = False
-        self.fork_pressure_actual = 0
-
-        self.success = False
-        self.err_msg = ""
-        self.create_on = ""
-
-        self.json_data = {}
-
-    def _get_status(self, transport):
-        # send command and receive data
-        transport.send_command(self.requestId, self.messageType, self.msg)
-        data = transport.listen()
-        # parse data
-        self.json_data = data
-        self.success = check_success(data)
-        if self.success:
-            self.fork_height = data["fork_height"]
-            self.fork_height_in_place = data["fork_height_in_place"]
-            self.fork_auto_flag = data["fork_auto_flag"]
-            self.forward_val = data["forward_val"]
-            self.forward_in_place = data["forward_in_place"]
-            self.fork_pressure_actual = data["fork_pressure_actual"]
-            self.create_on = data["create_on"]
-
-        else:
-            self.err_msg = data["err_msg"]
-            self.create_on = data["create_on"]
-        return self.success
-
-
-class StatusBlocked:
-
-    def __init__(self) -> None:
-        """
-        Get the status of why the AGV is blocked and the current slow down status.
-        """
-        self.requestId = 0
-        self.messageType = 1006  # blocked status query
-        self.msg = {}  # empty message
-
-        self.blocked = False
-        self.block_reason = ""
-        self.block_x = 0
-        self.block_y = 0
-        self.block_id = 0
-        self.slow_down = False
-        self.slow_reason = ""
-        self.slow_x = 0
-        self.slow_y = 0
-        self.slow_id = 0
-
-        self.success = False
-        self.err_msg = ""
-        self.create_on = ""
-
-        self.json_data = {}
-
-    @staticmethod
-    def translate_reason(reason_id):
-        if reason_id == 0:
-            return "Utrasonic sensor"
-        elif reason_id == 1:
-            return "Laser sensor"
-        elif reason_id == 2:
-            return "Falling Down"
-        elif reason_id == 3:
-            return "Collision"
-        elif reason_id == 4:
-            return "Infrared sensor"
-        elif reason_id == 5:
-            return "Lock Switch"
-        elif reason_id == 6:
-            return "Dynamic Obstacle"
-        elif reason_id == 7:
-            return "Virtual Wall"
-        elif reason_id == 8:
-            return "3D Camera"
-        elif reason_id == 9:
-            return "Distance Sensor"
-        elif reason_id == 10:
-            return "DI Ultrasond"
-        else:
-            return "Unknown"
-
-    def _get_status(self, transport):
-        self.live = False
-        # send command and receive data
-        data = transport.send_n_receive(self.requestId, self.messageType,
-                                        self.msg)
-        # parse data
-        self.json_data = data
-        self.success = check_success(data)
-        if self.success:
-            self.blocked = data["blocked"]
-            self.block_reason = self.translate_reason(data["block_reason"])
-            self.block_x = data["block_x"]
-            self.block_y = data["block_y"]
-            self.block_id = data["block_id"]
-            self.slow_down = data["slow_down"]
-            self.slow_reason = self.translate_reason(data["slow_reason"])
-            self.slow_x = data["slow_x"]
-            self.slow_y = data["slow_y"]
-            self.slow_id = data["slow_id"]
-            self.create_on = data["create_on"]
-        else:
-            self.err_msg = data["err_msg"]
-            self.create_on = data["create_on"]
-        return self.success
-
-
-class StatusLaserData:
-
-    def __init__(self) -> None:
-        """
-        Get the laser data of the AGV.
-        """
-        self.requestId = 0
-        self.messageType = 1009  # laser point data query
-        self.msg = {}  # empty message
-
-        self.lasers = []
-
-        self.success = False
-        self.err_msg = ""
-        self.create_on = ""
-
-        self.json_data = {}
-
-    def _get_status(self, transport):
-        self.live = False
-        # send command and receive data
-        data = transport.send_n_receive(self.requestId, self.messageType,
-                                        self.msg)
-        # parse data
-        self.json_data = data
-        self.success = check_success(data)
-        if self.success:
-            self.lasers = data["lasers"]
-            self.create_on = data["create_on"]
-        else:
-            self.err_msg = data["err_msg"]
-            self.create_on = data["create_on"]
-        return self.success
-
-
-class StatusEmergencyStop:
-
-    def __init__(self) -> None:
-        """Emergency stop status query"""
-        self.requestId = 0
-        self.messageType = 1012  # emergency stop request
-        self.msg = {}  # empty message
-
-        # attributes
-        self.emergency = False
-        self.driver_emc = False
-        self.electric = False
-        self.soft_emc = False
-
-        self.success = False
-        self.err_msg = ""
-        self.create_on = ""
-
-        self.json_data = {}
-
-    def _get_status(self, transport):
-        self.live = False
-        # send command and receive data
-        data = transport.send_n_receive(self.requestId, self.messageType,
-                                        self.msg)
-        # parse data
-        self.json_data = data
-        self.success = check_success(data)
-        if self.success:
-            self.emergency = data["emergency"]
-            self.driver_emc = data["driver_emc"]
-            self.electric = data["electric"]
-            self.soft_emc = data["soft_emc"]
-            self.create_on = data["create_on"]
-        else:
-            self.err_msg = data["err_msg"]
-            self.create_on = data["create_on"]
-        return self.success
-
-
-class StatusNavigation:
-
-    def __init__(self) -> None:
-        """Navigation status query"""
-        self.requestId = 0
-        self.messageType = 1020  # navigation status query
-        self.msg = {}  # empty message
-
-        # attributes
-        self.task_status = ""
-        self.task_type = ""
-        self.target_id = ""
-        self.target_point = None
-        self.finished_path = None
-        self.unfinished_path = None
-        self.move_status = ""
-
-        self.success = False
-        self.err_msg = ""
-        self.create_on = ""
-
-        self.json_data = {}
-
-    @staticmethod
-    def translate_task_status(status_id):
-        if status_id == 0:
-            return "None"
-        elif status_id == 1:
-            return "Waiting"
-        elif status_id == 2:
-            return "Running"
-        elif status_id == 3:
-            return "Suspended"
-        elif status_id == 4:
-            return "Completed"
-        elif status_id == 5:
-            return "Failed"
-        elif status_id == 6:
-            return "Canceled"
-        else:
-            return "Unknown"
-
-    @staticmethod
-    def translate_task_type(type_id):
-        if type_id == 0:
-            return "None"
-        elif type_id == 1:
-            return "Free Navigation to Point"
-        elif type_id == 2:
-            return "Free Navigation to Station"
-        elif type_id == 3:
-            return "Path Navigation to Station"
-        elif type_id == 4:
-            return "Inspection Navigation"
-        elif type_id == 7:
-            return "Translational rotation"
-        elif type_id == 100:
-            return "Other"
-        else:
-            return "Unknown"
-
-    def _get_status(self, transport):
-        data = transport.send_n_receive(self.requestId, self.messageType,
-                                        self.msg)
-
-        self.json_data = data
-        self.success = check_success(data)
-        if self.success:
-            self.task_status = self.translate_task_status(data["task_status"])
-            self.task_type = self.translate_task_type(data["task_type"])
-            self.target_id = data["target_id"]
-            self.target_point = data["target_point"]
-            self.finished_path = data["finished_path"]
-            self.unfinished_path = data["unfinished_path"]
-            self.create_on = data["create_on"]
-        else:
-            self.err_msg = data["err_msg"]
-            self.create_on = data["create_on"]
-        return self.success
-
-
-class StatusAPI:
-
-    def __init__(self, ip: str, port: int = API_PORT_STATE) -> None:
-        """
-        Initialize the AGV STATE API class. This connects to the AGV STATE PORT and exchanges status messages with AGV.
-        
-        Usage:
-        ```python
-        battery_status = StatusBattery()
-        agv_pose = StatusPose()
-        
-        status = StatusAPI("127.0.0.1")
-        status.get_status(battery_status)
-        status.get_status(agv_pose)
-        print(battery_status.voltage)
-        print(battery_status.current)
-        print(agv_pose.x)
-        print(agv_pose.y)
-        
-        Args:
-            ip (str): AGV ip address
-            port (int, optional): port at which AGV STATE API is implemented . Defaults to API_PORT_STATE.
-        """
-        self.ip = ip
-        self.port = port
-        self.transport = TcpTransport(ip, port)
-        self.connected = False
-        self.connected = self.transport.connected
-
-    def get_status(self, status):
-        """exchange status with AGV for the status class like BatteryStatus, NavigationStatus etc.
-        """
-        return status._get_status(self.transport)
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           status.py                                ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-03-23                               ║
+║ Last Modified:  2023-03-23                               ║
+║ Description:    Status port features of robotkit api     ║  
+╚══════════════════════════════════════════════════════════╝
+"""
+
+from ..tcp_transport import TcpTransport, TransportPool
+from ..tcp_transport import API_PORT_STATE
+from .utils import check_success, has_response, to_json
+from .laser import decode_lasers, scans_to_map
+from collections import namedtuple
+import time
+
+
+def _record(record_type, status):
+    """immutable snapshot of the attributes of a status object, a fraction of the size of the object itself"""
+    return record_type._make(
+        [getattr(status, field) for field in record_type._fields])
+
+
+BatteryRecord = namedtuple(
+    "BatteryRecord",
+    ("level", "temp", "charging", "voltage", "current", "power",
+     "max_charge_voltage", "max_charge_current", "manual_charge",
+     "auto_charge", "battery_cycle", "create_on"))
+
+
+class StatusBattery:
+    # response fields read by _parse, requested from the controller by StatusAll
+    keys = ("battery_level", "battery_temp", "voltage", "current",
+            "max_charge_voltage", "max_charge_current", "manual_charge",
+            "auto_charge", "battery_cycle")
+    requestId = 0
+    messageType = 1007  # battery status query
+
+    def __init__(self, keep_json: bool = False):
+        """
+        Battery status class
+        """
+
+        # battery status
+        self.level = 0
+        self.temp = 0
+        self.charging = False
+        self.voltage = 0
+        self.current = 0
+        self.power = 0  # voltage * current
+        self.max_charge_voltage = 0
+        self.max_charge_current = 0
+        self.manual_charge = False
+        self.auto_charge = False
+        self.battery_cycle = 0
+
+        self.err_msg = ""
+        self.success = False
+        self.create_on = ""
+
+        self.msg = {}  # empty message
+        self.keep_json = keep_json
+        self.json_data = {}
+
+    def _get_status(self, transport):
+        # send command and receive data
+        data = transport.send_n_receive(self.requestId, self.messageType,
+                                        self.msg)
+        return self._parse(data)
+
+    def _parse(self, data):
+        # parse data
+        if not has_response(self, data):
+            return False
+        if self.keep_json:
+            self.json_data = data
+        self.success = check_success(data)
+
+        if self.success:
+            self.level = data["battery_level"]
+            self.temp = data["battery_temp"]
+            self.voltage = data["voltage"]
+            self.current = data["current"]
+            self.max_charge_voltage = data["max_charge_voltage"]
+            self.max_charge_current = data["max_charge_current"]
+            self.manual_charge = data["manual_charge"]
+            self.auto_charge = data["auto_charge"]
+            self.battery_cycle = data["battery_cycle"]
+            self.power = self.voltage * self.current
+            self.create_on = data["create_on"]
+        else:
+            self.create_on = data["create_on"]
+            self.err_msg = data["err_msg"]
+        return self.success
+
+    def snapshot(self):
+        """return an immutable BatteryRecord of the parsed attributes"""
+        return _record(BatteryRecord, self)
+
+
+PoseRecord = namedtuple(
+    "PoseRecord",
+    ("x", "y", "angle", "confidence", "current_station", "last_station",
+     "create_on"))
+
+
+class StatusPose:
+    # response fields read by _parse, requested from the controller by StatusAll
+    keys = ("x", "y", "angle", "confidence", "current_station",
+            "last_station")
+    requestId = 0
+    messageType = 1004  # robot position query
+
+    def __init__(self, keep_json: bool = False):
+        # AGV position attributes
+        self.x = 0
+        self.y = 0
+        self.angle = 0
+        self.confidence = 0
+        self.current_station = ""
+        self.last_station = ""
+
+        self.success = False
+        self.err_msg = 0
+        self.create_on = ""
+
+        self.msg = {}  # empty message
+        self.keep_json = keep_json
+        self.json_data = {}
+
+    def _get_status(self, transport):
+        # send command and receive data
+        data = transport.send_n_receive(self.requestId, self.messageType,
+                                        self.msg)
+        return self._parse(data)
+
+    def _parse(self, data):
+        # parse data
+        if not has_response(self, data):
+            return False
+        if self.keep_json:
+            self.json_data = data
+        self.success = check_success(data)
+        if self.success:
+            self.x = data["x"]
+            self.y = data["y"]
+            self.angle = data["angle"]
+            self.confidence = data["confidence"]
+            self.current_station = data["current_station"]
+            self.last_station = data["last_station"]
+            self.create_on = data["create_on"]
+        else:
+            self.err_msg = data["err_msg"]
+            self.create_on = data["create_on"]
+
+        return self.success
+
+    def snapshot(self):
+        """return an immutable PoseRecord of the parsed attributes"""
+        return _record(PoseRecord, self)
+
+
+SpeedRecord = namedtuple(
+    "SpeedRecord",
+    ("vx", "vy", "w", "steer", "spin", "r_vx", "r_vy", "r_w", "r_steer",
+     "r_spin", "steer_angle", "is_stop", "create_on"))
+
+
+class StatusSpeed:
+    # response fields read by _parse, requested from the controller by StatusAll
+    keys = ("vx", "vy", "w", "steer", "spin", "r_vx", "r_vy", "r_w", "r_steer",
+            "r_spin", "steer_angles", "is_stop")
+    requestId = 0
+    messageType = 1005  # robot speed query
+
+    def __init__(self, keep_json: bool = False) -> None:
+        # AGV speed attributes
+        self.vx = 0
+        self.vy = 0
+        self.w = 0
+        self.steer = 0
+        self.spin = 0
+        self.r_vx = 0
+        self.r_vy = 0
+        self.r_w = 0
+        self.r_steer = 0
+        self.r_spin = 0
+        self.steer_angle = 0
+        self.is_stop = False
+
+        self.success = False
+        self.err_msg = ""
+        self.create_on = ""
+
+        self.msg = {}  # empty message
+        self.keep_json = keep_json
+        self.json_data = {}
+
+    def _get_status(self, transport):
+        # send command and receive data
+        data = transport.send_n_receive(self.requestId, self.messageType,
+                                        self.msg)
+        return self._parse(data)
+
+    def _parse(self, data):
+        # parse data
+        if not has_response(self, data):
+            return False
+        if self.keep_json:
+            self.json_data = data
+        self.success = check_success(data)
+        if self.success:
+            self.vx = data["vx"]
+            self.vy = data["vy"]
+            self.w = data["w"]
+            self.steer = data["steer"]
+            self.spin = data["spin"]
+            self.r_vx = data["r_vx"]
+            self.r_vy = data["r_vy"]
+            self.r_w = data["r_w"]
+            self.r_steer = data["r_steer"]
+            self.r_spin = data["r_spin"]
+            self.steer_angle = data["steer_angles"]
+            self.is_stop = data["is_stop"]
+            self.create_on = data["create_on"]
+        else:
+            self.err_msg = data["err_msg"]
+            self.create_on = data["create_on"]
+        return self.success
+
+    def snapshot(self):
+        """return an immutable SpeedRecord of the parsed attributes"""
+        return _record(SpeedRecord, self)
+
+
+ForkliftRecord = namedtuple(
+    "ForkliftRecord",
+    ("fork_height", "fork_height_in_place", "fork_auto_flag", "forward_val",
+     "forward_in_place", "fork_pressure_actual", "create_on"))
+
+
+class StatusForklift:
+    # response fields read by _parse, requested from the controller by StatusAll
+    keys = ("fork_height", "fork_height_in_place", "fork_auto_flag",
+            "forward_val", "forward_in_place", "fork_pressure_actual")
+    requestId = 0
+    messageType = 1028  # forklift status query
+
+    def __init__(self, keep_json: bool = False) -> None:
+        """Get the fork status of the AGV and the current fork height including the fork height in place and the fork auto flag.
+        To inspect all the values, construct it with keep_json=True and use the "json_data" attribute.
+        """
+
+        # forklift status attributes
+        self.fork_height = 0
+        self.fork_height_in_place = False
+        self.fork_auto_flag = False
+        self.forward_val = 0
+        self.forward_in_place = False
+        self.fork_pressure_actual = 0
+
+        self.success = False
+        self.err_msg = ""
+        self.create_on = ""
+
+        self.msg = {}  # empty message
+        self.keep_json = keep_json
+        self.json_data = {}
+
+    def _get_status(self, transport):
+        # send command and receive data
+        data = transport.send_n_receive(self.requestId, self.messageType,
+                                        self.msg)
+        return self._parse(data)
+
+    def _parse(self, data):
+        # parse data
+        if not has_response(self, data):
+            return False
+        if self.keep_json:
+            self.json_data = data
+        self.success = check_success(data)
+        if self.success:
+            self.fork_height = data["fork_height"]
+            self.fork_height_in_place = data["fork_height_in_place"]
+            self.fork_auto_flag = data["fork_auto_flag"]
+            self.forward_val = data["forward_val"]
+            self.forward_in_place = data["forward_in_place"]
+            self.fork_pressure_actual = data["fork_pressure_actual"]
+            self.create_on = data["create_on"]
+
+        else:
+            self.err_msg = data["err_msg"]
+            self.create_on = data["create_on"]
+        return self.success
+
+    def snapshot(self):
+        """return an immutable ForkliftRecord of the parsed attributes"""
+        return _record(ForkliftRecord, self)
+
+
+BlockedRecord = namedtuple(
+    "BlockedRecord",
+    ("blocked", "block_reason", "block_x", "block_y", "block_id", "slow_down",
+     "slow_reason", "slow_x", "slow_y", "slow_id", "create_on"))
+
+
+class StatusBlocked:
+    # response fields read by _parse, requested from the controller by StatusAll
+    keys = ("blocked", "block_reason", "block_x", "block_y", "block_id",
+            "slow_down", "slow_reason", "slow_x", "slow_y", "slow_id")
+    requestId = 0
+    messageType = 1006  # blocked status query
+
+    def __init__(self, keep_json: bool = False) -> None:
+        """
+        Get the status of why the AGV is blocked and the current slow down status.
+        """
+
+        self.blocked = False
+        self.block_reason = ""
+        self.block_x = 0
+        self.block_y = 0
+        self.block_id = 0
+        self.slow_down = False
+        self.slow_reason = ""
+        self.slow_x = 0
+        self.slow_y = 0
+        self.slow_id = 0
+
+        self.success = False
+        self.err_msg = ""
+        self.create_on = ""
+
+        self.msg = {}  # empty message
+        self.keep_json = keep_json
+        self.json_data = {}
+
+    @staticmethod
+    def translate_reason(reason_id):
+        if reason_id == 0:
+            return "Utrasonic sensor"
+        elif reason_id == 1:
+            return "Laser sensor"
+        elif reason_id == 2:
+            return "Falling Down"
+        elif reason_id == 3:
+            return "Collision"
+        elif reason_id == 4:
+            return "Infrared sensor"
+        elif reason_id == 5:
+            return "Lock Switch"
+        elif reason_id == 6:
+            return "Dynamic Obstacle"
+        elif reason_id == 7:
+            return "Virtual Wall"
+        elif reason_id == 8:
+            return "3D Camera"
+        elif reason_id == 9:
+            return "Distance Sensor"
+        elif reason_id == 10:
+            return "DI Ultrasond"
+        else:
+            return "Unknown"
+
+    def _get_status(self, transport):
+        # send command and receive data
+        data = transport.send_n_receive(self.requestId, self.messageType,
+                                        self.msg)
+        return self._parse(data)
+
+    def _parse(self, data):
+        # parse data
+        if not has_response(self, data):
+            return False
+        if self.keep_json:
+            self.json_data = data
+        self.success = check_success(data)
+        if self.success:
+            self.blocked = data["blocked"]
+            self.block_reason = self.translate_reason(data["block_reason"])
+            self.block_x = data["block_x"]
+            self.block_y = data["block_y"]
+            self.block_id = data["block_id"]
+            self.slow_down = data["slow_down"]
+            self.slow_reason = self.translate_reason(data["slow_reason"])
+            self.slow_x = data["slow_x"]
+            self.slow_y = data["slow_y"]
+            self.slow_id = data["slow_id"]
+            self.create_on = data["create_on"]
+        else:
+            self.err_msg = data["err_msg"]
+            self.create_on = data["create_on"]
+        return self.success
+
+    def snapshot(self):
+        """return an immutable BlockedRecord of the parsed attributes"""
+        return _record(BlockedRecord, self)
+
+
+LaserRecord = namedtuple("LaserRecord", ("lasers", "create_on"))
+
+
+class StatusLaserData:
+    # response fields read by _parse, requested from the controller by StatusAll
+    keys = ("lasers",)
+    requestId = 0
+    messageType = 1009  # laser point data query
+
+    def __init__(self, keep_json: bool = False) -> None:
+        """
+        Get the laser data of the AGV.
+        """
+
+        self.lasers = []
+        self._scans = None
+
+        self.success = False
+        self.err_msg = ""
+        self.create_on = ""
+
+        self.msg = {}  # empty message
+        self.keep_json = keep_json
+        self.json_data = {}
+
+    def _get_status(self, transport):
+        # send command and receive data
+        data = transport.send_n_receive(self.requestId, self.messageType,
+                                        self.msg)
+        return self._parse(data)
+
+    def _parse(self, data):
+        # parse data
+        if not has_response(self, data):
+            return False
+        if self.keep_json:
+            self.json_data = data
+        self.success = check_success(data)
+        if self.success:
+            self.lasers = data["lasers"]
+            self._scans = None
+            self.create_on = data["create_on"]
+        else:
+            self.err_msg = data["err_msg"]
+            self.create_on = data["create_on"]
+        return self.success
+
+    @property
+    def scans(self):
+        """the lasers as LaserScan objects with NumPy arrays of beam angles, ranges and validity, decoded on first
+        access (requires numpy)"""
+        if self._scans is None:
+            self._scans = decode_lasers(self.lasers)
+        return self._scans
+
+    def map_points(self, pose, valid_only=True):
+        """points of all lasers in the map frame
+
+        usage:
+        ```python
+        pose, laser = StatusPose(), StatusLaserData()
+        status.get_status_many([pose, laser])
+        points = laser.map_points(pose)  # (N, 2) array of x, y
+        ```
+
+        Args:
+            pose (StatusPose | tuple): robot pose at the time of the scan, or a tuple (x, y, angle)
+            valid_only (bool, optional): drop invalid beams. Defaults to True.
+
+        Returns:
+            ndarray: (N, 2) array of x, y in m
+        """
+        return scans_to_map(self.scans, pose, valid_only)
+
+    def snapshot(self):
+        """return an immutable LaserRecord of the parsed attributes"""
+        return _record(LaserRecord, self)
+
+
+EmergencyStopRecord = namedtuple(
+    "EmergencyStopRecord",
+    ("emergency", "driver_emc", "electric", "soft_emc", "create_on"))
+
+
+class StatusEmergencyStop:
+    # response fields read by _parse, requested from the controller by StatusAll
+    keys = ("emergency", "driver_emc", "electric", "soft_emc")
+    requestId = 0
+    messageType = 1012  # emergency stop request
+
+    def __init__(self, keep_json: bool = False) -> None:
+        """Emergency stop status query"""
+
+        # attributes
+        self.emergency = False
+        self.driver_emc = False
+        self.electric = False
+        self.soft_emc = False
+
+        self.success = False
+        self.err_msg = ""
+        self.create_on = ""
+
+        self.msg = {}  # empty message
+        self.keep_json = keep_json
+        self.json_data = {}
+
+    def _get_status(self, transport):
+        # send command and receive data
+        data = transport.send_n_receive(self.requestId, self.messageType,
+                                        self.msg)
+        return self._parse(data)
+
+    def _parse(self, data):
+        # parse data
+        if not has_response(self, data):
+            return False
+        if self.keep_json:
+            self.json_data = data
+        self.success = check_success(data)
+        if self.success:
+            self.emergency = data["emergency"]
+            self.driver_emc = data["driver_emc"]
+            self.electric = data["electric"]
+            self.soft_emc = data["soft_emc"]
+            self.create_on = data["create_on"]
+        else:
+            self.err_msg = data["err_msg"]
+            self.create_on = data["create_on"]
+        return self.success
+
+    def snapshot(self):
+        """return an immutable EmergencyStopRecord of the parsed attributes"""
+        return _record(EmergencyStopRecord, self)
+
+
+NavigationRecord = namedtuple(
+    "NavigationRecord",
+    ("task_status", "task_type", "target_id", "target_point", "finished_path",
+     "unfinished_path", "create_on"))
+
+
+class StatusNavigation:
+    # response fields read by _parse, requested from the controller by StatusAll
+    keys = ("task_status", "task_type", "target_id", "target_point",
+            "finished_path", "unfinished_path")
+    requestId = 0
+    messageType = 1020  # navigation status query
+
+    def __init__(self, keep_json: bool = False) -> None:
+        """Navigation status query"""
+
+        # attributes
+        self.task_status = ""
+        self.task_type = ""
+        self.target_id = ""
+        self.target_point = None
+        self.finished_path = None
+        self.unfinished_path = None
+        self.move_status = ""
+
+        self.success = False
+        self.err_msg = ""
+        self.create_on = ""
+
+        self.msg = {}  # empty message
+        self.keep_json = keep_json
+        self.json_data = {}
+
+    @staticmethod
+    def translate_task_status(status_id):
+        if status_id == 0:
+            return "None"
+        elif status_id == 1:
+            return "Waiting"
+        elif status_id == 2:
+            return "Running"
+        elif status_id == 3:
+            return "Suspended"
+        elif status_id == 4:
+            return "Completed"
+        elif status_id == 5:
+            return "Failed"
+        elif status_id == 6:
+            return "Canceled"
+        else:
+            return "Unknown"
+
+    @staticmethod
+    def translate_task_type(type_id):
+        if type_id == 0:
+            return "None"
+        elif type_id == 1:
+            return "Free Navigation to Point"
+        elif type_id == 2:
+            return "Free Navigation to Station"
+        elif type_id == 3:
+            return "Path Navigation to Station"
+        elif type_id == 4:
+            return "Inspection Navigation"
+        elif type_id == 7:
+            return "Translational rotation"
+        elif type_id == 100:
+            return "Other"
+        else:
+            return "Unknown"
+
+    def _get_status(self, transport):
+        # send command and receive data
+        data = transport.send_n_receive(self.requestId, self.messageType,
+                                        self.msg)
+        return self._parse(data)
+
+    def _parse(self, data):
+        # parse data
+        if not has_response(self, data):
+            return False
+        if self.keep_json:
+            self.json_data = data
+        self.success = check_success(data)
+        if self.success:
+            self.task_status = self.translate_task_status(data["task_status"])
+            self.task_type = self.translate_task_type(data["task_type"])
+            self.target_id = data["target_id"]
+            self.target_point = data["target_point"]
+            self.finished_path = data["finished_path"]
+            self.unfinished_path = data["unfinished_path"]
+            self.create_on = data["create_on"]
+        else:
+            self.err_msg = data["err_msg"]
+            self.create_on = data["create_on"]
+        return self.success
+
+    def snapshot(self):
+        """return an immutable NavigationRecord of the parsed attributes"""
+        return _record(NavigationRecord, self)
+
+
+class StatusMap:
+    # response fields read by _parse, requested from the controller by StatusAll
+    keys = ("current_map", "current_map_md5", "maps", "map_files_info")
+    requestId = 0
+    messageType = 1300  # loaded and stored maps query
+
+    def __init__(self, keep_json: bool = False) -> None:
+        """
+        Get the name and MD5 checksum of the loaded map and the maps stored on the AGV.
+        """
+
+        self.current_map = ""
+        self.current_map_md5 = ""
+        self.maps = []
+        self.map_files_info = []
+
+        self.success = False
+        self.err_msg = ""
+        self.create_on = ""
+
+        self.msg = {}  # empty message
+        self.keep_json = keep_json
+        self.json_data = {}
+
+    def _get_status(self, transport):
+        # send command and receive data
+        data = transport.send_n_receive(self.requestId, self.messageType,
+                                        self.msg)
+        return self._parse(data)
+
+    def _parse(self, data):
+        # parse data
+        if not has_response(self, data):
+            return False
+        if self.keep_json:
+            self.json_data = data
+        self.success = check_success(data)
+        if self.success:
+            self.current_map = data["current_map"]
+            self.current_map_md5 = data.get("current_map_md5", "")
+            self.maps = data.get("maps", [])
+            self.map_files_info = data.get("map_files_info", [])
+            self.create_on = data.get("create_on", "")
+        else:
+            self.err_msg = data.get("err_msg", "")
+        return self.success
+
+
+class StatusStation:
+    # response fields read by _parse, requested from the controller by StatusAll
+    keys = ("stations", )
+    requestId = 0
+    messageType = 1301  # station query of the loaded map
+
+    def __init__(self, keep_json: bool = False) -> None:
+        """
+        Get the stations of the loaded map, a list of dicts with id, type, x, y, r (angle in radians) and desc.
+        """
+
+        self.stations = []
+
+        self.success = False
+        self.err_msg = ""
+        self.create_on = ""
+
+        self.msg = {}  # empty message
+        self.keep_json = keep_json
+        self.json_data = {}
+
+    def _get_status(self, transport):
+        # send command and receive data
+        data = transport.send_n_receive(self.requestId, self.messageType,
+                                        self.msg)
+        return self._parse(data)
+
+    def _parse(self, data):
+        # parse data
+        if not has_response(self, data):
+            return False
+        if self.keep_json:
+            self.json_data = data
+        self.success = check_success(data)
+        if self.success:
+            self.stations = data["stations"]
+            self.create_on = data.get("create_on", "")
+        else:
+            self.err_msg = data.get("err_msg", "")
+        return self.success
+
+
+class StatusAll:
+    requestId = 0
+    messageType = 1100  # all status query
+
+    def __init__(self,
+                 statuses=(),
+                 keys=None,
+                 keep_json: bool = False) -> None:
+        """
+        Aggregated status query. Fills several status objects from a single response instead of one round trip per
+        status. Only the fields read by the given status objects (and any extra keys) are requested, so the controller
+        transfers and the client decodes nothing else.
+
+        Usage:
+        ```python
+        pose, speed, battery = StatusPose(), StatusSpeed(), StatusBattery()
+        snapshot = StatusAll([pose, speed, battery], keys=["charging"])
+        status = StatusAPI("127.0.0.1")
+        status.get_status(snapshot)
+        print(pose.x, speed.vx, battery.level, snapshot.data["charging"])
+        ```
+
+        Args:
+            statuses (list, optional): status objects like StatusPose, StatusBattery etc. to fill. Defaults to ().
+            keys (list, optional): additional response fields, available in `data`. Defaults to None.
+            keep_json (bool, optional): keep the raw response in json_data. Defaults to False.
+        """
+        self.statuses = list(statuses)
+        self.extra_keys = list(keys or [])
+
+        requested = []
+        for status in self.statuses:
+            requested.extend(status.keys)
+        requested.extend(self.extra_keys)
+        if requested:
+            # read by every status, controllers that only return the requested keys leave it out otherwise
+            requested.append("create_on")
+        # keep the order, drop duplicates
+        requested = list(dict.fromkeys(requested))
+        self.msg = {"keys": requested} if requested else {}
+        if any("lasers" in status.keys for status in self.statuses):
+            self.msg["return_laser"] = True
+
+        # extra fields of the response
+        self.data = {}
+
+        self.success = False
+        self.err_msg = ""
+        self.create_on = ""
+
+        self.keep_json = keep_json
+        self.json_data = {}
+
+    def _get_status(self, transport):
+        # send command and receive data
+        data = transport.send_n_receive(self.requestId, self.messageType,
+                                        self.msg)
+        return self._parse(data)
+
+    def _parse(self, data):
+        # parse data
+        if not has_response(self, data):
+            for status in self.statuses:
+                has_response(status, data)
+            return False
+        if self.keep_json:
+            self.json_data = data
+        self.create_on = data.get("create_on", "")
+        self.success = check_success(data)
+        if not self.success:
+            # checked and logged once here instead of by every status
+            self.err_msg = data.get("err_msg", "")
+            for status in self.statuses:
+                status.success = False
+                status.err_msg = self.err_msg
+                status.create_on = self.create_on
+            return False
+        for status in self.statuses:
+            try:
+                status._parse(data)
+            except KeyError as e:
+                # field not supported by the aggregated query of this controller version
+                status.success = False
+                status.err_msg = f"missing field {e}"
+                self.success = False
+                self.err_msg = status.err_msg
+        self.data = {key: data.get(key) for key in self.extra_keys}
+        return self.success
+
+
+class StatusAPI:
+
+    def __init__(self,
+                 ip: str,
+                 port: int = API_PORT_STATE,
+                 lazy: bool = False,
+                 pool: TransportPool = None,
+                 cache=None) -> None:
+        """
+        Initialize the AGV STATE API class. This connects to the AGV STATE PORT and exchanges status messages with AGV.
+        
+        Usage:
+        ```python
+        battery_status = StatusBattery()
+        agv_pose = StatusPose()
+        
+        status = StatusAPI("127.0.0.1")
+        status.get_status(battery_status)
+        status.get_status(agv_pose)
+        print(battery_status.voltage)
+        print(battery_status.current)
+        print(agv_pose.x)
+        print(agv_pose.y)
+
+        Status objects parse the response into their attributes and drop it. Create them with keep_json=True
+        (e.g. StatusPose(keep_json=True)) to also keep the raw response in json_data.
+        
+        Args:
+            ip (str): AGV ip address
+            port (int, optional): port at which AGV STATE API is implemented . Defaults to API_PORT_STATE.
+            lazy (bool, optional): connect in the background instead of in the constructor. Defaults to False.
+            pool (TransportPool, optional): share the transport of (ip, port) from this pool instead of opening a
+                                            connection of its own. Defaults to None.
+            cache (StatusCache, optional): serve repeated queries from this cache. Defaults to None.
+        """
+        self.ip = ip
+        self.port = port
+        self.pool = pool
+        self.cache = cache
+        if pool is None:
+            self.transport = TcpTransport(ip, port, lazy=lazy)
+        else:
+            self.transport = pool.acquire(ip, port, lazy)
+
+    @property
+    def connected(self):
+        return self.transport.connected
+
+    def close(self):
+        if self.pool is None:
+            self.transport.close()
+        else:
+            self.pool.release(self.transport)
+
+    def get_status(self, status):
+        """exchange status with AGV for the status class like BatteryStatus, NavigationStatus etc.
+        """
+        if self.cache is not None:
+            return status._parse(self.cache.get(self.transport, status))
+        return status._get_status(self.transport)
+
+    def get_status_many(self, statuses, timeout=None):
+        """exchange several statuses with the AGV in one round trip. All requests are sent back-to-back on the
+        connection and the responses are parsed into the status objects as they arrive.
+
+        Usage:
+        ```python
+        pose, battery, speed = StatusPose(), StatusBattery(), StatusSpeed()
+        status = StatusAPI("127.0.0.1")
+        success = status.get_status_many([pose, battery, speed])
+        ```
+
+        Args:
+            statuses (list): status objects like StatusPose, StatusBattery etc.
+            timeout (float, optional): maximum time to wait for all responses in seconds. Defaults to None.
+
+        Returns:
+            list: success of each status query, in the order of statuses
+        """
+        results = [None] * len(statuses)
+        requested = []
+        for i, status in enumerate(statuses):
+            data = None
+            if self.cache is not None:
+                data = self.cache.cached(self.transport, status)
+            if data is not None:
+                results[i] = status._parse(data)
+            else:
+                requested.append(i)
+        futures = [
+            self.transport.submit(statuses[i].messageType, statuses[i].msg)
+            for i in requested
+        ]
+        self.transport.wait(futures, timeout)
+        for i, future in zip(requested, futures):
+            if future.done() and future.exception() is None:
+                if self.cache is not None:
+                    self.cache.store(self.transport, statuses[i],
+                                     future.result())
+                results[i] = statuses[i]._parse(future.result())
+            else:
+                results[i] = False
+        return results
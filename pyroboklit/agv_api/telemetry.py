@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           telemetry.py                             ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-19                               ║
+║ Last Modified:  2023-04-19                               ║
+║ Description:    Columnar ring buffer of pushed telemetry ║
+║                 backed by NumPy arrays.                  ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# numeric fields of the default push monitoring configuration (see Notification.configure_monitoring)
+TELEMETRY_FIELDS = ("x", "y", "angle", "confidence", "vx", "vy", "w",
+                    "battery_level", "battery_temp", "voltage", "current")
+
+
+class TelemetryWindow:
+    """Consecutive samples of a TelemetryBuffer. The columns are views into the buffer, they are overwritten once
+    the buffer wraps around, copy() them to keep them longer."""
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __getitem__(self, field):
+        return self.columns[field]
+
+    def __getattr__(self, field):
+        try:
+            return self.__dict__["columns"][field]
+        except KeyError:
+            raise AttributeError(field) from None
+
+    def __len__(self):
+        return len(self.columns["t"])
+
+    def copy(self):
+        return TelemetryWindow(
+            {name: column.copy()
+             for name, column in self.columns.items()})
+
+    def duration(self):
+        """time between the first and the last sample in seconds"""
+        t = self.columns["t"]
+        return float(t[-1] - t[0]) if len(t) > 1 else 0.0
+
+    def speeds(self):
+        """speed over ground between consecutive samples in m/s, computed from x and y"""
+        return np.hypot(np.diff(self.columns["x"]),
+                        np.diff(self.columns["y"])) / np.diff(self.columns["t"])
+
+    def distance(self):
+        """distance travelled in m"""
+        return float(
+            np.nansum(
+                np.hypot(np.diff(self.columns["x"]),
+                         np.diff(self.columns["y"]))))
+
+    def battery_drain(self):
+        """battery level consumed per hour (positive while discharging), from a least squares fit of
+        battery_level over time"""
+        t, level = self.columns["t"], self.columns["battery_level"]
+        valid = ~np.isnan(level)
+        if np.count_nonzero(valid) < 2:
+            return 0.0
+        slope = np.polyfit(t[valid] - t[valid][0], level[valid], 1)[0]
+        return float(-slope * 3600)
+
+
+class TelemetryBuffer:
+
+    def __init__(self,
+                 fields=TELEMETRY_FIELDS,
+                 capacity: int = 36000,
+                 dtype: str = "float64") -> None:
+        """
+        Fixed capacity ring buffer of the pushed telemetry of one robot, stored column by column with one
+        preallocated NumPy array per field and a column "t" of time.monotonic() receive times.
+
+        Every sample is written twice, at its position in the ring and capacity positions further, so any window of
+        the latest samples is a contiguous slice and last() / between() return views without copying.
+
+        usage:
+        ```python
+        notification = Notification("192.168.0.10")
+        notification.configure_monitoring(interval=100)
+        telemetry = TelemetryBuffer(capacity=36000)  # one hour at 10 Hz
+        telemetry.attach(notification)
+        ...
+        window = telemetry.last(600)
+        print(window.distance(), window.speeds().max(), window.battery_drain())
+        ```
+
+        Args:
+            fields (tuple, optional): numeric fields to record. Defaults to TELEMETRY_FIELDS.
+            capacity (int, optional): number of samples kept. Defaults to 36000.
+            dtype (str, optional): NumPy dtype of the field columns. Defaults to "float64".
+        """
+        if np is None:
+            raise ImportError("numpy is not installed (pip install numpy)")
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self.t = np.zeros(2 * capacity, dtype="float64")
+        self.columns = {
+            field: np.full(2 * capacity, np.nan, dtype=dtype)
+            for field in self.fields
+        }
+        self.columns["t"] = self.t
+        # total number of samples appended, the latest one is at (count - 1) % capacity
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, data, t=None):
+        """add a pushed message, missing and non-numeric fields are recorded as NaN
+
+        Args:
+            data (dict): decoded push message
+            t (float, optional): time.monotonic() receive time. Defaults to now.
+        """
+        i = self.count % self.capacity
+        j = i + self.capacity
+        t = time.monotonic() if t is None else t
+        self.t[i] = self.t[j] = t
+        for field in self.fields:
+            value = data.get(field)
+            if not isinstance(value, (int, float)):
+                value = np.nan
+            column = self.columns[field]
+            column[i] = column[j] = value
+        # count is advanced last so readers never see a partially written sample
+        self.count += 1
+
+    def attach(self, notification):
+        """record every message pushed to a Notification (runs on its reader thread)"""
+        notification.subscribe(self.append)
+
+    def detach(self, notification):
+        notification.unsubscribe(self.append)
+
+    def _window(self, start, stop):
+        return TelemetryWindow(
+            {name: column[start:stop]
+             for name, column in self.columns.items()})
+
+    def last(self, n=None):
+        """return a view of the latest n samples (all samples if n is None), oldest first"""
+        count = self.count
+        size = min(count, self.capacity)
+        n = size if n is None else min(n, size)
+        stop = (count - 1) % self.capacity + self.capacity + 1 if count else 0
+        return self._window(stop - n, stop)
+
+    def between(self, t0, t1):
+        """return a view of the samples received between the monotonic times t0 and t1 (inclusive)"""
+        window = self.last()
+        start = int(np.searchsorted(window.t, t0, side="left"))
+        stop = int(np.searchsorted(window.t, t1, side="right"))
+        return TelemetryWindow(
+            {name: column[start:stop]
+             for name, column in window.columns.items()})
+
+    def clear(self):
+        self.count = 0
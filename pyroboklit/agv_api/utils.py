@@ -1,30 +1,54 @@
-# -*- coding: utf-8 -*-
-"""
-╔══════════════════════════════════════════════════════════╗
-║ File:           utils.py                                 ║
-║ Author:         Nexus1203                                ║
-║ Created:        2023-03-29                               ║
-║ Last Modified:  2023-03-29                               ║
-║ Description:    Utility code for AGV API                 ║  
-╚══════════════════════════════════════════════════════════╝
-"""
-
-
-def check_success(response):
-    if response['ret_code'] != 0:
-        print("Error: ", response['ret_code'])
-        return False
-    else:
-        return True
-
-
-def to_json(class_instance):
-    as_json = class_instance.__dict__
-    # remove None values
-    as_json = {k: v for k, v in as_json.items() if v is not None}
-    # remove request id, message type and msg if they exist
-    as_json.pop("requestId", None)
-    as_json.pop("messageType", None)
-    as_json.pop("msg", None)
-
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           utils.py                                 ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-03-29                               ║
+║ Last Modified:  2023-03-29                               ║
+║ Description:    Utility code for AGV API                 ║  
+╚══════════════════════════════════════════════════════════╝
+"""
+
+from ..tcp_transport.log import get_logger
+
+logger = get_logger(__name__)
+
+# err_msg of requests without a response (timeout or lost connection)
+NO_RESPONSE = "no response from the AGV"
+
+
+def check_success(response):
+    if response is None:
+        logger.error("Error: %s", NO_RESPONSE)
+        return False
+    if response['ret_code'] != 0:
+        logger.error("Error: %s %s", response['ret_code'],
+                     response.get('err_msg', ""))
+        return False
+    else:
+        return True
+
+
+def has_response(status, data):
+    """mark a status object as failed if its request got no response (data is None)
+
+    Returns:
+        bool: False if there is no response to parse
+    """
+    if data is None:
+        status.success = False
+        status.err_msg = NO_RESPONSE
+        return False
+    return True
+
+
+def to_json(class_instance):
+    as_json = class_instance.__dict__
+    # remove None values
+    as_json = {k: v for k, v in as_json.items() if v is not None}
+    # remove request id, message type and msg if they exist
+    as_json.pop("requestId", None)
+    as_json.pop("messageType", None)
+    as_json.pop("msg", None)
+
     return as_json
\ No newline at end of file
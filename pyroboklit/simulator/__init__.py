@@ -0,0 +1,3 @@
+from .robot import *
+from .controller import *
+from .replay import *
\ No newline at end of file
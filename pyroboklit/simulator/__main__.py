@@ -0,0 +1,79 @@
+"""
+Run simulated SRC controllers until interrupted, or serve a session recorded with FrameRecorder.
+
+usage:
+    python -m pyrobokit.simulator [--robots 100] [--latency 0.002] [--jitter 0.001] [--fragment 0]
+                                  [--loopback-hosts]
+    python -m pyrobokit.simulator --replay session.prbk [--speed 2.0] [--start 60] [--stop 120]
+"""
+import argparse
+import asyncio
+
+from .controller import SimulatedFleet, NetworkProfile
+from .replay import ReplayController
+from ..tcp_transport import API_PORT_STATE, API_PORT_CTRL, API_PORT_TASK
+from ..tcp_transport import API_PORT_CONFIG, API_PORT_OTHER, API_PORT_PUSH
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--robots", type=int, default=1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--loopback-hosts", action="store_true",
+                        help="one 127.0.x.y address per robot on the real API ports (Linux)")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--fragment", type=int, default=0,
+                        help="maximum chunk size of fragmented responses in bytes")
+    parser.add_argument("--replay", metavar="LOG",
+                        help="serve the session recorded in this frame log")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed")
+    parser.add_argument("--start", type=float,
+                        help="replay from this many seconds into the recording")
+    parser.add_argument("--stop", type=float,
+                        help="replay up to this many seconds into the recording")
+    args = parser.parse_args()
+
+    if args.replay:
+        replay(args)
+        return
+
+    fleet = SimulatedFleet(args.robots, args.host, args.loopback_hosts,
+                           NetworkProfile(args.latency, args.jitter,
+                                          args.fragment))
+
+    async def run():
+        await fleet.listen()
+        for controller in fleet.controllers:
+            ports = [controller.ports[port] for port in
+                     (API_PORT_STATE, API_PORT_CTRL, API_PORT_TASK,
+                      API_PORT_CONFIG, API_PORT_OTHER, API_PORT_PUSH)]
+            print(f"{controller.robot.name} {controller.host} "
+                  f"state/ctrl/task/config/other/push ports {ports}")
+        await fleet.serve()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+def replay(args):
+    controller = ReplayController(args.replay, args.start, args.stop,
+                                  args.speed, args.host)
+
+    async def run():
+        await controller.listen()
+        for (ip, port), listen_port in controller.ports.items():
+            print(f"recorded {ip}:{port} on {controller.host}:{listen_port}")
+        await controller.serve()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
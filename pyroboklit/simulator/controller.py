@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           controller.py                            ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-22                               ║
+║ Last Modified:  2023-04-22                               ║
+║ Description:    asyncio servers of simulated SRC         ║
+║                 controllers.                             ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import asyncio
+import random
+import struct
+import threading
+import time
+from ..tcp_transport import FrameDecoder, RESPONSE_OFFSET, header_template
+from ..tcp_transport import API_PORT_STATE, API_PORT_CTRL, API_PORT_TASK
+from ..tcp_transport import API_PORT_CONFIG, API_PORT_OTHER
+from ..tcp_transport import API_PORT_PUSH, default_codec, get_logger
+from .robot import SimulatedRobot, grid_stations, create_on, error_response
+from .robot import RET_UNSUPPORTED, RET_INVALID
+
+logger = get_logger(__name__)
+
+SIMULATED_PORTS = (API_PORT_STATE, API_PORT_CTRL, API_PORT_TASK,
+                   API_PORT_CONFIG, API_PORT_OTHER, API_PORT_PUSH)
+
+# message types answered on each port, everything else is answered with an error
+PORT_MESSAGES = {
+    API_PORT_STATE: range(1000, 2000),
+    API_PORT_CTRL: range(2000, 3000),
+    API_PORT_TASK: range(3000, 4000),
+    API_PORT_CONFIG: range(4000, 5000),
+    API_PORT_OTHER: range(6000, 7000),
+    API_PORT_PUSH: range(9300, 9301),
+}
+
+PUSH_MESSAGE_TYPE = 19301
+
+# request id and body length of the header
+_ID_LENGTH = struct.Struct('!HL')
+
+
+class NetworkProfile:
+
+    def __init__(self,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 fragment_size: int = 0,
+                 fragment_gap: float = 0.0005) -> None:
+        """
+        Network conditions between the simulated controllers and their clients.
+
+        Args:
+            latency (float, optional): one way delay of every response in seconds. Defaults to 0.0.
+            jitter (float, optional): random extra delay of up to jitter seconds. Responses on one connection stay in
+                                      order, as on a real TCP stream. Defaults to 0.0.
+            fragment_size (int, optional): split responses into chunks of 1..fragment_size bytes, 0 sends them
+                                           whole. Defaults to 0.
+            fragment_gap (float, optional): delay between the chunks of a fragmented response in seconds.
+                                            Defaults to 0.0005.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.fragment_size = fragment_size
+        self.fragment_gap = fragment_gap
+
+    @property
+    def immediate(self):
+        return not (self.latency or self.jitter or self.fragment_size)
+
+
+class _Connection(asyncio.Protocol):
+    """one client connection to a port of a simulated controller"""
+
+    def __init__(self, controller, port):
+        self.controller = controller
+        self.port = port
+        self.transport = None
+        self.decoder = FrameDecoder()
+        # earliest loop time of the next write, keeps delayed writes in order
+        self.next_write = 0.0
+        # push configuration
+        self.push_interval = 1.0
+        self.push_fields = None
+        self.next_push = 0.0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.controller.connections.add(self)
+
+    def connection_lost(self, exc):
+        self.controller.connections.discard(self)
+
+    def data_received(self, data):
+        self.decoder.feed(data)
+        try:
+            frames = list(self.decoder)
+        except ValueError as e:
+            logger.warning("[Simulator] :: %s, closing connection", e)
+            self.transport.close()
+            return
+        for request_id, msg_type, payload in frames:
+            self.send(request_id, msg_type + RESPONSE_OFFSET,
+                      self._respond(msg_type, payload))
+
+    def _respond(self, msg_type, payload):
+        try:
+            body = self.controller.codec.decode(payload) if payload else {}
+        except ValueError as e:
+            return error_response(RET_INVALID, f"invalid json: {e}")
+        if msg_type not in PORT_MESSAGES[self.port]:
+            return error_response(
+                RET_UNSUPPORTED,
+                f"request {msg_type} is not served on port {self.port}")
+        if msg_type == 9300:
+            return self._configure_push(body)
+        return self.controller.robot.handle(msg_type, body)
+
+    def _configure_push(self, body):
+        self.push_interval = body.get("interval", 1000) / 1000
+        self.push_fields = body.get("included_fields") or None
+        self.next_push = 0.0
+        return {"ret_code": 0, "create_on": create_on()}
+
+    def send(self, request_id, msg_type, body):
+        payload = self.controller.codec.encode(body)
+        header = bytearray(header_template(msg_type))
+        _ID_LENGTH.pack_into(header, 2, request_id, len(payload))
+        data = bytes(header) + payload
+        network = self.controller.network
+        if network.immediate:
+            self.transport.write(data)
+            return
+        loop = self.controller.loop
+        at = loop.time() + network.latency + random.uniform(
+            0, network.jitter)
+        at = max(at, self.next_write)
+        if network.fragment_size:
+            chunks = []
+            while data:
+                size = random.randint(1, network.fragment_size)
+                chunks.append(data[:size])
+                data = data[size:]
+        else:
+            chunks = [data]
+        for chunk in chunks:
+            loop.call_at(at, self._write, chunk)
+            at += network.fragment_gap
+        self.next_write = at
+
+    def _write(self, data):
+        if not self.transport.is_closing():
+            self.transport.write(data)
+
+
+class SimulatedController:
+
+    def __init__(self,
+                 robot: SimulatedRobot = None,
+                 host: str = "127.0.0.1",
+                 ports: dict = None,
+                 network: NetworkProfile = None,
+                 codec=None) -> None:
+        """
+        Servers of the state, task, other and push ports of one simulated robot.
+
+        Args:
+            robot (SimulatedRobot, optional): the simulated robot. Defaults to a new SimulatedRobot.
+            host (str, optional): listen address. Defaults to "127.0.0.1".
+            ports (dict, optional): listen port per API port, 0 picks a free port. Defaults to the API ports.
+            network (NetworkProfile, optional): latency, jitter and fragmentation. Defaults to NetworkProfile().
+            codec (optional): json codec. Defaults to the default codec.
+        """
+        self.robot = robot or SimulatedRobot()
+        self.host = host
+        self.ports = dict(ports or {port: port for port in SIMULATED_PORTS})
+        self.network = network or NetworkProfile()
+        self.codec = codec or default_codec()
+        self.connections = set()
+        self.servers = []
+        self.loop = None
+
+    async def start(self):
+        """start listening, afterwards `ports` holds the actual port of each API port"""
+        self.loop = asyncio.get_running_loop()
+        for api_port, listen_port in list(self.ports.items()):
+            server = await self.loop.create_server(
+                lambda api_port=api_port: _Connection(self, api_port),
+                self.host, listen_port)
+            self.ports[api_port] = server.sockets[0].getsockname()[1]
+            self.servers.append(server)
+
+    def address(self, api_port=API_PORT_STATE):
+        """(host, port) to connect to for an API port"""
+        return self.host, self.ports[api_port]
+
+    def push(self, now):
+        """send the push messages that are due at loop time now"""
+        for connection in list(self.connections):
+            if connection.port != API_PORT_PUSH or now < connection.next_push:
+                continue
+            connection.next_push = now + connection.push_interval
+            connection.send(1, PUSH_MESSAGE_TYPE,
+                            self.robot.push_data(connection.push_fields))
+
+    async def stop(self):
+        for server in self.servers:
+            server.close()
+        for connection in list(self.connections):
+            connection.transport.close()
+        for server in self.servers:
+            await server.wait_closed()
+        self.servers = []
+
+
+class SimulatedFleet:
+
+    def __init__(self,
+                 count: int = 1,
+                 host: str = "127.0.0.1",
+                 loopback_hosts: bool = False,
+                 network: NetworkProfile = None,
+                 stations: dict = None,
+                 tick: float = 0.05) -> None:
+        """
+        Any number of simulated controllers in one process. One asyncio loop serves all of them and advances the
+        robots every tick.
+
+        By default every controller listens on free ports of host, see address(). With loopback_hosts each robot
+        gets its own address 127.0.x.y and listens on the real API ports, so the API facades can be used with their
+        default ports (Linux only, the whole 127.0.0.0/8 range is routed to the loopback interface there).
+
+        usage:
+        ```python
+        fleet = SimulatedFleet(100, network=NetworkProfile(latency=0.002, jitter=0.001))
+        fleet.start()
+        ip, port = fleet.address(0, API_PORT_STATE)
+        status = StatusAPI(ip, port)
+        ip, port = fleet.address(0, API_PORT_TASK)
+        NavigationAPI(ip, port).execute(TaskOneStation(dest_id="LM5"))
+        ...
+        fleet.stop()
+        ```
+
+        Args:
+            count (int, optional): number of robots. Defaults to 1.
+            host (str, optional): listen address if not loopback_hosts. Defaults to "127.0.0.1".
+            loopback_hosts (bool, optional): one loopback address per robot on the real API ports. Defaults to False.
+            network (NetworkProfile, optional): network conditions of all controllers. Defaults to NetworkProfile().
+            stations (dict, optional): map stations as {id: (x, y)}. Defaults to grid_stations().
+            tick (float, optional): simulation step in seconds. Defaults to 0.05.
+        """
+        stations = grid_stations() if stations is None else stations
+        names = list(stations)
+        self.tick = tick
+        self.controllers = []
+        for i in range(count):
+            # spread the robots over the stations
+            x, y = stations[names[i % len(names)]] if names else (0.0, 0.0)
+            robot = SimulatedRobot(f"robot{i + 1}", stations, x, y)
+            if loopback_hosts:
+                controller = SimulatedController(
+                    robot, f"127.0.{1 + i // 254}.{1 + i % 254}", None,
+                    network)
+            else:
+                controller = SimulatedController(
+                    robot, host, {port: 0 for port in SIMULATED_PORTS},
+                    network)
+            self.controllers.append(controller)
+        self.loop = None
+        self._thread = None
+        self._stopped = None
+        self._ticker = None
+
+    @property
+    def robots(self):
+        return [controller.robot for controller in self.controllers]
+
+    def address(self, index, api_port=API_PORT_STATE):
+        """(host, port) of an API port of robot index"""
+        return self.controllers[index].address(api_port)
+
+    async def listen(self):
+        """start all controllers and the simulation on the running loop"""
+        self.loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        for controller in self.controllers:
+            await controller.start()
+        self._ticker = self.loop.create_task(self._run())
+
+    async def serve(self):
+        """run the fleet until stop() is called, listen() is called first if necessary"""
+        if self._ticker is None:
+            await self.listen()
+        await self._stopped.wait()
+        self._ticker.cancel()
+        self._ticker = None
+        for controller in self.controllers:
+            await controller.stop()
+
+    async def _run(self):
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(self.tick)
+            now = time.monotonic()
+            dt, last = now - last, now
+            loop_time = self.loop.time()
+            for controller in self.controllers:
+                controller.robot.step(dt)
+                controller.push(loop_time)
+
+    def start(self, timeout=10.0):
+        """run the fleet on a background thread, returns once all controllers are listening"""
+        started = threading.Event()
+
+        async def main():
+            await self.listen()
+            started.set()
+            await self.serve()
+
+        self._thread = threading.Thread(target=asyncio.run,
+                                        args=(main(), ),
+                                        name="simulated-fleet",
+                                        daemon=True)
+        self._thread.start()
+        if not started.wait(timeout):
+            raise TimeoutError("simulated controllers did not start")
+
+    def stop(self):
+        if self.loop is not None and self._stopped is not None:
+            self.loop.call_soon_threadsafe(self._stopped.set)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           replay.py                                ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-23                               ║
+║ Last Modified:  2023-04-23                               ║
+║ Description:    Fake controller serving a recorded       ║
+║                 session from a frame log.                ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import asyncio
+import threading
+from collections import defaultdict, deque
+from ..tcp_transport import FrameDecoder, FrameLog, RESPONSE_OFFSET
+from ..tcp_transport import SENT, RECEIVED, default_codec, get_logger
+from ..tcp_transport.record import pack_frame, RecordedFrame
+from .robot import error_response, RET_UNSUPPORTED
+
+logger = get_logger(__name__)
+
+
+class _Session:
+    """recorded traffic of one (ip, port) connection"""
+
+    def __init__(self):
+        # recorded responses as (payload, latency) by response message type, in order
+        self.responses = defaultdict(list)
+        # frames received without a request (push messages) as (time, frame)
+        self.unsolicited = []
+
+
+def _sessions(frames):
+    sessions = defaultdict(_Session)
+    sent = {}
+    for frame in frames:
+        session = sessions[(frame.ip, frame.port)]
+        key = (frame.ip, frame.port, frame.request_id)
+        if frame.direction == SENT:
+            sent[key + (frame.msg_type + RESPONSE_OFFSET, )] = frame.t
+            continue
+        sent_at = sent.pop(key + (frame.msg_type, ), None)
+        if sent_at is None:
+            session.unsolicited.append((frame.t, frame))
+        else:
+            session.responses[frame.msg_type].append(
+                (frame.payload, frame.t - sent_at))
+    return sessions
+
+
+class _ReplayConnection(asyncio.Protocol):
+
+    def __init__(self, controller, session, t0):
+        self.controller = controller
+        self.session = session
+        self.t0 = t0
+        self.transport = None
+        self.decoder = FrameDecoder()
+        self.responses = {
+            msg_type: deque(responses)
+            for msg_type, responses in session.responses.items()
+        }
+        self.next_write = 0.0
+        self.handles = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.controller.connections.add(self)
+        loop = self.controller.loop
+        now = loop.time()
+        speed = self.controller.speed
+        # unsolicited frames at their recorded time relative to the start of the replay
+        for t, frame in self.session.unsolicited:
+            self.handles.append(
+                loop.call_at(now + (t - self.t0) / speed, self._write,
+                             pack_frame(frame)))
+
+    def connection_lost(self, exc):
+        self.controller.connections.discard(self)
+        for handle in self.handles:
+            handle.cancel()
+
+    def data_received(self, data):
+        self.decoder.feed(data)
+        try:
+            frames = list(self.decoder)
+        except ValueError as e:
+            logger.warning("[Replay] :: %s, closing connection", e)
+            self.transport.close()
+            return
+        for request_id, msg_type, _ in frames:
+            self._respond(request_id, msg_type + RESPONSE_OFFSET)
+
+    def _respond(self, request_id, msg_type):
+        responses = self.responses.get(msg_type)
+        if responses:
+            payload, latency = responses.popleft()
+        else:
+            payload = self.controller.codec.encode(
+                error_response(
+                    RET_UNSUPPORTED,
+                    f"no recorded response {msg_type} left to replay"))
+            latency = 0.0
+        loop = self.controller.loop
+        # responses stay in order, as on a TCP stream
+        at = max(loop.time() + latency / self.controller.speed,
+                 self.next_write)
+        self.next_write = at
+        loop.call_at(
+            at, self._write,
+            pack_frame(
+                RecordedFrame(0.0, RECEIVED, "", 0, request_id, msg_type,
+                              payload)))
+
+    def _write(self, data):
+        if not self.transport.is_closing():
+            self.transport.write(data)
+
+
+class ReplayController:
+
+    def __init__(self,
+                 log,
+                 start: float = None,
+                 stop: float = None,
+                 speed: float = 1.0,
+                 host: str = "127.0.0.1",
+                 codec=None) -> None:
+        """
+        Fake controller serving a session recorded with FrameRecorder. Every recorded (ip, port) connection gets a
+        listening port; a request is answered with the next recorded response of its type on that connection after
+        the recorded latency, and frames that were received without a request (push messages) are sent at their
+        recorded time relative to the start of the replay. All delays are divided by speed.
+
+        usage:
+        ```python
+        replay = ReplayController(FrameLog("session.prbk"), start=60.0, speed=4.0)
+        replay.start()
+        ip, port = replay.address("192.168.0.10", API_PORT_STATE)
+        status = StatusAPI(ip, port)
+        ...
+        replay.stop()
+        ```
+
+        Args:
+            log (FrameLog | str): recorded session or path of a frame log
+            start (float, optional): seconds since the start of the recording to replay from. Defaults to the
+                                     beginning.
+            stop (float, optional): seconds since the start of the recording to replay to. Defaults to the end.
+            speed (float, optional): replay speed, 2.0 replays twice as fast as recorded. Defaults to 1.0.
+            host (str, optional): listen address. Defaults to "127.0.0.1".
+            codec (optional): json codec of the error responses. Defaults to the default codec.
+        """
+        self.log = log if isinstance(log, FrameLog) else FrameLog(log)
+        self.speed = speed
+        self.host = host
+        self.codec = codec or default_codec()
+        self.t0 = start or 0.0
+        self.sessions = _sessions(self.log.frames(start, stop))
+        # listen port of every recorded (ip, port), known after listen()
+        self.ports = {}
+        self.connections = set()
+        self.servers = []
+        self.loop = None
+        self._thread = None
+        self._stopped = None
+
+    def address(self, ip, port):
+        """(host, port) to connect to instead of the recorded ip and port"""
+        return self.host, self.ports[(ip, port)]
+
+    async def listen(self):
+        self.loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        for key, session in self.sessions.items():
+            server = await self.loop.create_server(
+                lambda session=session: _ReplayConnection(
+                    self, session, self.t0), self.host, 0)
+            self.ports[key] = server.sockets[0].getsockname()[1]
+            self.servers.append(server)
+
+    async def serve(self):
+        """serve the session until stop() is called, listen() is called first if necessary"""
+        if not self.servers:
+            await self.listen()
+        await self._stopped.wait()
+        for server in self.servers:
+            server.close()
+        for connection in list(self.connections):
+            connection.transport.close()
+        for server in self.servers:
+            await server.wait_closed()
+        self.servers = []
+
+    def start(self, timeout=10.0):
+        """serve on a background thread, returns once all ports are listening"""
+        started = threading.Event()
+
+        async def main():
+            await self.listen()
+            started.set()
+            await self.serve()
+
+        self._thread = threading.Thread(target=asyncio.run,
+                                        args=(main(), ),
+                                        name="replay-controller",
+                                        daemon=True)
+        self._thread.start()
+        if not started.wait(timeout):
+            raise TimeoutError("replay controller did not start")
+
+    def stop(self):
+        if self.loop is not None and self._stopped is not None:
+            self.loop.call_soon_threadsafe(self._stopped.set)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,635 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           robot.py                                 ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-22                               ║
+║ Last Modified:  2023-04-22                               ║
+║ Description:    Kinematic model of a simulated AGV and   ║
+║                 the responses of its controller.         ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import hashlib
+import json
+import math
+import time
+
+# navigation task states and types as reported by 1020
+TASK_NONE = 0
+TASK_RUNNING = 2
+TASK_SUSPENDED = 3
+TASK_COMPLETED = 4
+TASK_FAILED = 5
+TASK_CANCELED = 6
+TASK_TYPE_POINT = 1
+TASK_TYPE_STATION = 3
+
+# ret_code of requests the simulator does not understand or cannot execute
+RET_UNSUPPORTED = 40000
+RET_INVALID = 40001
+
+_last_second = None
+_last_create_on = ""
+
+
+def create_on():
+    """UTC time in the format of the create_on field of the controller"""
+    global _last_second, _last_create_on
+    now = time.time()
+    second = int(now)
+    if second != _last_second:
+        _last_create_on = time.strftime("%Y-%m-%dT%H:%M:%S",
+                                        time.gmtime(second))
+        _last_second = second
+    return f"{_last_create_on}.{int(now % 1 * 1000):03d}Z"
+
+
+def error_response(ret_code, err_msg):
+    """response body of a failed request"""
+    return {"ret_code": ret_code, "err_msg": err_msg, "create_on": create_on()}
+
+
+def grid_stations(rows=10, cols=10, spacing=2.0):
+    """stations LM1, LM2, ... on a rows x cols grid, as {id: (x, y)}"""
+    return {
+        f"LM{r * cols + c + 1}": (c * spacing, r * spacing)
+        for r in range(rows) for c in range(cols)
+    }
+
+
+def _wrap(angle):
+    return (angle + math.pi) % (2 * math.pi) - math.pi
+
+
+class _Segment:
+    """one leg of a navigation task"""
+
+    __slots__ = ("target_id", "x", "y", "angle", "max_speed", "max_acc",
+                 "max_wspeed", "duration")
+
+    def __init__(self, target_id, x, y, angle=None, max_speed=None,
+                 max_acc=None, max_wspeed=None, duration=0):
+        self.target_id = target_id
+        self.x = x
+        self.y = y
+        self.angle = angle
+        self.max_speed = max_speed
+        self.max_acc = max_acc
+        self.max_wspeed = max_wspeed
+        # dwell time at the target in seconds
+        self.duration = duration
+
+
+class SimulatedRobot:
+
+    def __init__(self,
+                 name: str = "robot",
+                 stations: dict = None,
+                 x: float = 0.0,
+                 y: float = 0.0,
+                 angle: float = 0.0,
+                 battery_level: float = 1.0,
+                 max_speed: float = 1.0,
+                 max_acc: float = 0.5,
+                 max_wspeed: float = 1.0) -> None:
+        """
+        Simulated AGV. Holds the state reported by the controller (pose, speed, battery, navigation task, fork, I/O)
+        and moves towards the targets of navigation tasks when step() is called.
+
+        usage:
+        ```python
+        robot = SimulatedRobot(stations=grid_stations())
+        robot.handle(3051, {"id": "LM5"})
+        for _ in range(100):
+            robot.step(0.05)
+        print(robot.handle(1004, {}))
+        ```
+
+        Args:
+            name (str, optional): robot name. Defaults to "robot".
+            stations (dict, optional): map stations as {id: (x, y)}. Defaults to grid_stations().
+            x (float, optional): initial x in m. Defaults to 0.0.
+            y (float, optional): initial y in m. Defaults to 0.0.
+            angle (float, optional): initial heading in radians. Defaults to 0.0.
+            battery_level (float, optional): initial battery level (0..1). Defaults to 1.0.
+            max_speed (float, optional): default maximum speed in m/s. Defaults to 1.0.
+            max_acc (float, optional): default acceleration in m/s^2. Defaults to 0.5.
+            max_wspeed (float, optional): default maximum angular speed in rad/s. Defaults to 1.0.
+        """
+        self.name = name
+        self.stations = grid_stations() if stations is None else stations
+        self.map_name = "default"
+        self._map = None
+        self.x = x
+        self.y = y
+        self.angle = angle
+        self.max_speed = max_speed
+        self.max_acc = max_acc
+        self.max_wspeed = max_wspeed
+        self.speed = 0.0
+        self.w = 0.0
+        self.current_station = self._station_at(x, y)
+        self.last_station = ""
+
+        self.battery_level = battery_level
+        self.battery_temp = 30.0
+        self.charging = False
+        self.battery_cycle = 42
+
+        self.soft_emc = False
+        self.fork_height = 0.0
+        self.fork_target = 0.0
+        self.digital_outputs = [False] * 16
+        self.digital_inputs = [False] * 16
+        self.audios = ["start", "warning", "arrived"]
+        self.audio_playing = ""
+
+        self.task_status = TASK_NONE
+        self.task_type = 0
+        self.task_id = ""
+        self.segments = []
+        self.finished_path = []
+        self._hold = 0.0
+        self._scan = None
+        # open loop motion (2010) as (vx, w, monotonic time it ends)
+        self._open_loop = None
+
+    def _station_at(self, x, y, tolerance=0.05):
+        for station, (sx, sy) in self.stations.items():
+            if abs(sx - x) < tolerance and abs(sy - y) < tolerance:
+                return station
+        return ""
+
+    def map_file(self):
+        """map file (.smap) of the stations as (map, md5), routes join every station to its nearest neighbours in
+        both directions"""
+        if self._map is None:
+            points = [{
+                "className": "LocationMark",
+                "instanceName": station,
+                "pos": {"x": x, "y": y},
+                "dir": 0.0
+            } for station, (x, y) in self.stations.items()]
+            curves = []
+            for station, (x, y) in self.stations.items():
+                distances = {
+                    other: math.hypot(ox - x, oy - y)
+                    for other, (ox, oy) in self.stations.items()
+                    if other != station
+                }
+                if not distances:
+                    continue
+                closest = min(distances.values())
+                for other, distance in distances.items():
+                    if distance <= closest * 1.01:
+                        ox, oy = self.stations[other]
+                        curves.append({
+                            "className": "StraightPath",
+                            "instanceName": f"{station}-{other}",
+                            "startPos": {
+                                "instanceName": station,
+                                "pos": {"x": x, "y": y}
+                            },
+                            "endPos": {
+                                "instanceName": other,
+                                "pos": {"x": ox, "y": oy}
+                            }
+                        })
+            smap = {
+                "header": {
+                    "mapType": "2D-Map",
+                    "mapName": self.map_name,
+                    "version": "1.0.6"
+                },
+                "advancedPointList": points,
+                "advancedCurveList": curves
+            }
+            md5 = hashlib.md5(json.dumps(smap,
+                                         sort_keys=True).encode()).hexdigest()
+            self._map = smap, md5
+        return self._map
+
+    @property
+    def target(self):
+        return self.segments[0] if self.segments else None
+
+    def step(self, dt):
+        """advance the simulation by dt seconds"""
+        # the fork moves at 0.1 m/s
+        fork_error = self.fork_target - self.fork_height
+        self.fork_height += max(-0.1 * dt, min(0.1 * dt, fork_error))
+        self.battery_level = max(
+            0.0, self.battery_level - dt * (2e-5 + 5e-5 * abs(self.speed)))
+
+        if self._open_loop is not None and not self.soft_emc:
+            vx, w, until = self._open_loop
+            if time.monotonic() < until:
+                self.speed, self.w = vx, w
+                self.angle = _wrap(self.angle + w * dt)
+                self.x += vx * math.cos(self.angle) * dt
+                self.y += vx * math.sin(self.angle) * dt
+                return
+            self._open_loop = None
+
+        segment = self.target
+        if (segment is None or self.task_status != TASK_RUNNING
+                or self.soft_emc):
+            self.speed = 0.0
+            self.w = 0.0
+            return
+        if self._hold > 0:
+            self._hold -= dt
+            if self._hold <= 0:
+                self._next_segment()
+            return
+
+        dx, dy = segment.x - self.x, segment.y - self.y
+        distance = math.hypot(dx, dy)
+        max_speed = segment.max_speed or self.max_speed
+        max_acc = segment.max_acc or self.max_acc
+        max_wspeed = segment.max_wspeed or self.max_wspeed
+
+        if distance < 1e-3:
+            # at the target, turn to the requested angle
+            error = 0.0 if segment.angle is None else _wrap(segment.angle -
+                                                            self.angle)
+            self.speed = 0.0
+            if abs(error) > 1e-3:
+                self.w = math.copysign(min(max_wspeed, abs(error) / dt),
+                                       error)
+                self.angle = _wrap(self.angle + self.w * dt)
+                return
+            self.w = 0.0
+            self._arrive(segment)
+            return
+
+        # turn towards the target, drive once roughly aligned
+        error = _wrap(math.atan2(dy, dx) - self.angle)
+        self.w = math.copysign(min(max_wspeed, abs(error) / dt), error)
+        self.angle = _wrap(self.angle + self.w * dt)
+        if abs(error) > 0.5:
+            speed = max(0.0, self.speed - max_acc * dt)
+        else:
+            speed = min(self.speed + max_acc * dt, max_speed,
+                        math.sqrt(2 * max_acc * distance))
+        self.speed = speed
+        travel = min(speed * dt, distance)
+        self.x += dx / distance * travel
+        self.y += dy / distance * travel
+
+    def _arrive(self, segment):
+        self.x, self.y = segment.x, segment.y
+        if segment.target_id in self.stations:
+            self.last_station = self.current_station
+            self.current_station = segment.target_id
+        self.finished_path.append(segment.target_id)
+        self._hold = segment.duration
+        if self._hold <= 0:
+            self._next_segment()
+
+    def _next_segment(self):
+        self._hold = 0.0
+        self.segments.pop(0)
+        if not self.segments:
+            self.task_status = TASK_COMPLETED
+
+    def _start(self, segments, task_type, task_id=""):
+        self.segments = segments
+        self.finished_path = []
+        self.task_type = task_type
+        self.task_id = task_id
+        self.task_status = TASK_RUNNING
+        self._hold = 0.0
+        self._open_loop = None
+
+    def _segment(self, task):
+        """segment of a 3051 body or an entry of a 3066 move_task_list, None if the station is unknown"""
+        target = self.stations.get(task.get("id"))
+        if target is None:
+            return None
+        return _Segment(task["id"], target[0], target[1], task.get("angle"),
+                        task.get("max_speed"), task.get("max_acc"),
+                        task.get("max_wspeed"),
+                        task.get("duration", 0) / 1000)
+
+    def handle(self, msg_type, body):
+        """answer a request
+
+        Args:
+            msg_type (int): request message type
+            body: decoded request body, {} if the request has none
+
+        Returns:
+            dict: response body including ret_code and create_on
+        """
+        handler = getattr(self, f"_handle_{msg_type}", None)
+        if handler is None:
+            return error_response(RET_UNSUPPORTED,
+                                  f"unsupported request {msg_type}")
+        try:
+            response = handler(body if body is not None else {})
+        except (KeyError, IndexError, TypeError, ValueError,
+                AttributeError) as e:
+            return error_response(RET_INVALID, f"invalid request: {e}")
+        response.setdefault("ret_code", 0)
+        response["create_on"] = create_on()
+        return response
+
+    def push_data(self, fields=None):
+        """message pushed on the push port, restricted to fields if given"""
+        segment = self.target
+        data = {
+            "x": self.x,
+            "y": self.y,
+            "angle": self.angle,
+            "confidence": 0.99,
+            "vx": self.speed,
+            "vy": 0.0,
+            "w": self.w,
+            "current_station": self.current_station,
+            "is_stop": self.speed == 0.0 and self.w == 0.0,
+            "fork": {"fork_height": self.fork_height},
+            "target_point": [segment.x, segment.y, segment.angle or 0.0]
+                            if segment else [],
+            "target_label": segment.target_id if segment else "",
+            "target_id": segment.target_id if segment else "",
+            "target_dist": math.hypot(segment.x - self.x, segment.y - self.y)
+                           if segment else 0.0,
+            "task_status": self.task_status,
+            "running_status": self.task_status,
+            "task_type": self.task_type,
+            "emergency": self.soft_emc,
+            "charging": self.charging,
+            "battery_level": self.battery_level,
+            "map": "simulation",
+            "battery_temp": self.battery_temp,
+            "voltage": self._voltage(),
+            "current": self._current(),
+        }
+        if fields:
+            data = {field: data[field] for field in fields if field in data}
+        data["create_on"] = create_on()
+        return data
+
+    def _voltage(self):
+        return 44.0 + 10.0 * self.battery_level
+
+    def _current(self):
+        return -(2.0 + 10.0 * abs(self.speed))
+
+    # status port
+
+    def _handle_1004(self, body):
+        return {
+            "x": self.x,
+            "y": self.y,
+            "angle": self.angle,
+            "confidence": 0.99,
+            "current_station": self.current_station,
+            "last_station": self.last_station
+        }
+
+    def _handle_1005(self, body):
+        is_stop = self.speed == 0.0 and self.w == 0.0
+        return {
+            "vx": self.speed, "vy": 0.0, "w": self.w, "steer": 0.0,
+            "spin": 0.0, "r_vx": self.speed, "r_vy": 0.0, "r_w": self.w,
+            "r_steer": 0.0, "r_spin": 0.0, "steer_angles": [],
+            "is_stop": is_stop
+        }
+
+    def _handle_1006(self, body):
+        return {
+            "blocked": False, "block_reason": 0, "block_x": 0.0,
+            "block_y": 0.0, "block_id": 0, "slow_down": False,
+            "slow_reason": 0, "slow_x": 0.0, "slow_y": 0.0, "slow_id": 0
+        }
+
+    def _handle_1007(self, body):
+        return {
+            "battery_level": self.battery_level,
+            "battery_temp": self.battery_temp,
+            "charging": self.charging,
+            "voltage": self._voltage(),
+            "current": self._current(),
+            "max_charge_voltage": 54.6,
+            "max_charge_current": 20.0,
+            "manual_charge": False,
+            "auto_charge": False,
+            "battery_cycle": self.battery_cycle
+        }
+
+    def _handle_1009(self, body):
+        if self._scan is None:
+            # a round room of 5 m radius seen by one laser at the front, built once and reused
+            self._scan = [{
+                "beams": [{
+                    "angle": -135.0 + i * 0.5,
+                    "dist": 5.0,
+                    "valid": True
+                } for i in range(541)],
+                "install_info": {
+                    "x": 0.3, "y": 0.0, "z": 0.2, "yaw": 0.0, "upside": False
+                }
+            }]
+        return {"lasers": self._scan}
+
+    def _handle_1012(self, body):
+        return {
+            "emergency": self.soft_emc,
+            "driver_emc": False,
+            "electric": False,
+            "soft_emc": self.soft_emc
+        }
+
+    def _handle_1020(self, body):
+        segment = self.target
+        return {
+            "task_status": self.task_status,
+            "task_type": self.task_type,
+            "target_id": segment.target_id if segment else "",
+            "target_point": [segment.x, segment.y, segment.angle or 0.0]
+                            if segment else [],
+            "finished_path": list(self.finished_path),
+            "unfinished_path": [s.target_id for s in self.segments]
+        }
+
+    def _handle_1028(self, body):
+        return {
+            "fork_height": self.fork_height,
+            "fork_height_in_place":
+                abs(self.fork_height - self.fork_target) < 1e-3,
+            "fork_auto_flag": True,
+            "forward_val": 0.0,
+            "forward_in_place": True,
+            "fork_pressure_actual": 0.0
+        }
+
+    def _handle_1100(self, body):
+        data = {}
+        for msg_type in (1004, 1005, 1006, 1007, 1012, 1020, 1028):
+            data.update(getattr(self, f"_handle_{msg_type}")(body))
+        if body.get("return_laser"):
+            data.update(self._handle_1009(body))
+        keys = body.get("keys")
+        if keys:
+            data = {key: data[key] for key in keys if key in data}
+        return data
+
+    def _handle_1300(self, body):
+        _, md5 = self.map_file()
+        return {
+            "current_map": self.map_name,
+            "current_map_md5": md5,
+            "maps": [self.map_name],
+            "map_files_info": [{
+                "name": self.map_name,
+                "size": 0,
+                "modified": ""
+            }]
+        }
+
+    def _handle_1301(self, body):
+        return {
+            "stations": [{
+                "id": station,
+                "type": "LocationMark",
+                "x": x,
+                "y": y,
+                "r": 0.0,
+                "desc": ""
+            } for station, (x, y) in self.stations.items()]
+        }
+
+    # control port
+
+    def _handle_2010(self, body):
+        if self.task_status == TASK_RUNNING:
+            return error_response(RET_INVALID,
+                                  "open loop motion during a navigation task")
+        # the motion stops after duration ms without a new command, 0 keeps it until the next command
+        duration = body.get("duration", 0)
+        until = time.monotonic() + duration / 1000 if duration else math.inf
+        self._open_loop = (float(body.get("vx", 0.0)),
+                           float(body.get("w", 0.0)), until)
+        return {}
+
+    # task port
+
+    def _handle_3001(self, body):
+        if self.task_status == TASK_RUNNING:
+            self.task_status = TASK_SUSPENDED
+        return {}
+
+    def _handle_3002(self, body):
+        if self.task_status == TASK_SUSPENDED:
+            self.task_status = TASK_RUNNING
+        return {}
+
+    def _handle_3003(self, body):
+        if self.task_status in (TASK_RUNNING, TASK_SUSPENDED):
+            self.task_status = TASK_CANCELED
+        self.segments = []
+        return {}
+
+    def _handle_3050(self, body):
+        self._start([
+            _Segment("SELF_POSITION", body["x"], body["y"], body.get("angle"),
+                     body.get("max_speed"), body.get("max_acc"),
+                     body.get("max_wspeed"))
+        ], TASK_TYPE_POINT)
+        return {}
+
+    def _handle_3051(self, body):
+        segment = self._segment(body)
+        if segment is None:
+            return error_response(RET_INVALID,
+                                  f"unknown station {body.get('id')}")
+        self._start([segment], TASK_TYPE_STATION, body.get("task_id", ""))
+        return {}
+
+    def _handle_3053(self, body):
+        return {"path": [s.target_id for s in self.segments]}
+
+    def _handle_3066(self, body):
+        segments = [self._segment(task) for task in body["move_task_list"]]
+        if not segments or None in segments:
+            return error_response(RET_INVALID, "unknown station in task list")
+        self._start(segments, TASK_TYPE_STATION,
+                    body["move_task_list"][0].get("task_id", ""))
+        return {}
+
+    def _handle_3067(self, body):
+        return self._handle_3003(body)
+
+    def _handle_3068(self, body):
+        return {}
+
+    def _handle_3101(self, body):
+        return {
+            "tasklist_status": {"taskListName": body.get("task_list_name"),
+                                "taskListStatus": 0},
+            "robot_status": {"battery_level": self.battery_level}
+        }
+
+    def _handle_3106(self, body):
+        return {}
+
+    def _handle_3115(self, body):
+        return {"tasklists": []}
+
+    # configuration port
+
+    def _handle_4011(self, body):
+        if body["map_name"] != self.map_name:
+            return error_response(RET_INVALID,
+                                  f"unknown map {body['map_name']}")
+        smap, _ = self.map_file()
+        return dict(smap)
+
+    # other port
+
+    def _handle_6000(self, body):
+        if body["name"] not in self.audios:
+            return error_response(RET_INVALID, f"unknown audio {body['name']}")
+        self.audio_playing = body["name"]
+        return {}
+
+    def _handle_6001(self, body):
+        self.digital_outputs[body["id"]] = bool(body["status"])
+        return {}
+
+    def _handle_6002(self, body):
+        for io in body:
+            self.digital_outputs[io["id"]] = bool(io["status"])
+        return {}
+
+    def _handle_6004(self, body):
+        self.soft_emc = bool(body["status"])
+        return {}
+
+    def _handle_6010(self, body):
+        return {}
+
+    def _handle_6011(self, body):
+        return {}
+
+    def _handle_6012(self, body):
+        self.audio_playing = ""
+        return {}
+
+    def _handle_6020(self, body):
+        self.digital_inputs[body["id"]] = bool(body["status"])
+        return {}
+
+    def _handle_6033(self, body):
+        return {"audios": list(self.audios)}
+
+    def _handle_6040(self, body):
+        self.fork_target = float(body["height"])
+        return {}
+
+    def _handle_6041(self, body):
+        self.fork_target = self.fork_height
+        return {}
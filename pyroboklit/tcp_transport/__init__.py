@@ -1,2 +1,10 @@
-from .api_port import *
-from .transport import *
\ No newline at end of file
+from .api_port import *
+from .log import *
+from .framing import *
+from .codec import *
+from .metrics import *
+from .backoff import *
+from .record import *
+from .pool import *
+from .transport import *
+from .async_transport import *
\ No newline at end of file
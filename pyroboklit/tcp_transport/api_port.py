@@ -1,19 +1,19 @@
-# -*- coding: utf-8 -*-
-"""
-╔═══════════════════════════════════════════════════════════════╗
-║ File:           api_port.py                                   ║
-║ Author:         Nexus1203                                     ║
-║ Created:        2023-03-23                                    ║
-║ Last Modified:  2023-03-23                                    ║
-║ Description:    TCP API PORTS for different communications.   ║  
-╚═══════════════════════════════════════════════════════════════╝
-"""
-
-API_PORT_ROBOT = 19200
-API_PORT_STATE = 19204
-API_PORT_CTRL = 19205
-API_PORT_TASK = 19206
-API_PORT_CONFIG = 19207
-API_PORT_KERNEL = 19208
-API_PORT_OTHER = 19210
-API_PORT_PUSH = 19301
+# -*- coding: utf-8 -*-
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║ File:           api_port.py                                   ║
+║ Author:         Nexus1203                                     ║
+║ Created:        2023-03-23                                    ║
+║ Last Modified:  2023-03-23                                    ║
+║ Description:    TCP API PORTS for different communications.   ║  
+╚═══════════════════════════════════════════════════════════════╝
+"""
+
+API_PORT_ROBOT = 19200
+API_PORT_STATE = 19204
+API_PORT_CTRL = 19205
+API_PORT_TASK = 19206
+API_PORT_CONFIG = 19207
+API_PORT_KERNEL = 19208
+API_PORT_OTHER = 19210
+API_PORT_PUSH = 19301
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           async_transport.py                       ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-05                               ║
+║ Last Modified:  2023-04-05                               ║
+║ Description:    asyncio TCP client for the robotkit      ║
+║                 interface.                               ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import asyncio
+import time
+from .framing import FrameDecoder, HEADER_SIZE
+from .transport import SeerData, TcpTransport, RESPONSE_OFFSET, _HEADER
+from .record import SENT, RECEIVED
+from .codec import default_codec
+from .metrics import default_metrics
+from .log import get_logger, hot_path_enabled
+
+logger = get_logger(__name__)
+
+
+class AsyncTcpTransport(asyncio.BufferedProtocol):
+
+    def __init__(self, ip, port, codec=None, metrics=None, recorder=None):
+        """
+        asyncio counterpart of TcpTransport. Received bytes are written straight into a FrameDecoder buffer and
+        responses are matched to their requests by request id, so many requests can be in flight on one connection.
+        Frames that do not answer a pending request (e.g. push notifications) are queued for listen().
+
+        usage:
+        ```python
+        transport = AsyncTcpTransport("127.0.0.1", API_PORT_STATE)
+        await transport.connect()
+        data = await transport.send_n_receive(0, 1004)
+        ```
+
+        Args:
+            ip (str): AGV ip address
+            port (int): API port
+            codec (optional): json codec of the message bodies. Defaults to the default codec.
+            metrics (TransportMetrics, optional): request metrics registry, False disables recording. Defaults to
+                                                  the default registry.
+            recorder (FrameRecorder, optional): record every sent and received frame. Defaults to None.
+        """
+        self.name = "Async TCP Transport"
+        self.ip = ip
+        self.port = port
+        self.codec = codec or default_codec()
+        self.metrics = default_metrics() if metrics is None else metrics
+        self._metric_series = {}
+        self.recorder = recorder
+        self.connected = False
+        self.transport = None
+        self.decoder = FrameDecoder()
+        # requests in flight as (future, metric series, send time), keyed by (request_id, response msg_type)
+        self.pending = {}
+        self.frames = asyncio.Queue()
+
+    async def connect(self, timeout=None):
+        """open the connection to the AGV.
+
+        Args:
+            timeout (float, optional): connect timeout in seconds. Defaults to None.
+
+        Returns:
+            bool: True if connected
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.wait_for(
+                loop.create_connection(lambda: self, self.ip, self.port),
+                timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.warning("[%s] :: Connection error %s:%s: %s", self.name,
+                           self.ip, self.port, e)
+        return self.connected
+
+    def disconnect(self):
+        if self.transport is not None:
+            self.transport.close()
+        self.connected = False
+
+    # asyncio.BufferedProtocol callbacks
+    def connection_made(self, transport):
+        self.transport = transport
+        self.decoder.reset()
+        self.connected = True
+
+    def connection_lost(self, exc):
+        self.connected = False
+        self.transport = None
+        error = exc or ConnectionError("connection to the AGV closed")
+        pending, self.pending = self.pending, {}
+        for future, series, _ in pending.values():
+            if series is not None:
+                series.record_error()
+            if not future.done():
+                future.set_exception(error)
+        self.frames.put_nowait(None)
+
+    def get_buffer(self, sizehint):
+        return self.decoder.get_buffer(sizehint)
+
+    def buffer_updated(self, nbytes):
+        self.decoder.buffer_updated(nbytes)
+        try:
+            for frame in self.decoder:
+                if self.recorder is not None:
+                    self.recorder.record(RECEIVED, self.ip, self.port, *frame)
+                self._dispatch(frame)
+        except ValueError as e:
+            logger.error("[%s] :: Error: %s", self.name, e)
+            self.transport.close()
+
+    # shares decoding of the response body and metric lookup with the blocking transport
+    decode = TcpTransport.decode
+    series = TcpTransport.series
+
+    def _dispatch(self, frame):
+        request_id, msg_type, payload = frame
+        entry = self.pending.pop((request_id, msg_type), None)
+        if entry is None:
+            self.frames.put_nowait(frame)
+            return
+        future, series, sent_at = entry
+        try:
+            data = self.decode(payload)
+        except Exception as e:
+            data = None
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(data)
+        if series is not None:
+            series.record_response(time.monotonic() - sent_at,
+                                   HEADER_SIZE + len(payload),
+                                   not data or data.get("ret_code", 0) != 0)
+
+    def send(self, message):
+        """send raw bytes to the AGV
+
+        Returns:
+            bool: True if the message was handed to the event loop
+        """
+        if not self.connected:
+            logger.warning("[%s] :: Not connected. Unable to send message.",
+                           self.name)
+            return False
+        self.transport.write(message)
+        if self.recorder is not None and len(message) >= HEADER_SIZE:
+            _, _, request_id, _, msg_type, _ = _HEADER.unpack_from(message)
+            self.recorder.record(SENT, self.ip, self.port, request_id,
+                                 msg_type, bytes(message[HEADER_SIZE:]))
+        if hot_path_enabled(logger):
+            logger.debug("[%s] :: Sent: %s", self.name, message.hex())
+        return True
+
+    def send_data(self, seer_data):
+        """send a packed SeerData, header and body are handed to the event loop without concatenating them
+
+        Returns:
+            bool: True if the message was handed to the event loop
+        """
+        if not self.connected:
+            logger.warning("[%s] :: Not connected. Unable to send message.",
+                           self.name)
+            return False
+        self.transport.writelines((bytes(seer_data.header), seer_data.data))
+        if self.recorder is not None:
+            self.recorder.record(SENT, self.ip, self.port,
+                                 seer_data.request_id, seer_data.msg_type,
+                                 seer_data.data)
+        if hot_path_enabled(logger):
+            logger.debug("[%s] :: Sent: %s %s", self.name,
+                         seer_data.header.hex(), seer_data.data)
+        return True
+
+    def send_command(self, requestID, messageType, data={}):
+        s = SeerData()
+        s.set_data(request_id=requestID,
+                   msg_type=messageType,
+                   msg=data,
+                   codec=self.codec)
+        self.send_data(s)
+        return s.request_id
+
+    def submit(self, messageType, data={}, requestID=0):
+        """send a request without waiting for its response.
+
+        Args:
+            messageType (int): request message type
+            data (dict, optional): request body. Defaults to {}.
+            requestID (int, optional): request id, 0 assigns the next free id. Defaults to 0.
+
+        Returns:
+            asyncio.Future: resolved with the decoded response
+        """
+        s = SeerData()
+        s.set_data(request_id=requestID,
+                   msg_type=messageType,
+                   msg=data,
+                   codec=self.codec)
+        future = asyncio.get_running_loop().create_future()
+        key = (s.request_id, messageType + RESPONSE_OFFSET)
+        series = self.series(messageType)
+        self.pending[key] = (future, series, time.monotonic())
+        if series is not None:
+            series.record_request(HEADER_SIZE + len(s.data))
+        if not self.send_data(s):
+            self.pending.pop(key, None)
+            future.set_exception(
+                ConnectionError("Not connected. Unable to send message."))
+        return future
+
+    async def send_n_receive(self, requestID, messageType, data={},
+                             timeout=None):
+        future = self.submit(messageType, data, requestID)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except (ConnectionError, asyncio.TimeoutError, ValueError) as e:
+            logger.error("[%s] :: Error: %s", self.name, e)
+            return None
+        finally:
+            # wait_for cancels the future on timeout or when the caller is cancelled
+            if future.cancelled():
+                self._expire(future)
+
+    def _expire(self, future):
+        """forget the request of a future that will not be awaited any more, a late response is queued for
+        listen()"""
+        for key, (pending, series, _) in list(self.pending.items()):
+            if pending is future:
+                del self.pending[key]
+                if series is not None:
+                    series.record_error()
+                return
+
+    async def listen(self, timeout=None):
+        """wait for the next frame that is not a response to a pending request.
+
+        Returns:
+            dict: decoded message or None if the connection was closed
+        """
+        try:
+            frame = await asyncio.wait_for(self.frames.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if frame is None:
+            return None
+        return self.decode(frame[2])
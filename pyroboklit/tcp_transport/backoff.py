@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           backoff.py                               ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-17                               ║
+║ Last Modified:  2023-04-17                               ║
+║ Description:    Exponential backoff with jitter for      ║
+║                 reconnecting to the AGV.                 ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import random
+
+
+class Backoff:
+
+    def __init__(self,
+                 initial: float = 0.5,
+                 maximum: float = 30.0,
+                 multiplier: float = 2.0,
+                 jitter: float = 0.5) -> None:
+        """
+        Exponential backoff with jitter. Every call of next() returns the next delay, growing by multiplier from
+        initial up to maximum. The delay is randomly shortened by up to the jitter fraction so that many
+        transports that lost their AGVs at the same time do not retry in lockstep.
+
+        Args:
+            initial (float, optional): first delay in seconds. Defaults to 0.5.
+            maximum (float, optional): largest delay in seconds. Defaults to 30.0.
+            multiplier (float, optional): growth factor per attempt. Defaults to 2.0.
+            jitter (float, optional): fraction (0..1) of the delay that is randomized. Defaults to 0.5.
+        """
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.attempts = 0
+
+    def next(self):
+        """return the delay before the next attempt in seconds"""
+        delay = min(self.maximum,
+                    self.initial * self.multiplier**self.attempts)
+        if delay < self.maximum:
+            self.attempts += 1
+        return delay * (1 - self.jitter * random.random())
+
+    def reset(self):
+        self.attempts = 0
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           codec.py                                 ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-10                               ║
+║ Last Modified:  2023-04-10                               ║
+║ Description:    JSON codecs for request and response     ║
+║                 bodies of the robotkit interface.        ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class JsonCodec:
+    """Codec based on the standard library json module, always available."""
+
+    name = "json"
+
+    def encode(self, msg) -> bytes:
+        return json.dumps(msg, separators=(',', ':')).encode('ascii')
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """Codec based on orjson, works on bytes directly without an intermediate str."""
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("orjson is not installed (pip install orjson)")
+
+    def encode(self, msg) -> bytes:
+        return orjson.dumps(msg)
+
+    def decode(self, data):
+        return orjson.loads(data)
+
+
+class UjsonCodec:
+    """Codec based on ujson."""
+
+    name = "ujson"
+
+    def __init__(self):
+        if ujson is None:
+            raise ImportError("ujson is not installed (pip install ujson)")
+
+    def encode(self, msg) -> bytes:
+        return ujson.dumps(msg, ensure_ascii=False).encode('utf-8')
+
+    def decode(self, data):
+        return ujson.loads(data)
+
+
+CODECS = {
+    JsonCodec.name: JsonCodec,
+    OrjsonCodec.name: OrjsonCodec,
+    UjsonCodec.name: UjsonCodec,
+}
+
+_default_codec = None
+
+
+def get_codec(name: str = None):
+    """return a codec instance.
+
+    Args:
+        name (str, optional): "json", "orjson" or "ujson". Defaults to None, which picks the fastest installed backend
+                              (orjson, then ujson, then the standard library).
+
+    Returns:
+        codec: object with encode(msg) -> bytes and decode(bytes) -> msg
+    """
+    if name is not None:
+        if name not in CODECS:
+            raise ValueError(
+                f"unknown codec {name}, choose one of {list(CODECS)}")
+        return CODECS[name]()
+    if orjson is not None:
+        return OrjsonCodec()
+    if ujson is not None:
+        return UjsonCodec()
+    return JsonCodec()
+
+
+def default_codec():
+    """codec shared by all transports that are not given one explicitly"""
+    global _default_codec
+    if _default_codec is None:
+        _default_codec = get_codec()
+    return _default_codec
+
+
+def set_default_codec(codec):
+    """replace the shared codec, accepts a codec instance or a codec name"""
+    global _default_codec
+    _default_codec = get_codec(codec) if isinstance(codec, str) else codec
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           framing.py                               ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-03                               ║
+║ Last Modified:  2023-04-03                               ║
+║ Description:    Socket independent frame decoder for the ║
+║                 robokit 16 byte header protocol.         ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import struct
+
+PACK_HEAD_FMT_STR = '!BBHLH6s'
+HEADER_SIZE = 16
+SYNC_BYTE = 0x5A
+
+_HEADER = struct.Struct(PACK_HEAD_FMT_STR)
+
+
+def unpack_header(data):
+    result = _HEADER.unpack(data)
+    jsonLen = result[3]
+    reqNum = result[4]
+
+    return (jsonLen, reqNum)
+
+
+class FrameDecoder:
+
+    def __init__(self, buffer_size: int = 4096) -> None:
+        """
+        Incremental (sans-IO) decoder for robokit frames. Bytes are fed in arbitrary chunks and complete
+        frames (16 byte header + body) are returned as (request_id, msg_type, payload) tuples.
+        The decoder owns a single growable buffer, so a socket can read straight into it with recv_into.
+
+        usage:
+        ```python
+        decoder = FrameDecoder()
+        decoder.feed(chunk)
+        for request_id, msg_type, payload in decoder:
+            print(request_id, msg_type, payload)
+        ```
+
+        Args:
+            buffer_size (int, optional): initial size of the receive buffer in bytes. Defaults to 4096.
+        """
+        self._buffer = bytearray(max(buffer_size, HEADER_SIZE))
+        self._view = memoryview(self._buffer)
+        self._start = 0  # first byte not yet consumed
+        self._end = 0  # one past the last valid byte
+        self._frame_size = 0  # size of the frame being assembled, 0 if header not read yet
+
+    def __iter__(self):
+        return self.frames()
+
+    def __len__(self):
+        """number of buffered bytes that are not yet part of a returned frame"""
+        return self._end - self._start
+
+    def reset(self):
+        """drop any partially received data, e.g. after a reconnect"""
+        self._start = 0
+        self._end = 0
+        self._frame_size = 0
+
+    def _reserve(self, size):
+        """make sure there is room for at least `size` bytes after self._end"""
+        if len(self._buffer) - self._end >= size:
+            return
+        pending = self._end - self._start
+        if self._start:
+            # compact the unconsumed bytes to the front of the buffer
+            self._view[:pending] = self._view[self._start:self._end]
+            self._start = 0
+            self._end = pending
+        if len(self._buffer) - self._end < size:
+            new_size = len(self._buffer)
+            while new_size - self._end < size:
+                new_size *= 2
+            self._view.release()
+            self._buffer.extend(bytes(new_size - len(self._buffer)))
+            self._view = memoryview(self._buffer)
+
+    def feed(self, data):
+        """append a chunk of received bytes to the decoder
+
+        Args:
+            data (bytes, bytearray or memoryview): received bytes
+        """
+        size = len(data)
+        self._reserve(size)
+        self._view[self._end:self._end + size] = data
+        self._end += size
+
+    def get_buffer(self, size: int = 0):
+        """return a writable view of the free space in the buffer, at least `size` bytes long.
+        Write received bytes into it and report their number with buffer_updated().
+
+        Args:
+            size (int, optional): minimum free space to reserve. Defaults to the size still missing for the current frame.
+
+        Returns:
+            memoryview: free space at the end of the buffer
+        """
+        if size <= 0:
+            missing = (self._frame_size or HEADER_SIZE) - (self._end -
+                                                           self._start)
+            size = max(missing, 1024)
+        self._reserve(size)
+        return self._view[self._end:]
+
+    def buffer_updated(self, nbytes: int):
+        """mark `nbytes` bytes written into the view returned by get_buffer() as received"""
+        self._end += nbytes
+
+    def recv_into(self, sock, size: int = 0):
+        """receive directly from a socket into the decoder buffer without intermediate copies.
+
+        Args:
+            sock (socket.socket): connected socket
+            size (int, optional): minimum free space to reserve. Defaults to the size still missing for the current frame.
+
+        Returns:
+            int: number of bytes received, 0 means the peer closed the connection
+        """
+        received = sock.recv_into(self.get_buffer(size))
+        self._end += received
+        return received
+
+    def next_frame(self):
+        """return the next complete frame or None if more bytes are needed
+
+        Returns:
+            tuple: (request_id, msg_type, payload) with payload as bytes
+        """
+        available = self._end - self._start
+        if not self._frame_size:
+            if available < HEADER_SIZE:
+                return None
+            sync, _, _, length, _, _ = _HEADER.unpack_from(
+                self._buffer, self._start)
+            if sync != SYNC_BYTE:
+                raise ValueError(
+                    f"invalid frame header, sync byte is 0x{sync:02X}")
+            self._frame_size = HEADER_SIZE + length
+        if available < self._frame_size:
+            return None
+
+        _, _, request_id, _, msg_type, _ = _HEADER.unpack_from(
+            self._buffer, self._start)
+        body_start = self._start + HEADER_SIZE
+        payload = bytes(self._view[body_start:self._start + self._frame_size])
+        self._start += self._frame_size
+        self._frame_size = 0
+        if self._start == self._end:
+            self._start = 0
+            self._end = 0
+        return (request_id, msg_type, payload)
+
+    def frames(self):
+        """yield all complete frames currently buffered"""
+        frame = self.next_frame()
+        while frame is not None:
+            yield frame
+            frame = self.next_frame()
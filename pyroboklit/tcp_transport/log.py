@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           log.py                                   ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-12                               ║
+║ Last Modified:  2023-04-12                               ║
+║ Description:    logging helpers shared by the transport  ║
+║                 and api modules.                         ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import logging
+import time
+
+PACKAGE_LOGGER = __name__.split('.')[0]
+
+# the library never configures output, applications attach their own handlers
+logging.getLogger(PACKAGE_LOGGER).addHandler(logging.NullHandler())
+
+_quiet_hot_path = False
+_last_second = None
+_last_timestamp = ""
+
+
+def get_logger(name):
+    """return the logger of a module of the package"""
+    return logging.getLogger(name)
+
+
+def set_quiet_hot_path(quiet: bool = True):
+    """
+    Disable per-message logging (every frame sent and received) regardless of the logger levels.
+    Connection and error messages are still logged. In quiet mode the hot path costs a single flag check per message.
+
+    usage:
+    ```python
+    import logging
+    logging.basicConfig(level=logging.DEBUG)
+    set_quiet_hot_path(True)  # keep debug logs of connections but not of every request
+    ```
+    """
+    global _quiet_hot_path
+    _quiet_hot_path = quiet
+
+
+def hot_path_enabled(logger):
+    """True if per-message debug logs should be produced for logger"""
+    return not _quiet_hot_path and logger.isEnabledFor(logging.DEBUG)
+
+
+def timestamp():
+    """local wall clock time as "%Y-%m-%d %H:%M:%S", formatted at most once per second"""
+    global _last_second, _last_timestamp
+    now = int(time.time())
+    if now != _last_second:
+        _last_timestamp = time.strftime("%Y-%m-%d %H:%M:%S",
+                                        time.localtime(now))
+        _last_second = now
+    return _last_timestamp
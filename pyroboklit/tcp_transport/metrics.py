@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           metrics.py                               ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-14                               ║
+║ Last Modified:  2023-04-14                               ║
+║ Description:    Request latency and throughput metrics   ║
+║                 in Prometheus text format.               ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# upper bounds of the latency buckets in seconds, 4 buckets per power of two (max. 19 % relative error)
+# from 50 us to ~ 27 s
+LATENCY_BUCKETS = tuple(50e-6 * 2**(i / 4) for i in range(77))
+
+
+class RequestSeries:
+    """Counters of one (ip, port, msg_type). All storage is allocated on creation."""
+
+    __slots__ = ("ip", "port", "msg_type", "requests", "errors", "bytes_out",
+                 "bytes_in", "latency_sum", "buckets")
+
+    def __init__(self, ip, port, msg_type):
+        self.ip = ip
+        self.port = port
+        self.msg_type = msg_type
+        self.requests = 0
+        self.errors = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.latency_sum = 0.0
+        # last bucket counts latencies above the largest bound (+Inf)
+        self.buckets = array('Q', bytes(8 * (len(LATENCY_BUCKETS) + 1)))
+
+    def record_request(self, size):
+        self.requests += 1
+        self.bytes_out += size
+
+    def record_response(self, latency, size, error=False):
+        self.bytes_in += size
+        self.latency_sum += latency
+        self.buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        if error:
+            self.errors += 1
+
+    def record_error(self):
+        self.errors += 1
+
+    def quantile(self, q):
+        """estimate a latency quantile (0..1) from the histogram, returns the upper bound of its bucket"""
+        total = sum(self.buckets)
+        if not total:
+            return 0.0
+        rank = q * total
+        count = 0
+        for i, n in enumerate(self.buckets):
+            count += n
+            if count >= rank:
+                return LATENCY_BUCKETS[i] if i < len(
+                    LATENCY_BUCKETS) else float("inf")
+        return float("inf")
+
+
+class TransportMetrics:
+
+    def __init__(self, prefix: str = "pyrobokit") -> None:
+        """
+        Registry of request metrics per (robot ip, port, msg_type): request count, error count, bytes in and out and
+        a latency histogram with fixed buckets. Transports look their series up once per message type, recording a
+        request afterwards only increments preallocated counters.
+
+        usage:
+        ```python
+        metrics = default_metrics()
+        metrics.serve(9105)  # http://127.0.0.1:9105/metrics
+        # or
+        metrics.dump("/var/lib/node_exporter/pyrobokit.prom")
+        ```
+
+        Args:
+            prefix (str, optional): prefix of the exported metric names. Defaults to "pyrobokit".
+        """
+        self.prefix = prefix
+        self._series = {}
+        self._lock = threading.Lock()
+        self.server = None
+
+    def series(self, ip, port, msg_type):
+        """return the series of (ip, port, msg_type) where msg_type is the request type, creating it if necessary"""
+        key = (ip, port, msg_type)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(
+                    key, RequestSeries(ip, port, msg_type))
+        return series
+
+    def __iter__(self):
+        return iter(list(self._series.values()))
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def render(self):
+        """return all series in the Prometheus text exposition format"""
+        p = self.prefix
+        lines = []
+        counters = (
+            ("requests_total", "requests sent", "requests"),
+            ("errors_total",
+             "requests that failed or were answered with a ret_code other than 0",
+             "errors"),
+            ("sent_bytes_total", "bytes of requests sent, including headers",
+             "bytes_out"),
+            ("received_bytes_total",
+             "bytes of responses received, including headers", "bytes_in"),
+        )
+        all_series = list(self)
+        for name, help_text, attribute in counters:
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} counter")
+            for s in all_series:
+                lines.append(f"{p}_{name}{{{_labels(s)}}} "
+                             f"{getattr(s, attribute)}")
+
+        name = f"{p}_request_latency_seconds"
+        lines.append(f"# HELP {name} time from sending a request to "
+                     f"receiving its response")
+        lines.append(f"# TYPE {name} histogram")
+        for s in all_series:
+            labels = _labels(s)
+            count = 0
+            for bound, n in zip(LATENCY_BUCKETS, s.buckets):
+                count += n
+                lines.append(f'{name}_bucket{{{labels},le="{bound:.6g}"}} '
+                             f'{count}')
+            count += s.buckets[-1]
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{name}_sum{{{labels}}} {s.latency_sum}")
+            lines.append(f"{name}_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """write the metrics to a file (e.g. for the node_exporter textfile collector), the file is replaced
+        atomically"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve(self, port: int = 9105, host: str = "127.0.0.1"):
+        """serve the metrics over http from a background thread
+
+        Args:
+            port (int, optional): http port. Defaults to 9105.
+            host (str, optional): listen address. Defaults to "127.0.0.1".
+
+        Returns:
+            ThreadingHTTPServer: the running server, call shutdown() to stop it
+        """
+        metrics = self
+
+        class _Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type",
+                                 "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  name="pyrobokit-metrics",
+                                  daemon=True)
+        thread.start()
+        return self.server
+
+
+def _labels(series):
+    return (f'ip="{series.ip}",port="{series.port}",'
+            f'msg_type="{series.msg_type}"')
+
+
+_default_metrics = TransportMetrics()
+
+
+def default_metrics():
+    """registry used by all transports that are not given one explicitly"""
+    return _default_metrics
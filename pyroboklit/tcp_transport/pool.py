@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           pool.py                                  ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-18                               ║
+║ Last Modified:  2023-04-18                               ║
+║ Description:    Process wide pool of shared, reference   ║
+║                 counted transports per (ip, port).       ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from .log import get_logger
+from .transport import TcpTransport, CLOSED
+
+logger = get_logger(__name__)
+
+
+class _Entry:
+    __slots__ = ("transport", "refs", "idle_since")
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.refs = 0
+        self.idle_since = None
+
+
+class TransportPool:
+
+    def __init__(self,
+                 max_per_controller: int = 8,
+                 idle_timeout: float = 60.0,
+                 **transport_kwargs) -> None:
+        """
+        Pool of shared transports. All consumers acquiring the same (ip, port) get the same TcpTransport, so a
+        controller sees one socket per API port no matter how many parts of the application talk to it. Requests
+        of several threads are multiplexed on the connection by request id (see TcpTransport.submit).
+
+        Transports are reference counted: release() marks a transport idle once its last user is gone and idle
+        transports are closed after idle_timeout.
+
+        usage:
+        ```python
+        pool = default_pool()
+        status = StatusAPI("192.168.0.10", pool=pool)
+        nav = NavigationAPI("192.168.0.10", pool=pool)
+        # a second StatusAPI shares the socket of the first one
+        monitor = StatusAPI("192.168.0.10", pool=pool)
+        ...
+        monitor.close()  # releases the shared transport, the socket stays open for status
+        ```
+
+        Args:
+            max_per_controller (int, optional): maximum number of connections to one controller ip. Defaults to 8.
+            idle_timeout (float, optional): seconds after which an unused transport is closed, None keeps idle
+                                            transports open. Defaults to 60.0.
+            transport_kwargs: arguments of TcpTransport used for new transports (codec, metrics, connect_timeout,
+                              ...)
+        """
+        self.max_per_controller = max_per_controller
+        self.idle_timeout = idle_timeout
+        self.transport_kwargs = transport_kwargs
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._evictor = None
+
+    def acquire(self, ip, port, lazy=False):
+        """return the shared transport of (ip, port), creating it if necessary. Every acquire must be paired with
+        a release.
+
+        Args:
+            ip (str): AGV ip address
+            port (int): API port
+            lazy (bool, optional): do not wait for the first connection attempt of a new transport. Defaults to False.
+
+        Raises:
+            ConnectionError: if max_per_controller connections to ip are in use
+
+        Returns:
+            TcpTransport: the shared transport
+        """
+        key = (ip, port)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.transport.state == CLOSED:
+                # closed by one of its users, replace it
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._make_room(ip)
+                entry = _Entry(
+                    TcpTransport(ip, port, lazy=True, **self.transport_kwargs))
+                self._entries[key] = entry
+                logger.debug("[Transport Pool] :: Opened %s:%s", ip, port)
+            entry.refs += 1
+            entry.idle_since = None
+            transport = entry.transport
+        if not lazy and not transport.connected:
+            # the reconnector makes the first attempt right away, concurrent acquirers wait for the same attempt
+            transport.wait_connected(transport.connect_timeout)
+        return transport
+
+    def _make_room(self, ip):
+        """close idle transports of ip until another connection fits under max_per_controller, lock held"""
+        keys = [key for key in self._entries if key[0] == ip]
+        if len(keys) < self.max_per_controller:
+            return
+        idle = sorted((self._entries[key].idle_since, key) for key in keys
+                      if self._entries[key].refs == 0)
+        excess = len(keys) - self.max_per_controller + 1
+        if len(idle) < excess:
+            raise ConnectionError(f"{self.max_per_controller} connections "
+                                  f"to {ip} are already in use")
+        for _, key in idle[:excess]:
+            self._entries.pop(key).transport.close()
+
+    def release(self, transport):
+        """return a transport obtained from acquire(). The transport stays open for the other users and is closed
+        idle_timeout seconds after its last user released it."""
+        with self._lock:
+            entry = self._entries.get((transport.ip, transport.port))
+            if entry is None or entry.transport is not transport:
+                # evicted or replaced meanwhile, nobody else uses it
+                transport.close()
+                return
+            if entry.refs == 0:
+                logger.warning("[Transport Pool] :: %s:%s released twice",
+                               transport.ip, transport.port)
+                return
+            entry.refs -= 1
+            if entry.refs == 0:
+                entry.idle_since = time.monotonic()
+                if self.idle_timeout is not None:
+                    self._start_evictor()
+
+    @contextmanager
+    def lease(self, ip, port, lazy=False):
+        """acquire a transport for the duration of a with block
+
+        usage:
+        ```python
+        with default_pool().lease("192.168.0.10", API_PORT_STATE) as transport:
+            pose = transport.send_n_receive(0, 1004)
+        ```
+        """
+        transport = self.acquire(ip, port, lazy)
+        try:
+            yield transport
+        finally:
+            self.release(transport)
+
+    def _start_evictor(self):
+        if self._evictor is not None and self._evictor.is_alive():
+            return
+        self._stop_event.clear()
+        self._evictor = threading.Thread(target=self._evict_loop,
+                                         name="transport-pool-evictor",
+                                         daemon=True)
+        self._evictor.start()
+
+    def _evict_loop(self):
+        while not self._stop_event.wait(self.idle_timeout / 2):
+            self.evict_idle()
+            with self._lock:
+                if not any(entry.refs == 0
+                           for entry in self._entries.values()):
+                    self._evictor = None
+                    return
+
+    def evict_idle(self, max_idle=None):
+        """close the transports that have been unused for longer than max_idle seconds
+
+        Args:
+            max_idle (float, optional): idle time in seconds. Defaults to idle_timeout.
+
+        Returns:
+            int: number of transports closed
+        """
+        max_idle = self.idle_timeout if max_idle is None else max_idle
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                key for key, entry in self._entries.items()
+                if entry.refs == 0 and now - entry.idle_since >= max_idle
+            ]
+            transports = [self._entries.pop(key).transport for key in expired]
+        for transport in transports:
+            logger.debug("[Transport Pool] :: Closed idle %s:%s",
+                         transport.ip, transport.port)
+            transport.close()
+        return len(transports)
+
+    def connections(self, ip=None):
+        """return {(ip, port): number of users} of the pooled transports, optionally only those of one ip"""
+        with self._lock:
+            return {
+                key: entry.refs
+                for key, entry in self._entries.items()
+                if ip is None or key[0] == ip
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def close(self):
+        """close all pooled transports, including those still in use"""
+        self._stop_event.set()
+        with self._lock:
+            entries, self._entries = self._entries, {}
+        for entry in entries.values():
+            entry.transport.close()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def default_pool():
+    """process wide pool shared by all API facades that are given pool=default_pool()"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = TransportPool()
+        return _default_pool
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           record.py                                ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-04-23                               ║
+║ Last Modified:  2023-04-23                               ║
+║ Description:    Recording of the frames exchanged with   ║
+║                 the AGVs into a chunk compressed log.    ║
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import bisect
+import struct
+import threading
+import time
+import zlib
+from collections import deque, namedtuple
+from .framing import FrameDecoder, PACK_HEAD_FMT_STR, SYNC_BYTE
+from .codec import default_codec
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# direction of a recorded frame
+SENT = 0
+RECEIVED = 1
+# a record that names the (ip, port) of a channel, see FrameRecorder
+_CHANNEL = 2
+
+# file layout:
+#   file header    magic, wall clock time and time.monotonic() at the start of the recording
+#   chunks         chunk header followed by the zlib compressed records
+#   index          written on close: offset, first and last time and record count of every chunk
+#   footer         offset of the index
+# every chunk starts with the channel records of all channels, so it can be decoded on its own
+_MAGIC = b"PRBKLOG1"
+_INDEX_MAGIC = b"PRBKIDX1"
+_FILE_HEADER = struct.Struct("!8sdd")
+_CHUNK_HEADER = struct.Struct("!4sLLLdd")
+_INDEX_HEADER = struct.Struct("!4sL")
+_INDEX_ENTRY = struct.Struct("!QddL")
+_FOOTER = struct.Struct("!Q8s")
+# time, direction, channel, request id, message type, body length
+_RECORD = struct.Struct("!dBHHHL")
+_HEADER = struct.Struct(PACK_HEAD_FMT_STR)
+
+RecordedFrame = namedtuple(
+    "RecordedFrame",
+    ("t", "direction", "ip", "port", "request_id", "msg_type", "payload"))
+
+ChunkInfo = namedtuple("ChunkInfo", ("offset", "t_first", "t_last", "count"))
+
+
+class FrameRecorder:
+
+    def __init__(self,
+                 path: str,
+                 chunk_size: int = 256 * 1024,
+                 flush_interval: float = 1.0,
+                 level: int = 1) -> None:
+        """
+        Append-only log of the frames sent to and received from the AGVs. Attach it to any number of transports;
+        record() only timestamps the frame and appends it to a queue, a writer thread packs the frames into chunks,
+        compresses them and writes them to the file, so recording adds no I/O to the request path.
+
+        usage:
+        ```python
+        recorder = FrameRecorder("session.prbk")
+        transport = TcpTransport("192.168.0.10", API_PORT_STATE, recorder=recorder)
+        pool = TransportPool(recorder=recorder)  # or record all transports of a pool
+        ...
+        recorder.close()
+        for frame in FrameLog("session.prbk").frames(start=120.0):
+            print(frame.t, frame.msg_type, frame.payload)
+        ```
+
+        Args:
+            path (str): log file, overwritten if it exists
+            chunk_size (int, optional): uncompressed size of a chunk in bytes. Defaults to 256 kB.
+            flush_interval (float, optional): seconds after which a partial chunk is written. Defaults to 1.0.
+            level (int, optional): zlib compression level. Defaults to 1.
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.level = level
+        self.started_at = time.time()
+        self.started = time.monotonic()
+        self.dropped = 0
+        self._file = open(path, "wb")
+        self._file.write(
+            _FILE_HEADER.pack(_MAGIC, self.started_at, self.started))
+        self._queue = deque()
+        self._channels = {}
+        self._index = []
+        self._stop_event = threading.Event()
+        self._writer = threading.Thread(target=self._run,
+                                        name="frame-recorder",
+                                        daemon=True)
+        self._writer.start()
+
+    def record(self, direction, ip, port, request_id, msg_type, payload):
+        """queue one frame, called by the transports
+
+        Args:
+            direction (int): SENT or RECEIVED
+            ip (str): AGV ip address
+            port (int): API port
+            request_id (int): request id of the header
+            msg_type (int): message type of the header
+            payload (bytes): raw body
+        """
+        if self._stop_event.is_set():
+            self.dropped += 1
+            return
+        self._queue.append((time.monotonic(), direction, ip, port,
+                            request_id, msg_type, payload))
+
+    def _channel(self, ip, port):
+        channel = self._channels.get((ip, port))
+        if channel is None:
+            channel = self._channels[(ip, port)] = len(self._channels)
+        return channel
+
+    def _run(self):
+        chunk = bytearray()
+        count = 0
+        t_first = t_last = 0.0
+        flush_at = time.monotonic() + self.flush_interval
+        stopping = False
+        while True:
+            stopping = self._stop_event.wait(0.05) or stopping
+            queue = self._queue
+            while queue:
+                t, direction, ip, port, request_id, msg_type, payload = \
+                    queue.popleft()
+                if not count:
+                    t_first = t
+                    chunk += self._channel_records(t)
+                key = (ip, port)
+                if key not in self._channels:
+                    chunk += _channel_record(t, self._channel(ip, port), ip,
+                                             port)
+                chunk += _RECORD.pack(t, direction, self._channels[key],
+                                      request_id, msg_type, len(payload))
+                chunk += payload
+                count += 1
+                t_last = t
+                if len(chunk) >= self.chunk_size:
+                    self._write_chunk(chunk, count, t_first, t_last)
+                    chunk, count = bytearray(), 0
+                    flush_at = time.monotonic() + self.flush_interval
+            if count and (stopping or time.monotonic() >= flush_at):
+                self._write_chunk(chunk, count, t_first, t_last)
+                chunk, count = bytearray(), 0
+            if count == 0:
+                flush_at = time.monotonic() + self.flush_interval
+            if stopping:
+                return
+
+    def _channel_records(self, t):
+        return b"".join(
+            _channel_record(t, channel, ip, port)
+            for (ip, port), channel in self._channels.items())
+
+    def _write_chunk(self, chunk, count, t_first, t_last):
+        data = zlib.compress(chunk, self.level)
+        offset = self._file.tell()
+        try:
+            self._file.write(
+                _CHUNK_HEADER.pack(b"CHNK", len(data), len(chunk), count,
+                                   t_first - self.started,
+                                   t_last - self.started))
+            self._file.write(data)
+            self._file.flush()
+        except OSError as e:
+            logger.error("[Frame Recorder] :: Error writing %s: %s",
+                         self.path, e)
+            return
+        self._index.append(
+            ChunkInfo(offset, t_first - self.started, t_last - self.started,
+                      count))
+
+    def close(self):
+        """write the queued frames and the index, then close the file"""
+        if self._stop_event.is_set():
+            return
+        self._stop_event.set()
+        self._writer.join()
+        offset = self._file.tell()
+        self._file.write(_INDEX_HEADER.pack(b"INDX", len(self._index)))
+        for entry in self._index:
+            self._file.write(_INDEX_ENTRY.pack(*entry))
+        self._file.write(_FOOTER.pack(offset, _INDEX_MAGIC))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _channel_record(t, channel, ip, port):
+    name = f"{ip}:{port}".encode()
+    return _RECORD.pack(t, _CHANNEL, channel, 0, 0, len(name)) + name
+
+
+class FrameLog:
+
+    def __init__(self, path: str) -> None:
+        """
+        Reader of a log written by FrameRecorder. Times are in seconds since the start of the recording.
+
+        The chunk index is read from the end of the file. Logs that were not closed (e.g. after a crash) have no
+        index, it is rebuilt from the chunk headers without decompressing the chunks.
+
+        usage:
+        ```python
+        log = FrameLog("session.prbk")
+        print(log.duration, log.channels())
+        for frame, data in log.decode(start=60.0, stop=90.0):
+            print(frame.t, frame.ip, frame.msg_type, data)
+        ```
+
+        Args:
+            path (str): log file
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            magic, self.started_at, self.started = _FILE_HEADER.unpack(
+                f.read(_FILE_HEADER.size))
+            if magic != _MAGIC:
+                raise ValueError(f"{path} is not a frame log")
+            self.chunks = self._read_index(f) or self._scan(f)
+        self._ends = [chunk.t_last for chunk in self.chunks]
+
+    @staticmethod
+    def _read_index(f):
+        f.seek(0, 2)
+        size = f.tell()
+        if size < _FILE_HEADER.size + _FOOTER.size:
+            return None
+        f.seek(size - _FOOTER.size)
+        offset, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+        if magic != _INDEX_MAGIC:
+            return None
+        f.seek(offset)
+        _, count = _INDEX_HEADER.unpack(f.read(_INDEX_HEADER.size))
+        data = f.read(count * _INDEX_ENTRY.size)
+        return [
+            ChunkInfo(*entry) for entry in _INDEX_ENTRY.iter_unpack(data)
+        ]
+
+    @staticmethod
+    def _scan(f):
+        chunks = []
+        offset = _FILE_HEADER.size
+        f.seek(0, 2)
+        size = f.tell()
+        while offset + _CHUNK_HEADER.size <= size:
+            f.seek(offset)
+            tag, length, _, count, t_first, t_last = _CHUNK_HEADER.unpack(
+                f.read(_CHUNK_HEADER.size))
+            if tag != b"CHNK" or offset + _CHUNK_HEADER.size + length > size:
+                # index or a chunk cut off by a crash
+                break
+            chunks.append(ChunkInfo(offset, t_first, t_last, count))
+            offset += _CHUNK_HEADER.size + length
+        return chunks
+
+    def __len__(self):
+        return sum(chunk.count for chunk in self.chunks)
+
+    @property
+    def duration(self):
+        return self.chunks[-1].t_last if self.chunks else 0.0
+
+    def channels(self):
+        """(ip, port) of every recorded connection"""
+        channels = []
+        for chunk in self.chunks:
+            for ip, port in self._read_chunk(chunk)[1].values():
+                if (ip, port) not in channels:
+                    channels.append((ip, port))
+        return channels
+
+    def _read_chunk(self, chunk):
+        """decompress a chunk, return its frames and its channels by channel number"""
+        with open(self.path, "rb") as f:
+            f.seek(chunk.offset)
+            _, length, _, _, _, _ = _CHUNK_HEADER.unpack(
+                f.read(_CHUNK_HEADER.size))
+            data = zlib.decompress(f.read(length))
+        frames = []
+        channels = {}
+        position = 0
+        started = self.started
+        while position < len(data):
+            t, direction, channel, request_id, msg_type, length = \
+                _RECORD.unpack_from(data, position)
+            position += _RECORD.size
+            payload = data[position:position + length]
+            position += length
+            if direction == _CHANNEL:
+                ip, port = payload.decode().rsplit(":", 1)
+                channels[channel] = (ip, int(port))
+                continue
+            ip, port = channels[channel]
+            frames.append(
+                RecordedFrame(t - started, direction, ip, port, request_id,
+                              msg_type, payload))
+        return frames, channels
+
+    def frames(self, start=None, stop=None):
+        """yield the recorded frames between start and stop in order of time. Only the chunks overlapping the range
+        are read.
+
+        Args:
+            start (float, optional): seconds since the start of the recording. Defaults to the beginning.
+            stop (float, optional): seconds since the start of the recording. Defaults to the end.
+        """
+        first = 0 if start is None else bisect.bisect_left(self._ends, start)
+        for chunk in self.chunks[first:]:
+            if stop is not None and chunk.t_first > stop:
+                return
+            for frame in self._read_chunk(chunk)[0]:
+                if start is not None and frame.t < start:
+                    continue
+                if stop is not None and frame.t > stop:
+                    return
+                yield frame
+
+    def decode(self, start=None, stop=None, codec=None):
+        """feed the recorded frames of every connection and direction through a FrameDecoder and the json codec, as
+        the transports would, and yield (frame, decoded body). Bodies that cannot be decoded yield the exception
+        instead, so a log of a misbehaving AGV can be replayed to reproduce decoding errors.
+
+        Args:
+            start (float, optional): seconds since the start of the recording. Defaults to the beginning.
+            stop (float, optional): seconds since the start of the recording. Defaults to the end.
+            codec (optional): json codec. Defaults to the default codec.
+        """
+        codec = codec or default_codec()
+        decoders = {}
+        for frame in self.frames(start, stop):
+            key = (frame.ip, frame.port, frame.direction)
+            decoder = decoders.get(key)
+            if decoder is None:
+                decoder = decoders[key] = FrameDecoder()
+            decoder.feed(pack_frame(frame))
+            for _, _, payload in decoder:
+                try:
+                    data = codec.decode(payload) if payload else None
+                except ValueError as e:
+                    data = e
+                yield frame, data
+
+
+def pack_frame(frame):
+    """raw bytes of a recorded frame as sent on the wire"""
+    return _HEADER.pack(SYNC_BYTE, 0x01, frame.request_id,
+                        len(frame.payload), frame.msg_type,
+                        b'\x00\x00\x00\x00\x00\x00') + frame.payload
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="print a frame log")
+    parser.add_argument("path")
+    parser.add_argument("--start", type=float)
+    parser.add_argument("--stop", type=float)
+    args = parser.parse_args()
+    log = FrameLog(args.path)
+    print(f"{args.path}: {len(log)} frames in {len(log.chunks)} chunks, "
+          f"{log.duration:.3f} s, started "
+          f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(log.started_at))}")
+    for frame, data in log.decode(args.start, args.stop):
+        print(f"{frame.t:10.4f} {'>' if frame.direction == SENT else '<'} "
+              f"{frame.ip}:{frame.port} #{frame.request_id} {frame.msg_type} "
+              f"{data}")
@@ -1,151 +1,586 @@
-# -*- coding: utf-8 -*-
-"""
-╔══════════════════════════════════════════════════════════╗
-║ File:           transport.py                             ║
-║ Author:         Nexus1203                                ║
-║ Created:        2023-03-23                               ║
-║ Last Modified:  2023-03-23                               ║
-║ Description:    TCP/IP client with reconnect features,   ║
-║                 and a encoding decoding for robotkit     ║
-║                  interface.                              ║  
-╚══════════════════════════════════════════════════════════╝
-"""
-
-import socket
-import struct
-import json
-import time
-from datetime import datetime
-
-
-class SeerData:
-
-    def __init__(self):
-        self.header = bytearray(
-            struct.pack('!BBHLH6s', 0x5A, 0x01, 0, 0, 0,
-                        b'\x00\x00\x00\x00\x00\x00'))
-        self.data = bytearray()
-
-    def size(self):
-        _, _, _, _, m_length = struct.unpack('!BBHLH6s', self.header)
-        return 16 + m_length
-
-    def set_data(self, msg_type, msg=None, request_id=0):
-        if msg:
-            as_json = json.dumps(msg)
-            data = bytearray(as_json, 'ascii')
-            size = len(data)
-        else:
-            data = bytearray()
-            size = 0
-
-        self.header = bytearray(
-            struct.pack('!BBHLH6s', 0x5A, 0x01, request_id, size, msg_type,
-                        b'\x00\x00\x00\x00\x00\x00'))
-        self.data = data
-
-        return 16 + size
-
-    def get_packed_message(self):
-        return self.header + self.data
-
-
-def unpack_header(data):
-    PACK_HEAD_FMT_STR = '!BBHLH6s'
-    result = struct.unpack(PACK_HEAD_FMT_STR, data)
-    jsonLen = result[3]
-    reqNum = result[4]
-
-    return (jsonLen, reqNum)
-
-
-class TcpTransport:
-
-    def __init__(self, ip, port):
-        self.name = "TCP Transport"
-        self.ip = ip
-        self.port = port
-        self.connected = False
-        self.socket = None
-        self.connect()
-
-    def connect(self):
-        i = 0
-        while not self.connected:
-            try:
-                self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self.socket.setblocking(True)
-                self.socket.connect((self.ip, self.port))
-                self.connected = True
-            except socket.error as e:
-                print(f"Connection error: {e}. Retrying...")
-                time.sleep(5)
-                i += 1
-                if i > 10:
-                    print("Unable to connect. Exiting.")
-                    break
-
-    def disconnect(self):
-        self.connected = False
-        self.socket.close()
-
-    def listen(self):
-        data = None
-        try:
-            header = self.socket.recv(16)
-            print(header)
-            jsonLen, reqNum = unpack_header(header)
-
-            data = self.socket.recv(jsonLen + 1)
-            data = data.decode('utf-8')
-            data = json.loads(data)
-
-        except Exception as e:
-            print(f"Error: {e}")
-
-        if data:
-            timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-            log = (f"[{timestamp}] [{self.name}] :: Received: {data}")
-            if jsonLen > 0 and jsonLen < 1000:
-                print(log)
-            data['timestamp'] = timestamp
-        return data
-
-    def send(self, message):
-        if self.connected:
-            try:
-                timestamp = time.strftime("%Y-%m-%d %H:%M:%S",
-                                          time.localtime())
-                print(message.hex())
-                self.socket.sendall(message)
-                log = (f"[{timestamp}] [{self.name}] :: Sent: {message}")
-                print(log)
-                # print(f"[{timestamp}] Sent: {message}")
-            except socket.error as e:
-                self.disconnect()
-                self.connect()
-        else:
-            print("Not connected. Unable to send message.")
-
-    def send_command(self, requestID, messageType, data={}):
-        # message = pack_message(requestID, messageType, data)
-        s = SeerData()
-        s.set_data(request_id=requestID,
-                   msg_type=messageType,
-                   msg=None if {} else data)
-        message = s.get_packed_message()
-        self.send(message)
-
-    def send_n_receive(self, requestID, messageType, data={}):
-        self.send_command(requestID, messageType, data)
-        # time.sleep(0.01)
-        return self.listen()
-
-
-if __name__ == "__main__":
-    transport = TcpTransport("127.0.0.1", 12345)
-
-    while True:
-        message = input("Enter message to send: ")
-        transport.send(message)
-        transport.listen()
+# -*- coding: utf-8 -*-
+"""
+╔══════════════════════════════════════════════════════════╗
+║ File:           transport.py                             ║
+║ Author:         Nexus1203                                ║
+║ Created:        2023-03-23                               ║
+║ Last Modified:  2023-03-23                               ║
+║ Description:    TCP/IP client with reconnect features,   ║
+║                 and a encoding decoding for robotkit     ║
+║                  interface.                              ║  
+╚══════════════════════════════════════════════════════════╝
+"""
+
+import select
+import socket
+import struct
+import time
+import itertools
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from .framing import FrameDecoder
+from .framing import PACK_HEAD_FMT_STR, HEADER_SIZE, SYNC_BYTE
+from .codec import default_codec
+from .log import get_logger, hot_path_enabled, timestamp
+from .metrics import default_metrics
+from .backoff import Backoff
+from .record import SENT, RECEIVED
+
+logger = get_logger(__name__)
+
+# the AGV answers a request of type N with a response of type N + 10000
+RESPONSE_OFFSET = 10000
+# seconds send_n_receive waits for a response by default
+RESPONSE_TIMEOUT = 10.0
+
+# connection states of TcpTransport
+DISCONNECTED = "disconnected"
+CONNECTING = "connecting"
+CONNECTED = "connected"
+CLOSED = "closed"
+
+_request_ids = itertools.count()
+
+
+def next_request_id():
+    """return the next request id in the range 1..65535 (0 is reserved for "not assigned")"""
+    return next(_request_ids) % 0xFFFF + 1
+
+
+_HEADER = struct.Struct(PACK_HEAD_FMT_STR)
+# header fields that change with every message: request id and body length
+_HEADER_ID_LENGTH = struct.Struct('!HL')
+_header_templates = {}
+
+
+def header_template(msg_type):
+    """return the packed header of msg_type with request id and length set to 0, cached per message type"""
+    template = _header_templates.get(msg_type)
+    if template is None:
+        template = _HEADER.pack(SYNC_BYTE, 0x01, 0, 0, msg_type,
+                                b'\x00\x00\x00\x00\x00\x00')
+        _header_templates[msg_type] = template
+    return template
+
+
+class SeerData:
+
+    def __init__(self):
+        self.header = bytearray(HEADER_SIZE)
+        self.header[:] = header_template(0)
+        self.data = b''
+        self.request_id = 0
+        self.msg_type = 0
+
+    def size(self):
+        _, _, _, m_length, _, _ = _HEADER.unpack(self.header)
+        return HEADER_SIZE + m_length
+
+    def set_data(self, msg_type, msg=None, request_id=0, codec=None):
+        """pack the message into the reusable header buffer, a request_id of 0 is replaced by an automatically
+        assigned 16 bit id. The body is encoded with codec, or the default codec if None."""
+        if not request_id:
+            request_id = next_request_id()
+        if msg:
+            data = (codec or default_codec()).encode(msg)
+        else:
+            data = b''
+        size = len(data)
+
+        self.header[:] = header_template(msg_type)
+        _HEADER_ID_LENGTH.pack_into(self.header, 2, request_id, size)
+        self.data = data
+        self.request_id = request_id
+        self.msg_type = msg_type
+
+        return HEADER_SIZE + size
+
+    def get_packed_message(self):
+        return self.header + self.data
+
+
+class TcpTransport:
+
+    def __init__(self,
+                 ip,
+                 port,
+                 codec=None,
+                 metrics=None,
+                 connect_timeout: float = 3.0,
+                 lazy: bool = False,
+                 reconnect: bool = True,
+                 backoff: Backoff = None,
+                 recorder=None,
+                 nodelay: bool = False):
+        """
+        TCP client of one AGV port.
+
+        Unless lazy is set, the constructor makes a single connection attempt bounded by connect_timeout. If the AGV
+        cannot be reached (or the connection is lost later) a background thread keeps reconnecting with jittered
+        exponential backoff, the state of the connection is available from `state`, `wait_connected()` and the
+        callbacks registered with `add_state_callback()`.
+
+        usage:
+        ```python
+        # bring up many transports without blocking on offline AGVs
+        transports = [TcpTransport(ip, API_PORT_STATE, lazy=True) for ip in ips]
+        for transport in transports:
+            transport.wait_connected(timeout=2.0)
+        ```
+
+        Args:
+            ip (str): AGV ip address
+            port (int): API port
+            codec (optional): json codec of the message bodies. Defaults to the default codec.
+            metrics (TransportMetrics, optional): request metrics registry, False disables recording. Defaults to
+                                                  the default registry.
+            connect_timeout (float, optional): timeout of one connection attempt in seconds. Defaults to 3.0.
+            lazy (bool, optional): connect in the background, the constructor returns immediately. Defaults to False.
+            reconnect (bool, optional): reconnect in the background when the connection fails. Defaults to True.
+            backoff (Backoff, optional): delays between reconnection attempts. Defaults to Backoff().
+            recorder (FrameRecorder, optional): record every sent and received frame. Defaults to None.
+            nodelay (bool, optional): disable Nagle's algorithm (TCP_NODELAY) so small requests are sent without
+                                      delay, for control loops. Defaults to False.
+        """
+        self.name = "TCP Transport"
+        self.ip = ip
+        self.port = port
+        # json codec of request and response bodies, see codec.get_codec
+        self.codec = codec or default_codec()
+        # request metrics registry, False disables recording
+        self.metrics = default_metrics() if metrics is None else metrics
+        self._metric_series = {}
+        self.connect_timeout = connect_timeout
+        self.reconnect = reconnect
+        self.backoff = backoff or Backoff()
+        # FrameRecorder of the sent and received frames, None disables recording
+        self.recorder = recorder
+        self.nodelay = nodelay
+        self.state = DISCONNECTED
+        self.connected = False
+        self.socket = None
+        self._state_callbacks = []
+        self._connect_lock = threading.RLock()
+        self._connected_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._reconnector = None
+        self.decoder = FrameDecoder()
+        # requests in flight as (future, metric series, send time), keyed by (request_id, response msg_type)
+        self.pending = {}
+        self._send_lock = threading.RLock()
+        # reused for every request sent through send_command and submit
+        self._seer = SeerData()
+        self._recv_lock = threading.RLock()
+        if lazy:
+            self.start_reconnector()
+        else:
+            self.connect()
+
+    def _set_state(self, state):
+        if state == self.state:
+            return
+        self.state = state
+        self.connected = state == CONNECTED
+        if self.connected:
+            self._connected_event.set()
+        else:
+            self._connected_event.clear()
+        for callback in list(self._state_callbacks):
+            try:
+                callback(self, state)
+            except Exception:
+                logger.exception("[%s] :: Error in state callback",
+                                 self.name)
+
+    def add_state_callback(self, callback):
+        """call callback(transport, state) whenever the connection state changes (DISCONNECTED, CONNECTING,
+        CONNECTED or CLOSED). Callbacks may run on the reconnector thread."""
+        self._state_callbacks.append(callback)
+
+    def remove_state_callback(self, callback):
+        self._state_callbacks.remove(callback)
+
+    def wait_connected(self, timeout=None):
+        """block until the transport is connected, returns False on timeout"""
+        return self._connected_event.wait(timeout)
+
+    def _open_socket(self, timeout):
+        sock = socket.create_connection((self.ip, self.port), timeout=timeout)
+        sock.settimeout(None)
+        if self.nodelay:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def connect(self, timeout=None):
+        """make a single connection attempt. If it fails and reconnect is enabled, the background reconnector
+        keeps trying.
+
+        Args:
+            timeout (float, optional): connect timeout in seconds. Defaults to connect_timeout.
+
+        Returns:
+            bool: True if connected
+        """
+        with self._connect_lock:
+            if self.connected or self.state == CLOSED:
+                return self.connected
+            self._set_state(CONNECTING)
+            try:
+                sock = self._open_socket(self.connect_timeout if timeout is
+                                         None else timeout)
+            except OSError as e:
+                logger.warning("[%s] :: Connection error %s:%s: %s",
+                               self.name, self.ip, self.port, e)
+                self._set_state(DISCONNECTED)
+            else:
+                self.socket = sock
+                self.decoder.reset()
+                self.backoff.reset()
+                self._set_state(CONNECTED)
+                logger.info("[%s] :: Connected to %s:%s", self.name, self.ip,
+                            self.port)
+        if not self.connected and self.reconnect:
+            self.start_reconnector()
+        return self.connected
+
+    def start_reconnector(self):
+        """start the background thread that connects with exponential backoff until the transport is connected"""
+        if self._reconnector is not None and self._reconnector.is_alive():
+            return
+        self._reconnector = threading.Thread(
+            target=self._reconnect_loop,
+            name=f"reconnect-{self.ip}:{self.port}",
+            daemon=True)
+        self._reconnector.start()
+
+    def _reconnect_loop(self):
+        while not self.connected and not self._stop_event.is_set():
+            with self._connect_lock:
+                if self.state == CLOSED:
+                    return
+                self._set_state(CONNECTING)
+                try:
+                    sock = self._open_socket(self.connect_timeout)
+                except OSError as e:
+                    self._set_state(DISCONNECTED)
+                    delay = self.backoff.next()
+                    logger.debug(
+                        "[%s] :: Connection error %s:%s: %s. Retrying in %.1f s",
+                        self.name, self.ip, self.port, e, delay)
+                else:
+                    self.socket = sock
+                    self.decoder.reset()
+                    self.backoff.reset()
+                    self._set_state(CONNECTED)
+                    logger.info("[%s] :: Connected to %s:%s", self.name,
+                                self.ip, self.port)
+                    return
+            self._stop_event.wait(delay)
+
+    def _connection_lost(self, error):
+        """close the socket after an error, fail the pending requests and start reconnecting"""
+        with self._connect_lock:
+            if self.socket is not None:
+                self.socket.close()
+            if self.state != CLOSED:
+                self._set_state(DISCONNECTED)
+        self._fail_pending(error)
+        if self.reconnect and self.state != CLOSED:
+            self.start_reconnector()
+
+    def disconnect(self):
+        """close the connection without reconnecting, connect() may be called again later"""
+        with self._connect_lock:
+            if self.socket is not None:
+                self.socket.close()
+            if self.state != CLOSED:
+                self._set_state(DISCONNECTED)
+        self._fail_pending(ConnectionError("connection to the AGV closed"))
+
+    def close(self):
+        """close the connection and stop reconnecting for good"""
+        self._stop_event.set()
+        self.disconnect()
+        self._set_state(CLOSED)
+
+    def _fail_pending(self, error):
+        pending, self.pending = self.pending, {}
+        for future, series, _ in pending.values():
+            if series is not None:
+                series.record_error()
+            if not future.done():
+                future.set_exception(error)
+
+    def series(self, msg_type):
+        """metric series of a request message type on this connection, None if metrics are disabled"""
+        series = self._metric_series.get(msg_type)
+        if series is None and self.metrics:
+            series = self.metrics.series(self.ip, self.port, msg_type)
+            self._metric_series[msg_type] = series
+        return series
+
+    def read_frame(self, deadline=None):
+        """block until one complete frame is received. The socket is shared with the senders, so the deadline is
+        kept with select instead of a socket timeout.
+
+        Args:
+            deadline (float, optional): time.monotonic() after which socket.timeout is raised. Defaults to None.
+
+        Returns:
+            tuple: (request_id, msg_type, payload) or None if the connection was closed by the AGV
+        """
+        frame = self.decoder.next_frame()
+        while frame is None:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([self.socket], [], [],
+                                                       remaining)[0]:
+                    raise socket.timeout("no response from the AGV")
+            if self.decoder.recv_into(self.socket) == 0:
+                self._connection_lost(
+                    ConnectionError("connection closed by the AGV"))
+                return None
+            frame = self.decoder.next_frame()
+        if self.recorder is not None:
+            self.recorder.record(RECEIVED, self.ip, self.port, *frame)
+        return frame
+
+    def decode(self, payload):
+        """decode a response body and add the receive time as "timestamp" (local wall clock time) and
+        "received_at" (time.monotonic())"""
+        data = self.codec.decode(payload) if payload else None
+        if data:
+            if hot_path_enabled(logger):
+                logger.debug("[%s] :: Received: %s", self.name,
+                             data if len(payload) < 1000 else
+                             f"{len(payload)} bytes")
+            data['timestamp'] = timestamp()
+            data['received_at'] = time.monotonic()
+        return data
+
+    def listen(self):
+        data = None
+        try:
+            with self._recv_lock:
+                frame = self.read_frame()
+            if frame is None:
+                raise ConnectionError("connection closed by the AGV")
+            data = self.decode(frame[2])
+
+        except Exception as e:
+            logger.error("[%s] :: Error: %s", self.name, e)
+
+        return data
+
+    def _dispatch(self, frame):
+        """resolve the pending request matching a received frame, unmatched frames are dropped"""
+        request_id, msg_type, payload = frame
+        entry = self.pending.pop((request_id, msg_type), None)
+        if entry is None:
+            logger.warning(
+                "[%s] :: Dropped unexpected response %s (request id %s)",
+                self.name, msg_type, request_id)
+            return
+        future, series, sent_at = entry
+        try:
+            data = self.decode(payload)
+        except Exception as e:
+            data = None
+            future.set_exception(e)
+        else:
+            future.set_result(data)
+        if series is not None:
+            series.record_response(time.monotonic() - sent_at,
+                                   HEADER_SIZE + len(payload),
+                                   not data or data.get("ret_code", 0) != 0)
+
+    def _write(self, buffers):
+        """write all buffers to the socket with a single scatter-gather call when the platform supports it"""
+        with self._send_lock:
+            if not hasattr(self.socket, "sendmsg"):
+                self.socket.sendall(b''.join(buffers))
+                return
+            views = [memoryview(buffer) for buffer in buffers if len(buffer)]
+            while views:
+                sent = self.socket.sendmsg(views)
+                while views and sent >= len(views[0]):
+                    sent -= len(views.pop(0))
+                if sent:
+                    views[0] = views[0][sent:]
+
+    def send(self, message):
+        """send raw bytes to the AGV
+
+        Returns:
+            bool: True if the message was handed to the socket
+        """
+        if self.connected:
+            try:
+                with self._send_lock:
+                    self.socket.sendall(message)
+                if self.recorder is not None and len(message) >= HEADER_SIZE:
+                    _, _, request_id, _, msg_type, _ = _HEADER.unpack_from(
+                        message)
+                    self.recorder.record(SENT, self.ip, self.port, request_id,
+                                         msg_type, bytes(message[HEADER_SIZE:]))
+                if hot_path_enabled(logger):
+                    logger.debug("[%s] :: Sent: %s", self.name, message.hex())
+                return True
+            except socket.error as e:
+                logger.warning("[%s] :: Send error: %s. Reconnecting...",
+                               self.name, e)
+                self._connection_lost(e)
+        else:
+            logger.warning("[%s] :: Not connected. Unable to send message.",
+                           self.name)
+        return False
+
+    def send_data(self, seer_data):
+        """send a packed SeerData, header and body are written without concatenating them
+
+        Returns:
+            bool: True if the message was handed to the socket
+        """
+        if self.connected:
+            try:
+                self._write((seer_data.header, seer_data.data))
+                if self.recorder is not None:
+                    self.recorder.record(SENT, self.ip, self.port,
+                                         seer_data.request_id,
+                                         seer_data.msg_type, seer_data.data)
+                if hot_path_enabled(logger):
+                    logger.debug("[%s] :: Sent: %s %s", self.name,
+                                 seer_data.header.hex(), seer_data.data)
+                return True
+            except socket.error as e:
+                logger.warning("[%s] :: Send error: %s. Reconnecting...",
+                               self.name, e)
+                self._connection_lost(e)
+        else:
+            logger.warning("[%s] :: Not connected. Unable to send message.",
+                           self.name)
+        return False
+
+    def send_command(self, requestID, messageType, data={}):
+        with self._send_lock:
+            self._seer.set_data(request_id=requestID,
+                                msg_type=messageType,
+                                msg=data,
+                                codec=self.codec)
+            if self.send_data(self._seer):
+                series = self.series(messageType)
+                if series is not None:
+                    series.record_request(HEADER_SIZE + len(self._seer.data))
+
+    def submit(self, messageType, data={}, requestID=0):
+        """send a request without waiting for its response. Any number of requests may be in flight on one connection,
+        responses are matched to their requests by request id as they arrive.
+
+        usage:
+        ```python
+        futures = [transport.submit(1004), transport.submit(1007)]
+        transport.wait(futures)
+        pose, battery = [f.result() for f in futures]
+        ```
+
+        Args:
+            messageType (int): request message type
+            data (dict, optional): request body. Defaults to {}.
+            requestID (int, optional): request id, 0 assigns the next free id. Defaults to 0.
+
+        Returns:
+            Future: resolved with the decoded response once it is received by wait()
+        """
+        future = Future()
+        series = self.series(messageType)
+        with self._send_lock:
+            self._seer.set_data(request_id=requestID,
+                                msg_type=messageType,
+                                msg=data,
+                                codec=self.codec)
+            key = (self._seer.request_id, messageType + RESPONSE_OFFSET)
+            self.pending[key] = (future, series, time.monotonic())
+            if series is not None:
+                series.record_request(HEADER_SIZE + len(self._seer.data))
+            sent = self.send_data(self._seer)
+        if not sent:
+            self.pending.pop(key, None)
+            if not future.done():
+                future.set_exception(
+                    ConnectionError("Not connected. Unable to send message."))
+        return future
+
+    def wait(self, futures, timeout=None):
+        """receive responses until all the given futures are resolved. Responses to requests of other callers that
+        arrive in between are dispatched to their futures as well, so several threads can wait on one connection.
+
+        Args:
+            futures (list): futures returned by submit()
+            timeout (float, optional): maximum time to wait in seconds. Defaults to None (wait forever).
+
+        Returns:
+            bool: True if all futures are resolved, on timeout the unresolved futures fail with TimeoutError
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for future in futures:
+            while not future.done():
+                # another thread may hold the receive lock in an untimed wait, the deadline applies to it as well
+                if deadline is None:
+                    self._recv_lock.acquire()
+                elif not self._recv_lock.acquire(
+                        timeout=max(0.0, deadline - time.monotonic())):
+                    self._expire(futures)
+                    return False
+                try:
+                    if future.done():
+                        break
+                    frame = self.read_frame(deadline)
+                except socket.timeout:
+                    self._expire(futures)
+                    return False
+                except (OSError, ValueError) as e:
+                    # a corrupt frame leaves the stream out of sync, it is only recovered by reconnecting
+                    self._connection_lost(e)
+                    break
+                finally:
+                    self._recv_lock.release()
+                if frame is None:
+                    break
+                self._dispatch(frame)
+        return True
+
+    def _expire(self, futures):
+        """fail the unresolved futures after a timeout and forget their requests, a late response is dropped"""
+        expired = {future for future in futures if not future.done()}
+        for key, (future, series, _) in list(self.pending.items()):
+            if future in expired:
+                self.pending.pop(key, None)
+                if series is not None:
+                    series.record_error()
+                if not future.done():
+                    future.set_exception(
+                        TimeoutError("no response from the AGV"))
+
+    def send_n_receive(self,
+                       requestID,
+                       messageType,
+                       data={},
+                       timeout=RESPONSE_TIMEOUT):
+        """send a request and wait for its response, returns None if it failed or no response arrived within timeout
+        seconds (None waits forever)"""
+        future = self.submit(messageType, data, requestID)
+        self.wait([future], timeout)
+        if future.exception() is not None:
+            logger.error("[%s] :: Error: %s", self.name, future.exception())
+            return None
+        return future.result()
+
+
+if __name__ == "__main__":
+    transport = TcpTransport("127.0.0.1", 12345)
+
+    while True:
+        message = input("Enter message to send: ")
+        transport.send(message)
+        transport.listen()
@@ -0,0 +1,22 @@
+import asyncio
+from pyrobokit.agv_api import async_api, status
+
+ips = ["192.168.0.10", "192.168.0.11"]
+
+
+async def poll(ip):
+    async with async_api.AsyncStatusAPI(ip=ip) as status_api:
+        pose = status.StatusPose()
+        battery = status.StatusBattery()
+        success = await status_api.get_status_many([pose, battery])
+        print(ip, success)
+        print(pose.x, pose.y, pose.angle)
+        print(battery.level, battery.voltage)
+
+
+async def main():
+    # all robots are queried concurrently on one event loop
+    await asyncio.gather(*[poll(ip) for ip in ips])
+
+
+asyncio.run(main())
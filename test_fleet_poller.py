@@ -0,0 +1,20 @@
+from pyrobokit.agv_api import fleet, status
+from time import perf_counter as pf
+
+ips = [f"192.168.0.{i}" for i in range(10, 20)]
+
+poller = fleet.FleetStatusPoller(ips,
+                                 statuses=[status.StatusPose, status.StatusBattery],
+                                 timeout=0.5)
+print(poller.connected)
+
+for i in range(10):
+    start = pf()
+    snapshot = poller.poll()
+    print(f"sweep:: {pf()-start}")
+    for ip, robot in snapshot.items():
+        pose = robot[status.StatusPose]
+        battery = robot[status.StatusBattery]
+        print(ip, pose.success, pose.x, pose.y, battery.level)
+
+poller.close()
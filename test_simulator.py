@@ -0,0 +1,58 @@
+from pyrobokit.agv_api import status, navigation, StatusCache
+from pyrobokit.simulator import SimulatedFleet, NetworkProfile
+from pyrobokit.tcp_transport import API_PORT_STATE, API_PORT_TASK, API_PORT_PUSH
+from concurrent.futures import TimeoutError
+from time import sleep
+
+# 50 simulated controllers with 2 ms latency, no robot needed
+fleet = SimulatedFleet(50, network=NetworkProfile(latency=0.002, jitter=0.001))
+fleet.start()
+
+ip, port = fleet.address(0, API_PORT_STATE)
+stat = status.StatusAPI(ip, port)
+ip, port = fleet.address(0, API_PORT_TASK)
+nav = navigation.NavigationAPI(ip, port)
+
+print(nav.execute(navigation.TaskOneStation(dest_id="LM25", max_speed=1.0)))
+
+pose = status.StatusPose()
+nav_status = status.StatusNavigation()
+for i in range(100):
+    stat.get_status_many([pose, nav_status])
+    print(pose.x, pose.y, pose.current_station, nav_status.task_status)
+    if nav_status.task_status == "Completed":
+        break
+    sleep(0.2)
+
+# one cache shared by the StatusAPIs of two robots keeps their responses apart
+cache = StatusCache({status.StatusPose: 1.0}, stale_ttl=1.0)
+poses = []
+for i in (1, 2):
+    robot_pose = status.StatusPose()
+    status.StatusAPI(*fleet.address(i, API_PORT_STATE),
+                     cache=cache).get_status(robot_pose)
+    poses.append((robot_pose.x, robot_pose.y, robot_pose.current_station))
+print(poses)
+assert poses[0] != poses[1], "robots share cached responses"
+
+# wait for the end of a task, signaled by the push messages of the robot
+ip, push_port = fleet.address(3, API_PORT_PUSH)
+monitor = navigation.TaskMonitor(ip, push_port,
+                                 fleet.address(3, API_PORT_STATE)[1])
+nav = navigation.NavigationAPI(*fleet.address(3, API_PORT_TASK),
+                               monitor=monitor)
+outcome = nav.execute_and_wait(navigation.TaskOneStation(dest_id="LM2"),
+                               timeout=30)
+print(outcome.succeeded, outcome.task_status, outcome.elapsed)
+
+# a task that does not end within the timeout is no longer tracked
+try:
+    nav.execute_and_wait(navigation.TaskOneStation(dest_id="LM25"),
+                         timeout=0.1)
+except TimeoutError:
+    print("timed out, tasks waited for:", monitor.waiting)
+assert monitor.waiting == 0, "abandoned task still tracked"
+monitor.close()
+nav.close()
+
+fleet.stop()